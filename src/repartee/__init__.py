@@ -2,4 +2,11 @@
 Repartee: A conversational AI assistant integrating multiple language models and retrieval techniques.
 """
 
-from .main import main
+
+def __getattr__(name):
+    # Import the CLI (and its model clients) only when `main` is requested
+    if name == "main":
+        from .main import main
+        globals()["main"] = main
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -81,7 +81,36 @@ class ReparteeConfig:
         self.data_dir = get_data_dir()
         self.embeddings = {
             "provider": "openai",
-            "model": "text-embedding-3-small"
+            "model": "text-embedding-3-small",
+            "dimensions": None,
+            "threads": None,
+            "encode_batch_size": 32,
+            "sidecar": False,
+            "index": "auto",
+            "ann_nprobe": 8,
+            "ann_ef": 64,
+            "ann_min_rows": 10000,
+            "cache_size": 200000,
+            "quantization": "none",
+            "storage": "float32"
+        }
+        self.episodic = {
+            "sharding": "none",
+            "shard_dir": None,
+            "search_workers": 4,
+            "compaction": {
+                "max_age_days": None,
+                "keep_conversations": None,
+                "delete_after_days": None,
+                "summarizer": "extractive",
+                "interval_hours": 24
+            }
+        }
+        self.semantic = {
+            "context_concepts": 8,
+            "context_time_budget": 0.05,
+            "context_chunks": 3,
+            "chunk_tokens": 400
         }
         self.knowledge_dirs = []
         
@@ -118,6 +147,12 @@ class ReparteeConfig:
                     if "embeddings" in config:
                         self.embeddings.update(config["embeddings"])
                         
+                    if "episodic" in config:
+                        self.episodic.update(config["episodic"])
+                        
+                    if "semantic" in config:
+                        self.semantic.update(config["semantic"])
+                        
                     if "knowledge_dirs" in config:
                         self.knowledge_dirs = config["knowledge_dirs"]
 
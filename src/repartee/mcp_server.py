@@ -7,8 +7,13 @@ def main():
     ap.add_argument("--addr",
                     default="tcp://127.0.0.1:55855",
                     help="listen address (default tcp://127.0.0.1:55855)")
+    ap.add_argument("--watch-obsidian", metavar="DIR",
+                    help="keep the knowledge graph in sync with an Obsidian vault")
     ns = ap.parse_args()
     host = build_host()
+    if ns.watch_obsidian:
+        from repartee.memory.vault_watcher import VaultWatcher
+        VaultWatcher(ns.watch_obsidian).start()
     anyio.run(host.serve, ns.addr)
 
 if __name__ == "__main__":
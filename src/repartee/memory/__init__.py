@@ -10,29 +10,48 @@ Usage:
 Import this module to access memory management functionalities for chat history and semantic memory.
 """
 
-from .short_term_memory import ShortTermMemory
-from .semantic_memory import SemanticMemory
-from .working_memory import WorkingMemory
-from .episodic_memory import EpisodicMemory
+# Stores are imported on first access, so importing one of them (or the
+# package) does not pull in the others and their dependencies
+_LAZY = {
+    "ShortTermMemory": ".short_term_memory",
+    "SemanticMemory": ".semantic_memory",
+    "WorkingMemory": ".working_memory",
+    "EpisodicMemory": ".episodic_memory",
+    "ShardedEpisodicMemory": ".episodic_shards",
+    "open_episodic_memory": ".episodic_shards",
+    "VaultWatcher": ".vault_watcher",
+    "export_memory": ".backup",
+    "import_memory": ".backup",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# ---------- MCP host builder ----------
-try:                                  # modern package layout
-    from mcp.host import Host
-except ImportError:                   # older fastmcp versions
-    try:
-        from fastmcp.host import Host
-    except ImportError:
-        from fastmcp import Host      # very old layout
 
+# ---------- MCP host builder ----------
 def build_host():
     """Return a Host exposing memory operations via MCP."""
+    try:                                  # modern package layout
+        from mcp.host import Host
+    except ImportError:                   # older fastmcp versions
+        try:
+            from fastmcp.host import Host
+        except ImportError:
+            from fastmcp import Host      # very old layout
+
     host = Host()
 
     from .short_term_memory import ShortTermMemory
-    from .episodic_memory import EpisodicMemory
+    from .episodic_shards import open_episodic_memory
 
     stm = ShortTermMemory()
-    epis = EpisodicMemory()
+    epis = open_episodic_memory()
 
     @host.on("short.add_user")
     async def _su(msg):  # returns id ignored
@@ -53,7 +72,8 @@ def build_host():
     @host.on("episodic.add")
     async def _ea(role, content, conversation="default"):
         epis.add_message(role=role, content=content,
-                         conversation_id=conversation)
+                         conversation_id=conversation,
+                         defer_embedding=True)
 
     @host.on("episodic.search")
     async def _es(query, limit=3):
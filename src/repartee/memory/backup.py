@@ -0,0 +1,386 @@
+"""
+Binary export and import of Repartee's memory stores.
+
+An export streams every table of the semantic and episodic databases
+(concepts, edges, note chunks, conversations, messages, ...) with their
+raw embedding blobs, so that a store can be moved to another machine or
+used to seed an MCP host without re-embedding anything. The file is a
+magic string followed by length-prefixed msgpack records, optionally
+compressed with gzip or zstd (``zstandard``):
+
+- ``["header", {"format", "created_at", "databases"}]``
+- ``["database", store, name]`` before the tables of each database
+- ``["table", table, columns]`` before the rows of each table
+- ``["rows", rows]`` with up to ``ROW_BATCH`` rows of the current table
+- ``["end", counts]``
+
+Imports insert rows in bulk, in one transaction per database, with the
+tables' indexes and triggers dropped for the duration and recreated at
+the end. Derived state (the full-text index, the graph generation,
+sidecar and ANN files) is rebuilt afterwards.
+"""
+
+import glob
+import gzip
+import os
+import re
+import struct
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import msgpack
+
+from .database import get_connection_manager
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"RPMEMX01"
+FORMAT = 1
+
+# Rows per ``rows`` record
+ROW_BATCH = 2000
+
+# Tables exported from each kind of store; derived tables are rebuilt
+STORE_TABLES = {
+    "semantic": ("nodes", "edges", "obsidian_files", "chunks"),
+    "episodic": ("conversations", "messages", "pending_embeddings", "compaction_runs"),
+}
+
+# Leading bytes of compressed files
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+_LENGTH = struct.Struct("<I")
+
+# (store, database name, database path)
+Database = Tuple[str, str, str]
+
+
+def memory_databases() -> List[Database]:
+    """
+    List the databases of the configured memory stores.
+
+    The semantic store is ``knowledge_graph``; the episodic store is
+    ``episodic_memory``, or one ``YYYY-MM`` database per monthly shard.
+
+    Returns:
+        Databases as (store, name, path)
+    """
+    from .episodic_shards import ShardedEpisodicMemory, open_episodic_memory
+    from .semantic_memory import KnowledgeGraph
+
+    databases = [("semantic", "knowledge_graph", KnowledgeGraph().db_path)]
+    episodic = open_episodic_memory()
+    if isinstance(episodic, ShardedEpisodicMemory):
+        databases.extend(("episodic", period, episodic.shard_path(period))
+                         for period in episodic.periods())
+    else:
+        databases.append(("episodic", "episodic_memory", episodic.db_path))
+    return databases
+
+
+def open_database(store: str, name: str) -> str:
+    """
+    Open (creating it if needed) the local database an exported one maps to.
+
+    Args:
+        store: ``semantic`` or ``episodic``
+        name: Database name as listed by :func:`memory_databases`
+
+    Returns:
+        Path of the database, with its schema in place
+
+    Raises:
+        ValueError: If the store is unknown, or an episodic name is neither
+            ``episodic_memory`` nor a ``YYYY-MM`` shard
+    """
+    from ..config import config
+    from .episodic_memory import EpisodicMemory
+    from .episodic_shards import ShardedEpisodicMemory
+    from .semantic_memory import KnowledgeGraph
+
+    if store == "semantic":
+        return KnowledgeGraph().db_path
+    if store != "episodic":
+        raise ValueError(f"Unknown memory store: {store}")
+    if name == "episodic_memory":
+        return EpisodicMemory().db_path
+    # Names come from the export file: never let one escape the shard directory
+    if not isinstance(name, str) or not re.fullmatch(r"[0-9]{4}-[0-9]{2}", name):
+        raise ValueError(f"Invalid episodic shard name in memory export: {name!r}")
+    # Monthly shards land in the shard directory whatever the sharding setting
+    shard_dir = config.episodic.get("shard_dir")
+    shards = ShardedEpisodicMemory(os.path.expanduser(shard_dir) if shard_dir else None)
+    return shards.shard(name).db_path
+
+
+def _compression_for(path: str) -> str:
+    """Guess the compression of an export file from its extension."""
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith((".zst", ".zstd")):
+        return "zstd"
+    return "none"
+
+
+def _open_output(path: str, compression: str) -> BinaryIO:
+    """Open an export file for writing through the requested compressor."""
+    if compression == "none":
+        return open(path, "wb")
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=6)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(open(path, "wb"),
+                                                                           closefd=True)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def _open_input(path: str) -> BinaryIO:
+    """Open an export file for reading, detecting its compression from its first bytes."""
+    with open(path, "rb") as f:
+        head = f.read(4)
+    if head.startswith(_GZIP_MAGIC):
+        return gzip.open(path, "rb")
+    if head.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            raise ValueError("This export is zstd-compressed; install the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def _write_record(stream: BinaryIO, record: Sequence[Any]):
+    """Write one length-prefixed msgpack record."""
+    payload = msgpack.packb(record, use_bin_type=True)
+    stream.write(_LENGTH.pack(len(payload)))
+    stream.write(payload)
+
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    """Read exactly ``size`` bytes; decompressing readers may return fewer per call."""
+    parts, remaining = [], size
+    while remaining:
+        part = stream.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    data = b"".join(parts)
+    if parts and len(data) < size:
+        raise ValueError("Truncated memory export")
+    return data
+
+
+def _read_records(stream: BinaryIO) -> Iterator[List[Any]]:
+    """Yield the records of an export stream, after checking its magic string."""
+    try:
+        magic = _read_exact(stream, len(MAGIC))
+    except ValueError:
+        magic = b""
+    if magic != MAGIC:
+        raise ValueError("Not a Repartee memory export")
+    while True:
+        prefix = _read_exact(stream, _LENGTH.size)
+        if not prefix:
+            return
+        yield msgpack.unpackb(_read_exact(stream, _LENGTH.unpack(prefix)[0]), raw=False)
+
+
+def export_memory(path: str,
+                  databases: Optional[List[Database]] = None,
+                  compression: Optional[str] = None,
+                  progress: Optional[Callable[[str, int], None]] = None) -> Dict[str, int]:
+    """
+    Write the memory stores to an export file.
+
+    Each database is read in a single read transaction, so its tables
+    are exported consistently even while other processes write to it.
+
+    Args:
+        path: Export file to write
+        databases: Databases to export, defaults to :func:`memory_databases`
+        compression: ``none``, ``gzip`` or ``zstd``; defaults to the one the
+            file extension suggests (``.gz``, ``.zst``)
+        progress: Called with (table, rows written so far) after every batch
+
+    Returns:
+        Rows exported per table, summed over databases
+    """
+    databases = memory_databases() if databases is None else databases
+    compression = compression or _compression_for(path)
+    counts = {}
+    with _open_output(path, compression) as stream:
+        stream.write(MAGIC)
+        _write_record(stream, ["header", {
+            "format": FORMAT,
+            "created_at": datetime.now().isoformat(),
+            "databases": [[store, name] for store, name, _ in databases],
+        }])
+        for store, name, db_path in databases:
+            _write_record(stream, ["database", store, name])
+            conn = get_connection_manager(db_path).connection()
+            conn.execute("BEGIN")
+            try:
+                for table in STORE_TABLES[store]:
+                    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+                    if not columns:
+                        continue
+                    _write_record(stream, ["table", table, columns])
+                    cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY rowid")
+                    written = 0
+                    while True:
+                        rows = cursor.fetchmany(ROW_BATCH)
+                        if not rows:
+                            break
+                        _write_record(stream, ["rows", rows])
+                        written += len(rows)
+                        if progress:
+                            progress(table, written)
+                    counts[table] = counts.get(table, 0) + written
+            finally:
+                conn.execute("COMMIT")
+        _write_record(stream, ["end", counts])
+    return counts
+
+
+def _drop_index_files(db_path: str):
+    """Delete a database's sidecar and ANN files; they are rebuilt from SQLite on next use."""
+    for path in glob.glob(glob.escape(db_path) + ".*"):
+        suffix = path[len(db_path):]
+        if suffix.endswith((".vec", ".ids")) or ".ivf-" in suffix or ".hnsw-" in suffix:
+            os.remove(path)
+
+
+def _import_database(db_path: str, store: str, records: Iterator[List[Any]], replace: bool,
+                     progress: Optional[Callable[[str, int], None]],
+                     counts: Dict[str, int]) -> List[Any]:
+    """
+    Bulk-insert the tables of one exported database into a local one.
+
+    Returns:
+        The record that follows the database's tables
+
+    Raises:
+        ValueError: If the stream ends before that record; nothing of the
+            database is committed then
+    """
+    tables = STORE_TABLES[store]
+    placeholders = ",".join("?" * len(tables))
+    with get_connection_manager(db_path).transaction() as conn:
+        # Indexes and triggers are rebuilt once at the end instead of per row
+        schema = conn.execute(
+            f"""
+            SELECT type, name, sql FROM sqlite_master
+            WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+            AND tbl_name IN ({placeholders})
+            """,
+            tables
+        ).fetchall()
+        for kind, name, _ in schema:
+            conn.execute(f"DROP {kind.upper()} {name}")
+        if replace:
+            for table in tables:
+                conn.execute(f"DELETE FROM {table}")
+
+        target = None
+        record = None
+        for record in records:
+            if record[0] == "table":
+                table, columns = record[1], record[2]
+                local = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if table not in tables or not local:
+                    print(f"Warning: Skipping unknown table {table!r} in memory export")
+                    target = None
+                    continue
+                keep = [i for i, column in enumerate(columns) if column in local]
+                if len(keep) < len(columns):
+                    dropped = [column for column in columns if column not in local]
+                    print(f"Warning: Skipping unknown columns of {table}: {', '.join(dropped)}")
+                statement = (f"INSERT INTO {table} ({', '.join(columns[i] for i in keep)}) "
+                             f"VALUES ({','.join('?' * len(keep))})")
+                target = (table, statement, keep if len(keep) < len(columns) else None)
+                written = 0
+            elif record[0] == "rows":
+                if target is None:
+                    continue
+                table, statement, keep = target
+                rows = record[1]
+                if keep is not None:
+                    rows = [[row[i] for i in keep] for row in rows]
+                conn.executemany(statement, rows)
+                written += len(rows)
+                counts[table] = counts.get(table, 0) + len(rows)
+                if progress:
+                    progress(table, written)
+            else:
+                break
+        else:
+            # Raised inside the transaction, so a partly restored database rolls back
+            raise ValueError("Memory export ended early")
+
+        for _, _, sql in schema:
+            conn.execute(sql)
+        # Rebuild the derived state the dropped triggers would have maintained
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone():
+            conn.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'graph_generation'").fetchone():
+            conn.execute("UPDATE graph_generation SET value = value + 1 WHERE id = 0")
+    _drop_index_files(db_path)
+    return record
+
+
+def import_memory(path: str, replace: bool = False,
+                  progress: Optional[Callable[[str, int], None]] = None) -> Dict[str, int]:
+    """
+    Restore the memory stores from an export file.
+
+    Row ids are kept, so edges, chunks and pending embeddings still point
+    at the right rows. The target databases must be empty unless
+    ``replace`` is set, which first deletes their current contents. Each
+    database is restored in its own transaction: if the file turns out to
+    be truncated, the damaged database is rolled back untouched, while the
+    databases before it stay restored.
+
+    Args:
+        path: Export file written by :func:`export_memory`
+        replace: Overwrite stores that already hold data
+        progress: Called with (table, rows inserted so far) after every batch
+
+    Returns:
+        Rows imported per table, summed over databases
+    """
+    with _open_input(path) as stream:
+        records = _read_records(stream)
+        header = next(records, None)
+        if not header or header[0] != "header":
+            raise ValueError("Memory export has no header")
+        if header[1].get("format", 0) > FORMAT:
+            raise ValueError(f"Memory export format {header[1]['format']} is newer than this "
+                             f"version of Repartee supports ({FORMAT})")
+
+        # Check every target before writing anything
+        targets = {}
+        for store, name in header[1].get("databases", []):
+            db_path = open_database(store, name)
+            conn = get_connection_manager(db_path).connection()
+            for table in STORE_TABLES[store]:
+                if not replace and conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                    raise ValueError(f"{db_path} already holds {table}; import with replace "
+                                     f"to overwrite it")
+            targets[(store, name)] = db_path
+
+        counts = {}
+        record = next(records, None)
+        while record is not None and record[0] == "database":
+            store, name = record[1], record[2]
+            if (store, name) not in targets:
+                raise ValueError(f"Memory export lists no database {store}/{name}")
+            record = _import_database(targets[(store, name)], store, records, replace,
+                                      progress, counts)
+        if record is None or record[0] != "end":
+            raise ValueError("Memory export ended early")
+    return counts
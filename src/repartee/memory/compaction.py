@@ -0,0 +1,176 @@
+"""
+Retention and compaction helpers for episodic memory.
+
+Compaction replaces the raw history of inactive conversations with digest
+messages (role ``digest``): each digest is embedded and searchable like
+any message, while the raw messages lose their embeddings and, past a
+second age limit, are deleted. Freed pages are returned to the file
+system with incremental VACUUM. The job itself is
+``EpisodicMemory.compact``; every conversation is compacted in its own
+transaction, so an interrupted run simply continues where it stopped.
+"""
+
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from .embeddings import count_tokens
+
+DIGEST_ROLE = "digest"
+
+# Pages freed per incremental_vacuum step
+VACUUM_STEP = 4096
+
+
+def extractive_digest(messages: List[Dict[str, Any]], max_tokens: int = 300) -> str:
+    """
+    Summarise messages without a model: the first sentence of each, in order.
+
+    When the sentences exceed the budget, the beginning and the end of the
+    conversation are kept and the middle is elided.
+
+    Args:
+        messages: Message dictionaries, oldest first
+        max_tokens: Token budget of the digest
+
+    Returns:
+        Digest text
+    """
+    header = (f"Digest of {len(messages)} messages from "
+              f"{messages[0]['timestamp'][:10]} to {messages[-1]['timestamp'][:10]}:")
+    lines = []
+    for msg in messages:
+        text = " ".join(msg["content"].split())
+        sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0][:200]
+        if sentence:
+            lines.append(f"- {msg['role']}: {sentence}")
+
+    budget = max_tokens - count_tokens(header)
+    costs = [count_tokens(line) for line in lines]
+    if sum(costs) <= budget:
+        return "\n".join([header] + lines)
+
+    head, tail, used = [], [], 0
+    i, j = 0, len(lines) - 1
+    while i <= j:
+        # Alternate between both ends so either survives a tight budget
+        take_head = len(head) <= len(tail)
+        k = i if take_head else j
+        if used + costs[k] > budget:
+            break
+        used += costs[k]
+        if take_head:
+            head.append(lines[i])
+            i += 1
+        else:
+            tail.append(lines[j])
+            j -= 1
+    return "\n".join([header] + head + ["- ..."] + tail[::-1])
+
+
+def model_digest_fn(model, max_tokens: int = 300,
+                    max_input_tokens: int = 6000) -> Callable[[List[Dict[str, Any]]], str]:
+    """
+    Build a digest function that summarises with a chat model.
+
+    Args:
+        model: Model exposing ``generate_text(prompt, system_prompt, max_tokens)``
+        max_tokens: Length limit of the summary
+        max_input_tokens: Transcript budget; longer conversations are
+            first reduced with :func:`extractive_digest`
+
+    Returns:
+        Function mapping messages (oldest first) to a digest
+    """
+    def digest(messages: List[Dict[str, Any]]) -> str:
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        if count_tokens(transcript) > max_input_tokens:
+            transcript = extractive_digest(messages, max_input_tokens)
+        summary = model.generate_text(
+            prompt=transcript,
+            system_prompt=("Summarise this conversation for long-term memory. Keep facts, "
+                           "decisions, names and open questions; be brief."),
+            max_tokens=max_tokens,
+        )
+        return (f"Digest of {len(messages)} messages from {messages[0]['timestamp'][:10]} "
+                f"to {messages[-1]['timestamp'][:10]}:\n{summary.strip()}")
+    return digest
+
+
+def compaction_cutoff(memory, max_age_days: Optional[float] = None,
+                      keep_conversations: Optional[int] = None) -> Optional[str]:
+    """
+    Return the activity time before which conversations are compacted.
+
+    A conversation is compacted when it has been inactive for
+    ``max_age_days`` or is not among the ``keep_conversations`` most
+    recently active ones, whichever reaches further.
+
+    Args:
+        memory: Episodic store (plain or sharded)
+        max_age_days: Age policy, None to disable
+        keep_conversations: Count policy, None to disable
+
+    Returns:
+        ISO timestamp (conversations last active strictly before it are
+        compacted), or None when no policy applies
+    """
+    cutoffs = []
+    if max_age_days is not None:
+        cutoffs.append((datetime.now() - timedelta(days=max_age_days)).isoformat())
+    if keep_conversations is not None and keep_conversations <= 0:
+        cutoffs.append(datetime.max.isoformat())
+    elif keep_conversations is not None:
+        cursor = None
+        remaining = keep_conversations
+        while remaining > 0:
+            page, cursor = memory.page_conversations(min(remaining, 500), cursor, "last_activity")
+            remaining -= len(page)
+            if cursor is None:
+                break
+        if remaining <= 0:
+            # Everything last active before the oldest kept conversation
+            cutoffs.append(page[-1]["last_activity"])
+    return max(cutoffs) if cutoffs else None
+
+
+def storage_bytes(db_path: str) -> int:
+    """Return the bytes a database occupies on disk, write-ahead log included."""
+    return sum(os.path.getsize(path) for path in (db_path, db_path + "-wal")
+               if os.path.exists(path))
+
+
+def incremental_vacuum(db) -> Dict[str, Any]:
+    """
+    Return a database's free pages to the file system.
+
+    Databases created before incremental auto-vacuum was enabled are
+    converted with one full VACUUM; afterwards free pages are released in
+    steps of ``VACUUM_STEP`` and the write-ahead log is truncated.
+
+    Args:
+        db: The database's ``ConnectionManager``
+
+    Returns:
+        Dict with the ``pages_freed`` and whether the file was ``converted``
+    """
+    conn = db.connection()
+    converted = False
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        converted = True
+
+    freed = 0
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    while free:
+        # Every returned row is one freed page, so the pragma must be drained
+        conn.execute(f"PRAGMA incremental_vacuum({VACUUM_STEP})").fetchall()
+        remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if remaining >= free:
+            break
+        freed += free - remaining
+        free = remaining
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return {"pages_freed": freed, "converted": converted}
@@ -0,0 +1,158 @@
+"""
+Shared SQLite connection management for Repartee's memory stores.
+
+Every database file gets one :class:`ConnectionManager`, which hands each
+thread its own long-lived connection (SQLite connections must not be
+shared between threads). Connections are opened in WAL mode with tuned
+pragmas, so readers in the CLI never block on writers in the MCP host
+and vice versa, and Python's per-connection statement cache means hot
+queries are prepared once rather than on every call.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+# Pragmas applied to every new connection
+PRAGMAS = {
+    # Only takes effect on new files, so it must precede journal_mode;
+    # older files are converted by compaction (see compaction.py)
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",     # durable at checkpoints, safe with WAL
+    "cache_size": -65536,        # 64 MiB page cache per connection
+    "mmap_size": 268435456,      # map up to 256 MiB of the file
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,        # wait for the write lock instead of failing
+}
+
+# Prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 256
+
+
+class ConnectionManager:
+    """
+    Thread-aware pool of persistent connections to one SQLite database.
+
+    Use :meth:`connection` for reads and :meth:`transaction` for writes:
+
+        with manager.transaction() as conn:
+            conn.execute("INSERT ...")
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the manager. Connections are opened lazily, per thread.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode: writes open explicit transactions via transaction()
+            conn = sqlite3.connect(self.db_path, isolation_level=None,
+                                   check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+            for pragma, value in PRAGMAS.items():
+                conn.execute(f"PRAGMA {pragma} = {value}")
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run a block of statements in a single write transaction.
+
+        The transaction is committed when the block exits normally and
+        rolled back if it raises. Nested calls join the outer transaction.
+
+        Yields:
+            The calling thread's connection
+        """
+        conn = self.connection()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        self._local.depth = 1
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            self._local.depth = 0
+
+    def close(self):
+        """Close every connection opened by this manager, in all threads."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(db_path: str) -> ConnectionManager:
+    """
+    Return the process-wide connection manager of a database file.
+
+    Args:
+        db_path: Path to the SQLite database file
+
+    Returns:
+        The shared :class:`ConnectionManager` for that file
+    """
+    key = os.path.abspath(db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = ConnectionManager(db_path)
+        return manager
+
+
+def release_connection_manager(db_path: str):
+    """
+    Close a database's connections and forget its manager.
+
+    Call this before deleting or moving the file; a later
+    :func:`get_connection_manager` starts a fresh manager.
+
+    Args:
+        db_path: Path to the SQLite database file
+    """
+    with _managers_lock:
+        manager = _managers.pop(os.path.abspath(db_path), None)
+    if manager is not None:
+        manager.close()
+
+
+def close_all():
+    """Close the connections of every database opened in this process."""
+    with _managers_lock:
+        managers = list(_managers.values())
+        _managers.clear()
+    for manager in managers:
+        manager.close()
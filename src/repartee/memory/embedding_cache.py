@@ -0,0 +1,255 @@
+"""
+Content-addressed embedding cache shared by Repartee's memory stores.
+
+Embeddings are keyed by (provider, model, dimensions, sha256(text)), so
+a text that was embedded once - a repeated prompt, a concept touched by
+every relation that mentions it - is never sent to the provider again.
+Entries live in a small SQLite database with least-recently-used
+eviction, fronted by an in-process LRU for the hottest texts.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .database import get_connection_manager
+
+# Entries kept in the in-process LRU in front of the database
+MEMORY_ENTRIES = 4096
+
+
+def text_hash(text: str) -> bytes:
+    """Return the SHA-256 digest of a text."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Persistent LRU cache of embeddings keyed by provider, model, dimensions
+    and text hash.
+
+    ``hits`` and ``misses`` count lookups since the cache was opened.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 200000):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            db_path: Path to the cache's SQLite file
+            max_entries: Entries kept on disk before the least recently
+                used ones are evicted
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._db = get_connection_manager(db_path)
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+
+        with self._db.transaction() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash BLOB NOT NULL,
+                embedding BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (provider, model, dimensions, text_hash)
+            ) WITHOUT ROWID
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_cache_last_used ON embedding_cache(last_used)'
+            )
+            self._entries = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+    @staticmethod
+    def namespace(settings: Dict[str, Any]) -> Tuple[str, str, int]:
+        """Return the (provider, model, dimensions) part of a key from embedding settings."""
+        return (settings.get("provider", "openai"), settings["model"],
+                int(settings.get("dimensions") or 0))
+
+    def get_many(self, namespace: Tuple[str, str, int],
+                 texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up the embeddings of several texts.
+
+        Args:
+            namespace: (provider, model, dimensions)
+            texts: Texts to look up
+
+        Returns:
+            One embedding per text, ``None`` for misses
+        """
+        keys = [namespace + (text_hash(text),) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(i)
+                else:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+
+        if missing:
+            conn = self._db.connection()
+            found = []
+            for i in missing:
+                row = conn.execute(
+                    '''
+                    SELECT embedding FROM embedding_cache
+                    WHERE provider = ? AND model = ? AND dimensions = ? AND text_hash = ?
+                    ''',
+                    keys[i]
+                ).fetchone()
+                if row is not None:
+                    results[i] = np.frombuffer(row[0], dtype=np.float32)
+                    found.append(i)
+            if found:
+                now = time.time()
+                with self._db.transaction() as conn:
+                    conn.executemany(
+                        '''
+                        UPDATE embedding_cache SET last_used = ?
+                        WHERE provider = ? AND model = ? AND dimensions = ? AND text_hash = ?
+                        ''',
+                        [(now,) + keys[i] for i in found]
+                    )
+                with self._lock:
+                    for i in found:
+                        self._remember(keys[i], results[i])
+
+        hits = sum(vector is not None for vector in results)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, namespace: Tuple[str, str, int],
+                 texts: Sequence[str], vectors: Sequence[np.ndarray]):
+        """
+        Store the embeddings of several texts, evicting old entries if needed.
+
+        Args:
+            namespace: (provider, model, dimensions)
+            texts: Embedded texts
+            vectors: One embedding per text
+        """
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = namespace + (text_hash(text),)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append(key + (vector.tobytes(), now))
+        if not rows:
+            return
+
+        with self._db.transaction() as conn:
+            # Refresh the keys already stored, then insert the others, so
+            # that only new keys count as new entries
+            conn.executemany(
+                '''
+                UPDATE embedding_cache SET embedding = ?, last_used = ?
+                WHERE provider = ? AND model = ? AND dimensions = ? AND text_hash = ?
+                ''',
+                [row[4:] + row[:4] for row in rows]
+            )
+            before = conn.total_changes
+            conn.executemany(
+                '''
+                INSERT OR IGNORE INTO embedding_cache
+                (provider, model, dimensions, text_hash, embedding, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''',
+                rows
+            )
+            self._entries += conn.total_changes - before
+            if self._entries > self.max_entries:
+                # Evict down to 90% so eviction does not run on every insert
+                excess = self._entries - int(self.max_entries * 0.9)
+                conn.execute(
+                    '''
+                    DELETE FROM embedding_cache WHERE last_used <=
+                    (SELECT last_used FROM embedding_cache ORDER BY last_used LIMIT 1 OFFSET ?)
+                    ''',
+                    (excess - 1,)
+                )
+                self._entries = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+    def _remember(self, key: Tuple, vector: np.ndarray):
+        """Insert into the in-process LRU (caller holds the lock)."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def embed(self, texts: Sequence[str], embed_fn: Callable[[List[str]], np.ndarray],
+              settings: Dict[str, Any]) -> np.ndarray:
+        """
+        Embed texts, only sending cache misses to ``embed_fn``.
+
+        Args:
+            texts: Texts to embed
+            embed_fn: Uncached function embedding a list of texts
+            settings: Embedding settings (``config.embeddings``)
+
+        Returns:
+            Float32 array with one embedding per text
+        """
+        namespace = self.namespace(settings)
+        vectors = self.get_many(namespace, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Identical texts within one batch are only embedded once
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            embedded = embed_fn(unique)
+            by_text = dict(zip(unique, embedded))
+            self.put_many(namespace, unique, embedded)
+            for i in missing:
+                vectors[i] = np.asarray(by_text[texts[i]], dtype=np.float32)
+        return np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the number of stored entries."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Return the process-wide embedding cache.
+
+    Stored as ``embedding_cache.db`` next to the default memory databases;
+    its size cap is ``embeddings.cache_size`` in the configuration.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from ..config import config
+            db_dir = Path.home() / ".repartee" / "memory"
+            db_dir.mkdir(parents=True, exist_ok=True)
+            _cache = EmbeddingCache(str(db_dir / "embedding_cache.db"),
+                                    max_entries=config.embeddings.get("cache_size", 200000))
+        return _cache
@@ -0,0 +1,130 @@
+"""
+Write-behind embedding for Repartee's memory stores.
+
+Rows are written immediately without an embedding and recorded as
+pending; a small pool of background threads then embeds them in batches.
+The chat loop therefore never waits on the embeddings endpoint, and rows
+left pending when the process exits are picked up on the next start.
+"""
+
+import threading
+import time
+from typing import Iterable, List, Set
+
+
+class BackgroundEmbedder:
+    """
+    Pool of worker threads draining a store's pending embeddings.
+
+    The store provides two methods:
+
+    - ``pending_ids(limit, exclude)``: ids of rows waiting for an embedding
+    - ``embed_pending(ids)``: embed and store those rows
+    """
+
+    def __init__(self, store, workers: int = 2, batch_size: int = 64, poll_interval: float = 30.0):
+        """
+        Start the worker threads.
+
+        Args:
+            store: Memory store exposing ``pending_ids`` and ``embed_pending``
+            workers: Number of worker threads
+            batch_size: Maximum rows embedded per request
+            poll_interval: Seconds between idle checks for rows queued by
+                other processes
+        """
+        self.store = store
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+        self._cond = threading.Condition()
+        self._claimed: Set[int] = set()
+        self._busy = 0
+        self._wakeups = 0
+        self._stopping = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f"repartee-embedder-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def notify(self):
+        """Wake the workers after new pending rows were written."""
+        with self._cond:
+            self._wakeups += 1
+            self._cond.notify_all()
+
+    def _claim(self) -> List[int]:
+        """Reserve a batch of pending rows no other worker is embedding."""
+        ids = self.store.pending_ids(self.batch_size, exclude=self._claimed)
+        self._claimed.update(ids)
+        return ids
+
+    def _release(self, ids: Iterable[int]):
+        with self._cond:
+            self._claimed.difference_update(ids)
+            self._busy -= 1
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                ids = [] if self._stopping else self._claim()
+                while not ids:
+                    if self._stopping:
+                        return
+                    seen = self._wakeups
+                    self._cond.wait_for(lambda: self._stopping or self._wakeups != seen,
+                                        timeout=self.poll_interval)
+                    ids = [] if self._stopping else self._claim()
+                self._busy += 1
+            try:
+                self.store.embed_pending(ids)
+            except Exception as e:
+                print(f"Warning: Background embedding failed: {e}")
+            finally:
+                self._release(ids)
+
+    def drain(self, timeout: float = None) -> bool:
+        """
+        Wait until no rows are pending or being embedded.
+
+        Args:
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            True if the backlog was drained
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if not self._busy and not self.store.pending_ids(1, exclude=self._claimed):
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.notify_all()
+                self._cond.wait(timeout=0.1 if remaining is None else min(remaining, 0.1))
+
+    def close(self, drain: bool = True, timeout: float = 10.0) -> bool:
+        """
+        Stop the workers, optionally draining the backlog first.
+
+        Rows still pending afterwards stay queued in the database and are
+        embedded by the next process that starts a ``BackgroundEmbedder``.
+
+        Args:
+            drain: Wait for pending rows to be embedded before stopping
+            timeout: Maximum seconds to wait for the drain
+
+        Returns:
+            True if nothing was left pending
+        """
+        drained = self.drain(timeout) if drain else False
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        return drained
@@ -0,0 +1,310 @@
+"""
+Memory-mapped embedding sidecar files for Repartee's SQLite stores.
+
+A sidecar keeps a store's normalised embeddings next to its database as
+two append-only files:
+
+- ``<db>.vec``: a 16-byte header followed by raw float32 rows
+- ``<db>.ids``: the int64 row id of every vector, in file order
+
+Both files are mapped with ``np.memmap``, so a search reads vectors
+straight from the page cache without copying them out of SQLite, and
+every process using the same database shares those pages. A row id may
+appear several times (an updated embedding is appended again); the last
+occurrence wins.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Tuple
+
+import numpy as np
+
+from .vector_index import normalize, read_embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not locked across processes
+    fcntl = None
+
+MAGIC = b"RPVEC001"
+HEADER_SIZE = 16
+
+
+class EmbeddingSidecar:
+    """
+    Append-only, memory-mapped float32 embedding file keyed by row id.
+
+    Exposes the same ``add``/``add_many``/``search`` interface as
+    :class:`~repartee.memory.vector_index.EmbeddingMatrix` so that memory
+    stores can use either one interchangeably.
+    """
+
+    def __init__(self, db_path: str, dim: int):
+        """
+        Open (or create) the sidecar files of a database.
+
+        Args:
+            db_path: Path of the SQLite database the sidecar belongs to
+            dim: Dimensionality of the stored embeddings
+        """
+        self.vec_path = db_path + ".vec"
+        self.ids_path = db_path + ".ids"
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._size = 0
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._live = np.empty(0, dtype=bool)
+        self._file_key = None
+        self.max_id = 0
+
+        if os.path.exists(self.vec_path) and self._read_dim() != dim:
+            # Written for another model or dimension: start over
+            self._reset_files()
+        if not os.path.exists(self.vec_path):
+            self._reset_files()
+        self.refresh()
+
+    def __len__(self) -> int:
+        return int(self._live.sum())
+
+    def __contains__(self, row_id: int) -> bool:
+        return bool(np.any(self._ids[self._live] == row_id))
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Row ids in file order, including superseded rows."""
+        return self._ids[:self._size]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Memory-mapped normalised embeddings in file order."""
+        return self._vectors[:self._size]
+
+    @property
+    def live(self) -> np.ndarray:
+        """Boolean mask of the rows holding the latest embedding of their id."""
+        return self._live
+
+    def has_ids(self, row_ids: Iterable[int]) -> np.ndarray:
+        """Return a boolean array telling which row ids have a live row."""
+        return np.isin(np.asarray(list(row_ids), dtype=np.int64), self.ids[self._live])
+
+    @staticmethod
+    def _header(dim: int) -> bytes:
+        return MAGIC + np.array([dim, 0], dtype=np.uint32).tobytes()
+
+    def _read_dim(self) -> int:
+        with open(self.vec_path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE or header[:8] != MAGIC:
+            return -1
+        return int(np.frombuffer(header[8:12], dtype=np.uint32)[0])
+
+    def _reset_files(self):
+        """Truncate both files to an empty sidecar."""
+        with open(self.vec_path, "wb") as f:
+            f.write(self._header(self.dim))
+        open(self.ids_path, "wb").close()
+
+    @contextmanager
+    def _locked_ids(self, exclusive: bool):
+        """
+        Open the current ``.ids`` file and hold a flock on it.
+
+        :meth:`rebuild` swaps in new files while holding the exclusive lock
+        of the old ``.ids`` file, so a lock taken on a file that was
+        replaced in the meantime is dropped and taken again on the new one.
+        """
+        while True:
+            ids_file = open(self.ids_path, "ab")
+            try:
+                if fcntl is None:
+                    yield ids_file
+                    return
+                fcntl.flock(ids_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                if os.fstat(ids_file.fileno()).st_ino == os.stat(self.ids_path).st_ino:
+                    yield ids_file
+                    return
+            finally:
+                # Closing the file releases the flock
+                ids_file.close()
+
+    def _row_counts(self) -> Tuple[os.stat_result, os.stat_result, int, int]:
+        """Stat both files and count the complete rows each one holds."""
+        vec_stat, ids_stat = os.stat(self.vec_path), os.stat(self.ids_path)
+        vec_rows = max(0, (vec_stat.st_size - HEADER_SIZE) // (self.dim * 4))
+        return vec_stat, ids_stat, vec_rows, ids_stat.st_size // 8
+
+    def _current_key(self) -> Tuple[int, int, int]:
+        vec_stat, ids_stat, vec_rows, id_rows = self._row_counts()
+        return vec_stat.st_ino, ids_stat.st_ino, min(vec_rows, id_rows)
+
+    def refresh(self):
+        """
+        Remap the files if they grew or were rebuilt since the last call.
+
+        Rows appended by other processes become visible after a refresh.
+        Only rows present in both files are mapped, and the files are
+        mapped under a shared lock so that a concurrent :meth:`rebuild`
+        never pairs the new ``.vec`` file with the old ``.ids`` file.
+        """
+        if self._current_key() == self._file_key:
+            return
+
+        with self._locked_ids(exclusive=False), self._lock:
+            file_key = self._current_key()
+            size = file_key[2]
+            self._file_key = file_key
+            if size:
+                self._vectors = np.memmap(self.vec_path, dtype=np.float32, mode="r",
+                                          offset=HEADER_SIZE, shape=(size, self.dim))
+                self._ids = np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(size,))
+            self._size = size
+            self._live = self._latest_mask(self._ids[:size])
+            self.max_id = int(self._ids[:size].max()) if size else 0
+
+    @staticmethod
+    def _latest_mask(ids: np.ndarray) -> np.ndarray:
+        """Mark the last occurrence of every row id as live."""
+        live = np.zeros(len(ids), dtype=bool)
+        if len(ids):
+            _, last_from_end = np.unique(ids[::-1], return_index=True)
+            live[len(ids) - 1 - last_from_end] = True
+        return live
+
+    def add(self, row_id: int, vector: np.ndarray) -> bool:
+        """Append the embedding of a single row. See :meth:`add_many`."""
+        return self.add_many([row_id], np.asarray(vector, dtype=np.float32)[None, :]) == 1
+
+    def add_many(self, row_ids: Iterable[int], vectors: np.ndarray) -> int:
+        """
+        Append embeddings for several rows.
+
+        Args:
+            row_ids: Database ids, one per row of ``vectors``
+            vectors: 2-D array of raw embeddings
+
+        Returns:
+            Number of rows appended
+        """
+        row_ids = np.asarray(list(row_ids), dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim or len(row_ids) == 0:
+            return 0
+        vectors = normalize(vectors)
+
+        with self._locked_ids(exclusive=True) as ids_file, open(self.vec_path, "ab") as vec_file:
+            # A crash between the two writes of an earlier append leaves one
+            # file longer than the other; cut both back to their common rows
+            # so that the new vectors and ids line up again
+            vec_stat, ids_stat, vec_rows, id_rows = self._row_counts()
+            rows = min(vec_rows, id_rows)
+            if vec_stat.st_size != HEADER_SIZE + rows * self.dim * 4:
+                vec_file.truncate(HEADER_SIZE + rows * self.dim * 4)
+            if ids_stat.st_size != rows * 8:
+                ids_file.truncate(rows * 8)
+            vec_file.write(vectors.tobytes())
+            vec_file.flush()
+            ids_file.write(row_ids.tobytes())
+            ids_file.flush()
+
+        self.refresh()
+        return len(row_ids)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the ``k`` live rows most similar to the query.
+
+        Args:
+            query: Raw query embedding
+            k: Number of results to return
+
+        Returns:
+            Tuple of (row_ids, cosine_similarities), best match first
+        """
+        self.refresh()
+        query = normalize(query)
+        with self._lock:
+            size = self._size
+            ids = self._ids[:size]
+            live = self._live
+            scores = self._vectors[:size] @ query
+
+        n_live = int(live.sum())
+        if k <= 0 or n_live == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = np.where(live, scores, -np.inf)
+        k = min(k, n_live)
+        top = np.argpartition(-scores, k - 1)[:k] if k < size else np.flatnonzero(live)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return np.asarray(ids[top]), scores[top]
+
+    def check(self, db_path: str, table: str) -> Dict[str, Any]:
+        """
+        Compare the sidecar against the embeddings stored in SQLite.
+
+        Args:
+            db_path: Path of the SQLite database
+            table: Table holding the ``embedding`` column
+
+        Returns:
+            Dictionary with row counts and the number of missing, orphaned
+            and mismatched rows; ``consistent`` is True when all are zero
+        """
+        self.refresh()
+        db_ids, db_vectors = read_embeddings(db_path, table, self.dim)
+        db_vectors = normalize(db_vectors) if len(db_ids) else db_vectors
+
+        live_ids = np.asarray(self._ids[:self._size])[self._live]
+        live_vectors = np.asarray(self._vectors[:self._size])[self._live]
+
+        common, db_pos, side_pos = np.intersect1d(db_ids, live_ids, return_indices=True)
+        if len(common):
+            diff = np.abs(db_vectors[db_pos] - live_vectors[side_pos]).max(axis=1)
+            mismatched = int((diff > 1e-4).sum())
+        else:
+            mismatched = 0
+
+        report = {
+            "db_rows": int(len(db_ids)),
+            "sidecar_rows": int(len(live_ids)),
+            "missing": int(len(np.setdiff1d(db_ids, live_ids))),
+            "orphaned": int(len(np.setdiff1d(live_ids, db_ids))),
+            "mismatched": mismatched,
+        }
+        report["consistent"] = not (report["missing"] or report["orphaned"] or report["mismatched"])
+        return report
+
+    def rebuild(self, db_path: str, table: str) -> int:
+        """
+        Rewrite the sidecar from the embeddings stored in SQLite.
+
+        The new files are written next to the old ones and swapped in under
+        the exclusive lock of the old ``.ids`` file, so concurrent readers
+        and writers never see a half-written or mismatched sidecar.
+
+        Args:
+            db_path: Path of the SQLite database
+            table: Table holding the ``embedding`` column
+
+        Returns:
+            Number of rows written
+        """
+        db_ids, db_vectors = read_embeddings(db_path, table, self.dim)
+        db_vectors = normalize(db_vectors) if len(db_ids) else db_vectors
+
+        tmp_vec, tmp_ids = self.vec_path + ".tmp", self.ids_path + ".tmp"
+        with open(tmp_vec, "wb") as f:
+            f.write(self._header(self.dim))
+            f.write(np.ascontiguousarray(db_vectors, dtype=np.float32).tobytes())
+        with open(tmp_ids, "wb") as f:
+            f.write(np.asarray(db_ids, dtype=np.int64).tobytes())
+        with self._locked_ids(exclusive=True):
+            os.replace(tmp_vec, self.vec_path)
+            os.replace(tmp_ids, self.ids_path)
+
+        self.refresh()
+        return int(len(db_ids))
@@ -0,0 +1,327 @@
+"""
+Batched embedding helpers shared by Repartee's memory stores.
+
+The embeddings endpoint accepts a list of inputs, so bulk imports split
+their texts into chunks bounded by item count and total tokens and embed
+each chunk with a single request. A failing chunk is retried item by
+item, so one bad input only loses its own embedding.
+
+Embeddings come from the provider set in ``config.embeddings``: the
+OpenAI endpoint, a local sentence-transformers model, or an ONNX model
+run on the CPU. Local models are loaded once per process and shared by
+every store.
+"""
+
+import os
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Stores that may override embedding settings (see store_settings)
+STORES = ("episodic", "semantic")
+
+# Limits of the OpenAI embeddings endpoint
+MAX_BATCH_ITEMS = 2048
+MAX_BATCH_TOKENS = 300000
+MAX_ITEM_TOKENS = 8191
+
+# Texts per forward pass of local models
+LOCAL_BATCH_SIZE = 32
+
+# Tokens kept per text by ONNX models
+ONNX_MAX_LENGTH = 512
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # No tiktoken, or its BPE file cannot be downloaded (offline)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the encoding used by OpenAI embedding models.
+
+    Falls back to a conservative estimate of one token per three characters
+    when the encoding is unavailable.
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 3 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def iter_batches(texts: Sequence[str],
+                 max_items: int = MAX_BATCH_ITEMS,
+                 max_tokens: int = MAX_BATCH_TOKENS) -> Iterator[Tuple[List[int], Dict[int, str]]]:
+    """
+    Split texts into chunks that fit in a single embeddings request.
+
+    Args:
+        texts: Texts to embed
+        max_items: Maximum number of inputs per request
+        max_tokens: Maximum total tokens per request
+
+    Yields:
+        Tuples of (indices of the chunk's texts, errors for texts that can
+        never be embedded, keyed by index)
+    """
+    batch, errors, batch_tokens = [], {}, 0
+    for index, text in enumerate(texts):
+        if not text or not text.strip():
+            errors[index] = "empty text"
+            continue
+        tokens = count_tokens(text)
+        if tokens > MAX_ITEM_TOKENS:
+            errors[index] = f"text is {tokens} tokens, limit is {MAX_ITEM_TOKENS}"
+            continue
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch, errors
+            batch, errors, batch_tokens = [], {}, 0
+        batch.append(index)
+        batch_tokens += tokens
+    if batch or errors:
+        yield batch, errors
+
+
+def embed_batches(embed_fn: Callable[[List[str]], np.ndarray],
+                  texts: Sequence[str],
+                  max_items: int = MAX_BATCH_ITEMS,
+                  max_tokens: int = MAX_BATCH_TOKENS
+                  ) -> Iterator[Tuple[List[int], List[Optional[np.ndarray]], Dict[int, str]]]:
+    """
+    Embed texts chunk by chunk, one request per chunk.
+
+    Args:
+        embed_fn: Function embedding a list of texts into a 2-D array
+        texts: Texts to embed
+        max_items: Maximum number of inputs per request
+        max_tokens: Maximum total tokens per request
+
+    Yields:
+        Tuples of (indices, embeddings, errors) for every chunk. Indices
+        cover every text of the chunk, including failed ones; a failed
+        text has ``None`` as its embedding and an entry in ``errors``.
+    """
+    for batch, errors in iter_batches(texts, max_items, max_tokens):
+        vectors = {}
+        if batch:
+            try:
+                embedded = embed_fn([texts[i] for i in batch])
+                vectors.update(zip(batch, embedded))
+            except Exception:
+                # Isolate the failing inputs instead of dropping the chunk
+                for i in batch:
+                    try:
+                        vectors[i] = embed_fn([texts[i]])[0]
+                    except Exception as e:
+                        errors[i] = str(e)
+
+        indices = sorted(set(batch) | set(errors))
+        yield indices, [vectors.get(i) for i in indices], errors
+
+
+def store_settings(store: str) -> Dict[str, Any]:
+    """
+    Return the embedding settings of one memory store.
+
+    Keys of ``config.embeddings`` apply to every store; a nested mapping
+    named after the store (``episodic`` or ``semantic``) overrides them.
+
+    Args:
+        store: Store name
+
+    Returns:
+        Merged settings, without the nested per-store mappings
+    """
+    from ..config import config
+    settings = {k: v for k, v in config.embeddings.items() if k not in STORES}
+    settings.update(config.embeddings.get(store) or {})
+    return settings
+
+
+def truncate_embeddings(vectors: np.ndarray, dim: Optional[int]) -> np.ndarray:
+    """
+    Shorten embeddings to their first ``dim`` components and renormalise them.
+
+    Matryoshka-trained models such as OpenAI's text-embedding-3 family
+    keep most of their quality under this truncation.
+
+    Args:
+        vectors: 2-D float array
+        dim: Target dimensionality (None or at least the current one keeps
+            the vectors as they are)
+
+    Returns:
+        Float32 array of unit-length rows
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not dim or dim >= vectors.shape[-1]:
+        return vectors
+    vectors = vectors[..., :dim]
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def openai_embed_fn(client, model: str,
+                    dimensions: Optional[int] = None) -> Callable[[List[str]], np.ndarray]:
+    """
+    Build a batch embedding function backed by the OpenAI embeddings endpoint.
+
+    Args:
+        client: ``openai.OpenAI`` client
+        model: Embedding model name
+        dimensions: Output dimensionality. text-embedding-3 models shorten
+            their output server-side; other models are truncated locally.
+
+    Returns:
+        Function mapping a list of texts to a float32 array, one row per text
+    """
+    native = dimensions and model.startswith("text-embedding-3")
+    kwargs = {"dimensions": dimensions} if native else {}
+
+    def embed(texts: List[str]) -> np.ndarray:
+        response = client.embeddings.create(input=texts, model=model, **kwargs)
+        data = sorted(response.data, key=lambda item: item.index)
+        vectors = np.array([item.embedding for item in data], dtype=np.float32)
+        return vectors if native else truncate_embeddings(vectors, dimensions)
+    return embed
+
+
+# Models load once per process; the lock keeps threads from loading twice
+_model_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _sentence_transformer(model: str, threads: Optional[int]):
+    from sentence_transformers import SentenceTransformer
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    return SentenceTransformer(model, device="cpu")
+
+
+@lru_cache(maxsize=4)
+def _onnx_model(model_dir: str, threads: Optional[int]):
+    import onnxruntime
+    from tokenizers import Tokenizer
+    options = onnxruntime.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    session = onnxruntime.InferenceSession(os.path.join(model_dir, "model.onnx"), options,
+                                           providers=["CPUExecutionProvider"])
+    tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+    tokenizer.enable_truncation(max_length=ONNX_MAX_LENGTH)
+    tokenizer.enable_padding()
+    return session, tokenizer
+
+
+def local_embed_fn(model: str, dimensions: Optional[int] = None,
+                   threads: Optional[int] = None,
+                   batch_size: int = LOCAL_BATCH_SIZE) -> Callable[[List[str]], np.ndarray]:
+    """
+    Build a batch embedding function backed by a local sentence-transformers model.
+
+    The model is loaded on the first call and shared by every store in
+    the process.
+
+    Args:
+        model: Model name or path
+        dimensions: Output dimensionality (truncated and renormalised)
+        threads: CPU threads used by torch, None for its default
+        batch_size: Texts per forward pass
+
+    Returns:
+        Function mapping a list of texts to a float32 array, one row per text
+    """
+    def embed(texts: List[str]) -> np.ndarray:
+        with _model_lock:
+            encoder = _sentence_transformer(model, threads)
+        vectors = encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                 normalize_embeddings=True)
+        return truncate_embeddings(vectors, dimensions)
+    return embed
+
+
+def onnx_embed_fn(model_dir: str, dimensions: Optional[int] = None,
+                  threads: Optional[int] = None,
+                  batch_size: int = LOCAL_BATCH_SIZE) -> Callable[[List[str]], np.ndarray]:
+    """
+    Build a batch embedding function backed by an ONNX model on the CPU.
+
+    Needs only ``onnxruntime`` and ``tokenizers``. The directory holds a
+    sentence embedding model exported as ``model.onnx`` with its
+    ``tokenizer.json``; token states are mean-pooled over the attention
+    mask. Texts are encoded in batches of similar length to keep padding
+    short.
+
+    Args:
+        model_dir: Directory with ``model.onnx`` and ``tokenizer.json``
+        dimensions: Output dimensionality (truncated and renormalised)
+        threads: Intra-op CPU threads, None for the runtime's default
+        batch_size: Texts per forward pass
+
+    Returns:
+        Function mapping a list of texts to a float32 array, one row per text
+    """
+    model_dir = os.path.expanduser(model_dir)
+
+    def embed(texts: List[str]) -> np.ndarray:
+        with _model_lock:
+            session, tokenizer = _onnx_model(model_dir, threads)
+        inputs = {node.name for node in session.get_inputs()}
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        pooled = []
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            encodings = tokenizer.encode_batch([texts[i] for i in batch])
+            ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in inputs:
+                feeds["token_type_ids"] = np.zeros_like(ids)
+            states = session.run(None, feeds)[0]
+            counts = np.maximum(mask.sum(axis=1, keepdims=True), 1)
+            pooled.append((states * mask[..., None]).sum(axis=1) / counts)
+
+        # Back to input order
+        vectors = np.empty((len(texts), pooled[0].shape[1]), dtype=np.float32)
+        vectors[order] = np.concatenate(pooled)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return truncate_embeddings(vectors / norms, dimensions)
+    return embed
+
+
+def provider_embed_fn(settings: Dict[str, Any],
+                      client: Callable[[], Any]) -> Callable[[List[str]], np.ndarray]:
+    """
+    Build the batch embedding function of a store's configured provider.
+
+    Args:
+        settings: Store settings (see :func:`store_settings`)
+        client: Returns the OpenAI client; only called for the ``openai``
+            provider, so offline providers never need an API key
+
+    Returns:
+        Function mapping a list of texts to a float32 array, one row per text
+    """
+    provider = settings.get("provider", "openai")
+    dimensions = settings.get("dimensions")
+    threads = settings.get("threads")
+    batch_size = settings.get("encode_batch_size") or LOCAL_BATCH_SIZE
+    if provider == "openai":
+        return openai_embed_fn(client(), settings["model"], dimensions)
+    if provider == "local":
+        return local_embed_fn(settings["model"], dimensions, threads, batch_size)
+    if provider == "onnx":
+        return onnx_embed_fn(settings["model"], dimensions, threads, batch_size)
+    raise ValueError(f"Unsupported embedding provider: {provider}")
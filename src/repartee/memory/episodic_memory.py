@@ -6,16 +6,139 @@ past conversations using vector embeddings.
 """
 
 import os
+import re
+import glob
 import json
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple, Union
 
 import numpy as np
-from openai import OpenAI
 
 from ..config import get_api_key
+from .compaction import (DIGEST_ROLE, compaction_cutoff, extractive_digest,
+                         incremental_vacuum, storage_bytes)
+from .database import get_connection_manager
+from .embedding_cache import get_embedding_cache
+from .embedding_queue import BackgroundEmbedder
+from .embedding_store import EmbeddingSidecar
+from .embeddings import count_tokens, embed_batches, provider_embed_fn, store_settings
+from .quantization import encode_embedding, migrate_embedding_encoding
+from .vector_index import (open_vector_index, reproject_embeddings, rerank, score_rows,
+                           search_index, stored_dimension, sync_vector_index)
+
+# Background embedding attempts per row before it waits for the next start
+MAX_EMBED_ATTEMPTS = 3
+
+# Rank offset of reciprocal-rank fusion in hybrid search
+RRF_K = 60
+
+# Share of a search score subject to recency decay when a half-life is given
+RECENCY_WEIGHT = 0.5
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn free text into a safe FTS5 query.
+    
+    Every whitespace-separated chunk becomes a quoted phrase of its word
+    tokens (so ``main.py`` matches "main py" and ``ERR_CONN_RESET`` stays
+    whole), and the phrases are OR-ed so BM25 ranks messages matching
+    more of them higher.
+    
+    Args:
+        text: User query
+        
+    Returns:
+        FTS5 MATCH expression, empty if the text has no word tokens
+    """
+    phrases = []
+    for chunk in text.split():
+        tokens = re.findall(r"\w+", chunk)
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"')
+    return " OR ".join(dict.fromkeys(phrases))
+
+
+def message_filters(conversation_id: Optional[str] = None,
+                    roles: Optional[Iterable[str]] = None,
+                    since: Optional[Union[str, datetime]] = None,
+                    until: Optional[Union[str, datetime]] = None) -> Tuple[str, List[Any]]:
+    """
+    Build the SQL condition restricting a search over ``messages``.
+    
+    Args:
+        conversation_id: Only this conversation
+        roles: Only these roles
+        since: Only messages at or after this ISO timestamp or datetime
+        until: Only messages before this ISO timestamp or datetime
+        
+    Returns:
+        Tuple of (condition on ``messages`` columns, empty when unfiltered;
+        its parameters)
+    """
+    clauses, params = [], []
+    if conversation_id is not None:
+        clauses.append("messages.conversation_id = ?")
+        params.append(conversation_id)
+    if roles is not None:
+        roles = list(roles)
+        clauses.append(f"messages.role IN ({','.join('?' * len(roles))})")
+        params.extend(roles)
+    if since is not None:
+        clauses.append("messages.timestamp >= ?")
+        params.append(since.isoformat() if isinstance(since, datetime) else since)
+    if until is not None:
+        clauses.append("messages.timestamp < ?")
+        params.append(until.isoformat() if isinstance(until, datetime) else until)
+    return " AND ".join(clauses), params
+
+
+def message_ages(timestamps: List[Optional[str]]) -> np.ndarray:
+    """
+    Return the age in days of ISO timestamps; unparsable ones count as infinitely old.
+    
+    Args:
+        timestamps: ISO 8601 timestamps as stored in ``messages``
+        
+    Returns:
+        Float array of ages in days
+    """
+    try:
+        parsed = np.array(timestamps, dtype="datetime64[us]")
+    except (ValueError, TypeError):
+        parsed = np.empty(len(timestamps), dtype="datetime64[us]")
+        for i, timestamp in enumerate(timestamps):
+            try:
+                parsed[i] = np.datetime64(timestamp, "us")
+            except (ValueError, TypeError):
+                parsed[i] = np.datetime64("NaT")
+    now = np.datetime64(datetime.now(), "us")
+    ages = (now - parsed) / np.timedelta64(1, "D")
+    return np.where(np.isnat(parsed), np.inf, np.maximum(ages, 0.0))
+
+
+def fuse_rankings(rankings: Dict[str, Tuple[List[int], List[float]]],
+                  limit: int) -> Tuple[List[int], Dict[int, float], Dict[int, Dict[str, float]]]:
+    """
+    Merge rankings with reciprocal-rank fusion.
+    
+    Args:
+        rankings: (ids, scores) of every ranking, best first, keyed by the
+            name its scores are reported under
+        limit: Maximum number of ids to keep
+        
+    Returns:
+        Tuple of (best ``limit`` ids, fused score by id, per-ranking scores by id)
+    """
+    fused: Dict[int, float] = {}
+    details: Dict[int, Dict[str, float]] = {}
+    for name, (ids, scores) in rankings.items():
+        for rank, (msg_id, score) in enumerate(zip(ids, scores)):
+            fused[msg_id] = fused.get(msg_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            details.setdefault(msg_id, {})[name] = score
+    return sorted(fused, key=fused.get, reverse=True)[:limit], fused, details
 
 
 class EpisodicMemory:
@@ -42,33 +165,73 @@ class EpisodicMemory:
             db_path = str(db_dir / "episodic_memory.db")
             
         self.db_path = db_path
+        self._db = get_connection_manager(db_path)
         self._init_database()
         
         # Basic in-memory storage for compatibility with old code
         self.memory = []
         
-        # Initialize embedding API client
-        api_key = get_api_key("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OpenAI API key not found. Embeddings require an API key.")
-        self.client = OpenAI(api_key=api_key)
+        # Cached embedding index, loaded on the first search
+        self._matrix = None
+        
+        # Lowest pending row id at the last index sync (see _sync_matrix)
+        self._pending_floor = None
+        
+        # Embedding API client, created on first use
+        self._client = None
+        
+        # Background embedder, started by the first deferred add or by the
+        # first search that finds rows left pending by a previous run
+        self._embedder = None
+        
+    @property
+    def client(self):
+        """
+        OpenAI client used for embeddings, created on first use so that
+        read-only operations work without an API key.
+        """
+        if self._client is None:
+            from openai import OpenAI
+            api_key = get_api_key("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OpenAI API key not found. Embeddings require an API key.")
+            self._client = OpenAI(api_key=api_key)
+        return self._client
         
     def _init_database(self):
         """Set up the SQLite database schema if it doesn't exist."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create tables if they don't exist
+        with self._db.transaction() as conn:
+            self._create_schema(conn.cursor())
+            
+    def _create_schema(self, cursor: sqlite3.Cursor):
+        """Create tables and indexes inside an open transaction."""
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS conversations (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             conversation_id TEXT NOT NULL,
             timestamp TEXT NOT NULL,
             title TEXT,
-            metadata TEXT
+            metadata TEXT,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            last_activity TEXT,
+            compacted_through TEXT
         )
         ''')
         
+        # Databases created before the counters existed get them backfilled once
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(conversations)")}
+        if "message_count" not in columns:
+            cursor.execute(
+                "ALTER TABLE conversations ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0"
+            )
+            cursor.execute("ALTER TABLE conversations ADD COLUMN last_activity TEXT")
+            backfill = True
+        else:
+            backfill = False
+        if "compacted_through" not in columns:
+            # Timestamp of the newest message summarised by a digest (see compact)
+            cursor.execute("ALTER TABLE conversations ADD COLUMN compacted_through TEXT")
+
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS messages (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -76,17 +239,119 @@ class EpisodicMemory:
             role TEXT NOT NULL,
             content TEXT NOT NULL,
             timestamp TEXT NOT NULL,
-            embedding BLOB
+            embedding BLOB,
+            embedding_encoding TEXT
         )
         ''')
         
+        # Label legacy embeddings and convert float64 ones to float32
+        migrate_embedding_encoding(cursor, "messages")
+        
         # Create indexes for faster querying
+        # Conversation reads walk this index in order; it also serves plain
+        # conversation_id lookups, so the older single-column index is dropped
         cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_conversation_id ON messages(conversation_id)
+        CREATE INDEX IF NOT EXISTS idx_messages_conversation 
+        ON messages(conversation_id, timestamp, id)
+        ''')
+        cursor.execute('DROP INDEX IF EXISTS idx_conversation_id')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)')
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_conv_conversation_id ON conversations(conversation_id)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_conv_timestamp ON conversations(timestamp, id)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_conv_last_activity ON conversations(last_activity, id)'
+        )
+        
+        if backfill:
+            cursor.execute('''
+            UPDATE conversations SET
+                message_count = (SELECT COUNT(*) FROM messages m
+                                 WHERE m.conversation_id = conversations.conversation_id),
+                last_activity = COALESCE((SELECT MAX(m.timestamp) FROM messages m
+                                          WHERE m.conversation_id = conversations.conversation_id),
+                                         timestamp)
+            ''')
+        
+        # Messages stored without an embedding, waiting for the background embedder
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pending_embeddings (
+            message_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        
+        # One row per compaction run; finished_at stays NULL if it was interrupted
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS compaction_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT NOT NULL,
+            finished_at TEXT,
+            conversations INTEGER NOT NULL DEFAULT 0,
+            messages_summarized INTEGER NOT NULL DEFAULT 0,
+            vectors_deleted INTEGER NOT NULL DEFAULT 0,
+            messages_deleted INTEGER NOT NULL DEFAULT 0,
+            bytes_reclaimed INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        
+        # Rows that exhausted their attempts in a previous run get a fresh start
+        cursor.execute("UPDATE pending_embeddings SET attempts = 0 WHERE attempts > 0")
+        
+        self._fts = self._create_fts(cursor)
+        
+    def _create_fts(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Create the full-text index mirroring ``messages``, kept in sync by triggers.
+        
+        Returns:
+            False if this SQLite build lacks FTS5 (lexical search is then disabled)
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+        ).fetchone() is not None
+        
+        try:
+            # Underscores are token characters so snake_case identifiers and
+            # error codes match as a whole
+            cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                content,
+                content='messages',
+                content_rowid='id',
+                tokenize="unicode61 remove_diacritics 2 tokenchars '_'"
+            )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"Warning: Full-text search unavailable: {e}")
+            return False
+            
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) 
+            VALUES ('delete', old.id, old.content);
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) 
+            VALUES ('delete', old.id, old.content);
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END
         ''')
         
-        conn.commit()
-        conn.close()
+        # Index the messages stored before the full-text index existed
+        if not exists:
+            cursor.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+        return True
         
     def _get_embedding(self, text: str) -> np.ndarray:
         """
@@ -98,12 +363,86 @@ class EpisodicMemory:
         Returns:
             Numpy array containing the embedding vector
         """
-        from ..config import config
-        response = self.client.embeddings.create(
-            input=text,
-            model=config.embeddings["model"]
-        )
-        return np.array(response.data[0].embedding)
+        return self._embed_batch([text])[0]
+    
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed a list of texts, requesting only those not in the embedding cache."""
+        return get_embedding_cache().embed(texts, self._request_embeddings,
+                                           store_settings("episodic"))
+    
+    def _request_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Embed a list of texts with the configured provider, bypassing the cache."""
+        return provider_embed_fn(store_settings("episodic"), lambda: self.client)(texts)
+    
+    def _sync_matrix(self, dim: int):
+        """
+        Return the cached embedding index, loading rows it has not seen yet.
+        
+        Args:
+            dim: Dimensionality of the query embedding
+            
+        Returns:
+            The up-to-date embedding index
+        """
+        # Rows pending at the last sync may have been embedded since, possibly
+        # by another process, so rescan from the lowest of them
+        floor = self._pending_floor
+        self._pending_floor = self._db.connection().execute(
+            "SELECT MIN(message_id) FROM pending_embeddings"
+        ).fetchone()[0]
+        if self._pending_floor is not None:
+            self.start_background_embedding()
+        
+        if self._matrix is None or self._matrix.dim != dim:
+            self._matrix = open_vector_index(self.db_path, "messages", dim,
+                                             store_settings("episodic"))
+            return self._matrix
+        after_id = self._matrix.max_id
+        if floor is not None:
+            after_id = min(after_id, floor - 1)
+        return sync_vector_index(self._matrix, self.db_path, "messages", after_id=after_id)
+    
+    def check_embeddings(self) -> Dict[str, Any]:
+        """
+        Check that the embedding sidecar file matches the database.
+        
+        Returns:
+            Consistency report (see ``EmbeddingSidecar.check``)
+        """
+        dim = stored_dimension(self.db_path, "messages")
+        if not dim:
+            return {"db_rows": 0, "consistent": True}
+        return EmbeddingSidecar(self.db_path, dim).check(self.db_path, "messages")
+    
+    def rebuild_embeddings(self) -> int:
+        """
+        Rebuild the embedding sidecar file from the database.
+        
+        Returns:
+            Number of embeddings written
+        """
+        dim = stored_dimension(self.db_path, "messages")
+        if not dim:
+            return 0
+        self._matrix = None
+        return EmbeddingSidecar(self.db_path, dim).rebuild(self.db_path, "messages")
+    
+    def reproject_embeddings(self, dim: Optional[int] = None) -> Dict[str, int]:
+        """
+        Truncate stored message embeddings to a shorter dimensionality.
+        
+        Args:
+            dim: Target dimensionality, defaults to the configured
+                ``dimensions`` of the episodic store
+            
+        Returns:
+            Row counts (see ``vector_index.reproject_embeddings``)
+        """
+        dim = dim or store_settings("episodic").get("dimensions")
+        if not dim:
+            raise ValueError("No embedding dimensions configured for the episodic store")
+        self._matrix = None
+        return reproject_embeddings(self.db_path, "messages", dim)
     
     # Legacy methods for backwards compatibility
     def add(self, information):
@@ -157,7 +496,8 @@ class EpisodicMemory:
                    role: str, 
                    content: str, 
                    conversation_id: str = "default",
-                   timestamp: str = None):
+                   timestamp: str = None,
+                   defer_embedding: bool = False) -> int:
         """
         Add a single message to the episodic memory.
         
@@ -166,184 +506,944 @@ class EpisodicMemory:
             content: The content of the message
             conversation_id: Identifier for the conversation this message belongs to
             timestamp: Optional timestamp, defaults to current time
+            defer_embedding: Store the message right away and let the
+                background embedder compute its embedding
+                
+        Returns:
+            ID of the stored message
         """
         if timestamp is None:
             timestamp = datetime.now().isoformat()
             
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Generate embedding before taking the write lock
+        embedding_bytes = encoding = None
+        if not defer_embedding:
+            try:
+                embedding = self._get_embedding(content)
+                embedding_bytes, encoding = encode_embedding(embedding)
+            except Exception as e:
+                # If embedding fails, store without it
+                print(f"Warning: Failed to generate embedding: {e}")
         
-        # Check if conversation exists, create if not
-        cursor.execute(
-            "SELECT COUNT(*) FROM conversations WHERE conversation_id = ?", 
-            (conversation_id,)
-        )
-        
-        if cursor.fetchone()[0] == 0:
+        with self._db.transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Bump the conversation's counters, creating it if needed
+            cursor.execute(
+                '''
+                UPDATE conversations 
+                SET message_count = message_count + 1, 
+                    last_activity = MAX(COALESCE(last_activity, ''), ?) 
+                WHERE conversation_id = ?
+                ''', 
+                (timestamp, conversation_id)
+            )
+            
+            if cursor.rowcount == 0:
+                cursor.execute(
+                    '''
+                    INSERT INTO conversations 
+                    (conversation_id, timestamp, title, message_count, last_activity) 
+                    VALUES (?, ?, ?, 1, ?)
+                    ''', 
+                    (conversation_id, timestamp, f"Conversation {conversation_id}", timestamp)
+                )
+            
+            # Store message
             cursor.execute(
                 '''
-                INSERT INTO conversations (conversation_id, timestamp, title) 
-                VALUES (?, ?, ?)
+                INSERT INTO messages 
+                (conversation_id, role, content, timestamp, embedding, embedding_encoding) 
+                VALUES (?, ?, ?, ?, ?, ?)
                 ''', 
-                (conversation_id, timestamp, f"Conversation {conversation_id}")
+                (conversation_id, role, content, timestamp, embedding_bytes, encoding)
             )
+            message_id = cursor.lastrowid
+            
+            if defer_embedding:
+                cursor.execute(
+                    "INSERT INTO pending_embeddings (message_id) VALUES (?)",
+                    (message_id,)
+                )
         
-        # Generate embedding
-        try:
-            embedding = self._get_embedding(content)
-            embedding_bytes = embedding.tobytes()
-        except Exception as e:
-            # If embedding fails, store without it
-            print(f"Warning: Failed to generate embedding: {e}")
-            embedding_bytes = None
+        if defer_embedding:
+            self.start_background_embedding().notify()
         
-        # Store message
-        cursor.execute(
-            '''
-            INSERT INTO messages (conversation_id, role, content, timestamp, embedding) 
-            VALUES (?, ?, ?, ?, ?)
-            ''', 
-            (conversation_id, role, content, timestamp, embedding_bytes)
-        )
+        # Keep an already loaded index current without rereading the table
+        elif embedding_bytes is not None and self._matrix is not None:
+            self._matrix.add(message_id, embedding)
+        
+        return message_id
+        
+    def start_background_embedding(self, workers: int = 2) -> BackgroundEmbedder:
+        """
+        Start (once) the worker threads embedding deferred messages.
+        
+        Args:
+            workers: Number of worker threads
+            
+        Returns:
+            The running background embedder
+        """
+        if self._embedder is None:
+            self._embedder = BackgroundEmbedder(self, workers=workers)
+        return self._embedder
+        
+    def pending_ids(self, limit: int, exclude: Iterable[int] = ()) -> List[int]:
+        """
+        List messages still waiting for an embedding.
+        
+        Args:
+            limit: Maximum number of ids to return
+            exclude: Ids already being embedded
+            
+        Returns:
+            Oldest pending message ids first
+        """
+        exclude = list(exclude)
+        placeholders = ",".join("?" * len(exclude))
+        rows = self._db.connection().execute(
+            f'''
+            SELECT message_id FROM pending_embeddings 
+            WHERE attempts < ? AND message_id NOT IN ({placeholders}) 
+            ORDER BY message_id LIMIT ?
+            ''',
+            [MAX_EMBED_ATTEMPTS, *exclude, limit]
+        ).fetchall()
+        return [row[0] for row in rows]
+        
+    def embed_pending(self, message_ids: List[int]) -> int:
+        """
+        Embed pending messages with one batched request and store the result.
+        
+        Args:
+            message_ids: Ids returned by ``pending_ids``
+            
+        Returns:
+            Number of messages embedded
+        """
+        if not message_ids:
+            return 0
+        placeholders = ",".join("?" * len(message_ids))
+        rows = self._db.connection().execute(
+            f"SELECT id, content FROM messages WHERE id IN ({placeholders})",
+            message_ids
+        ).fetchall()
+        
+        # Messages deleted in the meantime are simply dropped from the queue
+        embedded, failed = [], []
+        gone = set(message_ids) - {row[0] for row in rows}
+        texts = [content for _, content in rows]
+        for indices, vectors, errors in embed_batches(self._embed_batch, texts):
+            for i, vector in zip(indices, vectors):
+                if vector is None:
+                    failed.append(rows[i][0])
+                else:
+                    embedded.append((rows[i][0], vector))
+        
+        with self._db.transaction() as conn:
+            conn.executemany(
+                "UPDATE messages SET embedding = ?, embedding_encoding = ? WHERE id = ?",
+                [encode_embedding(vector) + (message_id,) for message_id, vector in embedded]
+            )
+            conn.executemany(
+                "DELETE FROM pending_embeddings WHERE message_id = ?",
+                [(message_id,) for message_id, _ in embedded] + [(i,) for i in gone]
+            )
+            conn.executemany(
+                "UPDATE pending_embeddings SET attempts = attempts + 1 WHERE message_id = ?",
+                [(message_id,) for message_id in failed]
+            )
+        
+        if embedded and self._matrix is not None:
+            self._matrix.add_many([message_id for message_id, _ in embedded],
+                                  np.stack([vector for _, vector in embedded]))
+        return len(embedded)
+        
+    def close(self, drain: bool = True, timeout: float = 10.0) -> bool:
+        """
+        Stop background embedding, by default after draining the backlog.
+        
+        Messages still pending afterwards are embedded on the next start.
+        
+        Args:
+            drain: Wait for pending messages to be embedded first
+            timeout: Maximum seconds to wait for the drain
+            
+        Returns:
+            True if no message was left pending
+        """
+        if self._embedder is None:
+            return not self.pending_ids(1)
+        embedder, self._embedder = self._embedder, None
+        return embedder.close(drain=drain, timeout=timeout)
+        
+    def add_messages(self, messages: Iterable[Dict[str, Any]]) -> Tuple[List[int], Dict[int, str]]:
+        """
+        Add many messages at once, embedding them in batched requests.
+        
+        Messages are embedded in chunks bounded by item count and tokens,
+        and every chunk is written in a single transaction. A message whose
+        embedding fails is still stored, without an embedding.
+        
+        Args:
+            messages: Dictionaries with ``role`` and ``content`` and optional
+                ``conversation_id`` and ``timestamp`` keys
+                
+        Returns:
+            Tuple of (message ids in input order, embedding errors keyed by
+            input position)
+        """
+        messages = list(messages)
+        now = datetime.now().isoformat()
+        rows = [
+            (
+                msg.get("conversation_id", "default"),
+                msg["role"],
+                msg["content"],
+                msg.get("timestamp") or now,
+            )
+            for msg in messages
+        ]
+        
+        message_ids = [None] * len(rows)
+        all_errors = {}
+        texts = [row[2] for row in rows]
+        for indices, vectors, errors in embed_batches(self._embed_batch, texts):
+            all_errors.update(errors)
+            chunk = [rows[i] for i in indices]
+            
+            with self._db.transaction() as conn:
+                # Create the chunk's missing conversations, then bump their counters
+                first_seen, counts, latest = {}, {}, {}
+                for conv_id, _, _, timestamp in chunk:
+                    first_seen.setdefault(conv_id, timestamp)
+                    counts[conv_id] = counts.get(conv_id, 0) + 1
+                    latest[conv_id] = max(latest.get(conv_id, timestamp), timestamp)
+                conn.executemany(
+                    '''
+                    INSERT INTO conversations (conversation_id, timestamp, title) 
+                    SELECT ?, ?, ? 
+                    WHERE NOT EXISTS (SELECT 1 FROM conversations WHERE conversation_id = ?)
+                    ''',
+                    [(c, ts, f"Conversation {c}", c) for c, ts in first_seen.items()]
+                )
+                conn.executemany(
+                    '''
+                    UPDATE conversations 
+                    SET message_count = message_count + ?, 
+                        last_activity = MAX(COALESCE(last_activity, ''), ?) 
+                    WHERE conversation_id = ?
+                    ''',
+                    [(counts[c], latest[c], c) for c in counts]
+                )
+                
+                conn.executemany(
+                    '''
+                    INSERT INTO messages 
+                    (conversation_id, role, content, timestamp, embedding, embedding_encoding) 
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ''',
+                    [row + ((None, None) if vec is None else encode_embedding(vec))
+                     for row, vec in zip(chunk, vectors)]
+                )
+                
+                # AUTOINCREMENT ids are consecutive inside one write transaction
+                last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            
+            chunk_ids = range(last_id - len(chunk) + 1, last_id + 1)
+            for i, message_id in zip(indices, chunk_ids):
+                message_ids[i] = message_id
+                
+            # Keep an already loaded index current without rereading the table
+            embedded = [(mid, vec) for mid, vec in zip(chunk_ids, vectors) if vec is not None]
+            if embedded and self._matrix is not None:
+                self._matrix.add_many([mid for mid, _ in embedded],
+                                      np.stack([vec for _, vec in embedded]))
         
-        conn.commit()
-        conn.close()
+        return message_ids, all_errors
         
-    def search_similar(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    def search_similar(self, query: str, limit: int = 5,
+                       conversation_id: Optional[str] = None,
+                       roles: Optional[Iterable[str]] = None,
+                       since: Optional[Union[str, datetime]] = None,
+                       until: Optional[Union[str, datetime]] = None,
+                       half_life_days: Optional[float] = None) -> List[Dict[str, Any]]:
         """
         Search for messages similar to the query across all conversations.
         
+        Messages whose embedding is still pending are not searched. Filters
+        are applied in SQL before scoring, so only the matching slice of
+        messages is compared with the query.
+        
         Args:
             query: The search query
             limit: Maximum number of results to return
+            conversation_id: Only search this conversation
+            roles: Only search messages from these roles
+            since: Only search messages at or after this time
+            until: Only search messages before this time
+            half_life_days: Favour recent messages: a message this many days
+                old loses a quarter of its score (see ``RECENCY_WEIGHT``)
             
         Returns:
             List of message dictionaries with similarity scores
         """
+        filters = message_filters(conversation_id, roles, since, until)
+        top_ids, scores = self._vector_candidates(query, limit, filters, half_life_days)
+        rows = self._fetch_messages(top_ids)
+        
+        results = []
+        for msg_id, similarity in zip(top_ids, scores):
+            if msg_id in rows:
+                results.append(dict(rows[msg_id], similarity=similarity))
+        return results
+    
+    def search_lexical(self, query: str, limit: int = 5,
+                       conversation_id: Optional[str] = None,
+                       roles: Optional[Iterable[str]] = None,
+                       since: Optional[Union[str, datetime]] = None,
+                       until: Optional[Union[str, datetime]] = None,
+                       half_life_days: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Search messages by keywords with the full-text index, ranked by BM25.
+        
+        Needs no embedding request, so it works offline and answers in
+        milliseconds; exact identifiers, file names and error codes are
+        matched as written.
+        
+        Args:
+            query: The search query
+            limit: Maximum number of results to return
+            conversation_id, roles, since, until, half_life_days: As for
+                ``search_similar``
+            
+        Returns:
+            List of message dictionaries with ``bm25`` scores (higher is better)
+        """
+        filters = message_filters(conversation_id, roles, since, until)
+        top_ids, scores = self._lexical_candidates(query, limit, filters, half_life_days)
+        rows = self._fetch_messages(top_ids)
+        return [dict(rows[msg_id], bm25=score)
+                for msg_id, score in zip(top_ids, scores) if msg_id in rows]
+    
+    def search(self, query: str, limit: int = 5, mode: str = "hybrid",
+               conversation_id: Optional[str] = None,
+               roles: Optional[Iterable[str]] = None,
+               since: Optional[Union[str, datetime]] = None,
+               until: Optional[Union[str, datetime]] = None,
+               half_life_days: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Search messages lexically, semantically, or both.
+        
+        Hybrid mode merges the BM25 and cosine rankings with reciprocal-rank
+        fusion: every message scores ``sum(1 / (RRF_K + rank))`` over the
+        rankings it appears in. If the query cannot be embedded (offline, no
+        API key) hybrid search falls back to lexical results.
+        
+        Args:
+            query: The search query
+            limit: Maximum number of results to return
+            mode: "hybrid", "lexical" or "vector"
+            conversation_id, roles, since, until, half_life_days: As for
+                ``search_similar``; recency applies to both rankings
+            
+        Returns:
+            List of message dictionaries with a fused ``score``, plus
+            ``bm25`` and/or ``similarity`` for the rankings they came from
+        """
+        options = dict(conversation_id=conversation_id, roles=roles, since=since,
+                       until=until, half_life_days=half_life_days)
+        if mode == "lexical":
+            return [dict(r, score=r["bm25"]) for r in self.search_lexical(query, limit, **options)]
+        if mode == "vector":
+            return [dict(r, score=r["similarity"]) for r in self.search_similar(query, limit, **options)]
+        if mode != "hybrid":
+            raise ValueError(f"Unknown search mode: {mode}")
+            
+        # Deeper candidate lists so that fusion can promote items ranked
+        # moderately well by both retrievers
+        depth = max(limit * 4, 20)
+        filters = message_filters(conversation_id, roles, since, until)
+        rankings = {"bm25": self._lexical_candidates(query, depth, filters, half_life_days)}
+        try:
+            rankings["similarity"] = self._vector_candidates(query, depth, filters, half_life_days)
+        except Exception as e:
+            print(f"Warning: Vector search unavailable, using keywords only: {e}")
+            
+        top, fused, details = fuse_rankings(rankings, limit)
+        rows = self._fetch_messages(top)
+        return [dict(rows[msg_id], score=fused[msg_id], **details[msg_id])
+                for msg_id in top if msg_id in rows]
+    
+    def _vector_candidates(self, query: str, limit: int,
+                           filters: Tuple[str, List[Any]] = ("", []),
+                           half_life_days: Optional[float] = None) -> Tuple[List[int], List[float]]:
+        """Return the ids and cosine scores of the messages closest to the query."""
         query_embedding = self._get_embedding(query)
+        matrix = self._sync_matrix(len(query_embedding))
+        where, params = filters
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Over-fetch when re-ranking by recency
+        depth = limit if half_life_days is None else max(limit * 10, 100)
+        if where:
+            # Score only the filtered slice, exactly
+            rows = self._db.connection().execute(
+                f"SELECT id, timestamp FROM messages WHERE embedding IS NOT NULL AND {where}",
+                params
+            ).fetchall()
+            timestamps = dict(rows)
+            row_ids, scores = score_rows(matrix, query_embedding, timestamps)
+            row_ids, scores = rerank(matrix, self.db_path, "messages", query_embedding,
+                                     row_ids, scores, depth)
+        else:
+            row_ids, scores = search_index(matrix, self.db_path, "messages", query_embedding, depth)
+            timestamps = None
+            
+        return self._rank(row_ids.tolist(), scores, limit, half_life_days, timestamps)
+    
+    def _lexical_candidates(self, query: str, limit: int,
+                            filters: Tuple[str, List[Any]] = ("", []),
+                            half_life_days: Optional[float] = None) -> Tuple[List[int], List[float]]:
+        """Return the ids and BM25 scores of the best keyword matches."""
+        match = fts_query(query)
+        if not self._fts or not match:
+            return [], []
+        where, params = filters
+        join = ""
+        if where:
+            join = "JOIN messages ON messages.id = messages_fts.rowid"
+            where = "AND " + where
+        depth = limit if half_life_days is None else max(limit * 10, 100)
+        rows = self._db.connection().execute(
+            f"""
+            SELECT messages_fts.rowid, bm25(messages_fts) 
+            FROM messages_fts {join} 
+            WHERE messages_fts MATCH ? {where} 
+            ORDER BY rank 
+            LIMIT ?
+            """, 
+            [match] + params + [depth]
+        ).fetchall()
+        # FTS5's bm25() is negated so that ORDER BY ascending puts best first
+        return self._rank([row[0] for row in rows], np.array([-row[1] for row in rows]),
+                          limit, half_life_days)
+    
+    def _rank(self, row_ids: List[int], scores: np.ndarray, limit: int,
+              half_life_days: Optional[float] = None,
+              timestamps: Optional[Dict[int, str]] = None) -> Tuple[List[int], List[float]]:
+        """
+        Keep the ``limit`` best-scored rows, optionally weighted by recency.
         
-        # Get all messages with their embeddings
-        cursor.execute(
-            "SELECT id, conversation_id, role, content, timestamp, embedding FROM messages"
+        With a half-life, every score is multiplied by
+        ``1 - RECENCY_WEIGHT + RECENCY_WEIGHT * 0.5 ** (age_days / half_life_days)``.
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        if half_life_days is not None and len(row_ids):
+            if timestamps is None:
+                placeholders = ",".join("?" * len(row_ids))
+                timestamps = dict(self._db.connection().execute(
+                    f"SELECT id, timestamp FROM messages WHERE id IN ({placeholders})",
+                    row_ids
+                ).fetchall())
+            ages = message_ages([timestamps.get(i) for i in row_ids])
+            decay = np.power(0.5, ages / half_life_days)
+            scores = scores * (1 - RECENCY_WEIGHT + RECENCY_WEIGHT * decay)
+            
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit] if limit > 0 else np.empty(0, dtype=np.int64)
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [row_ids[i] for i in top], [float(scores[i]) for i in top]
+    
+    def _fetch_messages(self, message_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Fetch messages by id, keyed by id."""
+        if not message_ids:
+            return {}
+        placeholders = ",".join("?" * len(message_ids))
+        cursor = self._db.connection().execute(
+            f"""
+            SELECT id, conversation_id, role, content, timestamp 
+            FROM messages 
+            WHERE id IN ({placeholders})
+            """,
+            list(message_ids)
         )
-        messages = cursor.fetchall()
-        conn.close()
+        return {
+            msg_id: {
+                "id": msg_id,
+                "conversation_id": conv_id,
+                "role": role,
+                "content": content,
+                "timestamp": timestamp
+            }
+            for msg_id, conv_id, role, content, timestamp in cursor.fetchall()
+        }
+    
+    def get_conversation(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """
+        Retrieve a full conversation by its ID.
         
-        results = []
-        for msg in messages:
-            msg_id, conv_id, role, content, timestamp, embedding_bytes = msg
+        Args:
+            conversation_id: The ID of the conversation to retrieve
             
-            if embedding_bytes:
-                # Convert embedding from binary to numpy array
-                embedding = np.frombuffer(embedding_bytes, dtype=np.float32)
-                
-                # Calculate cosine similarity
-                similarity = np.dot(query_embedding, embedding) / (
-                    np.linalg.norm(query_embedding) * np.linalg.norm(embedding)
-                )
-                
-                message_data = {
+        Returns:
+            List of message dictionaries in chronological order
+        """
+        return list(self.iter_conversation(conversation_id))
+    
+    def iter_conversation(self, conversation_id: str,
+                          page_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a conversation's messages in chronological order.
+        
+        Messages are read in pages of ``page_size`` rows along the
+        (conversation_id, timestamp, id) index, so only one page is held
+        in memory at a time.
+        
+        Args:
+            conversation_id: The ID of the conversation to read
+            page_size: Rows fetched per query
+            
+        Yields:
+            Message dictionaries, oldest first
+        """
+        conn = self._db.connection()
+        position = ("", 0)
+        while True:
+            rows = conn.execute(
+                """
+                SELECT id, role, content, timestamp 
+                FROM messages 
+                WHERE conversation_id = ? AND (timestamp, id) > (?, ?) 
+                ORDER BY timestamp, id 
+                LIMIT ?
+                """, 
+                (conversation_id,) + position + (page_size,)
+            ).fetchall()
+            
+            for msg_id, role, content, timestamp in rows:
+                yield {
                     "id": msg_id,
-                    "conversation_id": conv_id,
                     "role": role,
                     "content": content,
-                    "timestamp": timestamp,
-                    "similarity": float(similarity)
+                    "timestamp": timestamp
                 }
                 
-                results.append(message_data)
-        
-        # Sort by similarity score in descending order and return top results
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        return results[:limit]
+            if len(rows) < page_size:
+                return
+            position = (rows[-1][3], rows[-1][0])
     
-    def get_conversation(self, conversation_id: str) -> List[Dict[str, Any]]:
+    def tail(self, conversation_id: str, max_tokens: int,
+             page_size: int = 100) -> List[Dict[str, Any]]:
         """
-        Retrieve a full conversation by its ID.
+        Retrieve the most recent messages of a conversation that fit in a token budget.
+        
+        The conversation is read backwards, a page at a time, and reading
+        stops as soon as the next message would exceed the budget.
         
         Args:
-            conversation_id: The ID of the conversation to retrieve
+            conversation_id: The ID of the conversation to read
+            max_tokens: Token budget for the returned messages' content
+            page_size: Rows fetched per query
             
         Returns:
             List of message dictionaries in chronological order
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            """
-            SELECT id, role, content, timestamp 
-            FROM messages 
-            WHERE conversation_id = ? 
-            ORDER BY timestamp
-            """, 
-            (conversation_id,)
-        )
-        
+        conn = self._db.connection()
         messages = []
-        for msg_id, role, content, timestamp in cursor.fetchall():
-            messages.append({
-                "id": msg_id,
-                "role": role,
-                "content": content,
-                "timestamp": timestamp
-            })
+        used = 0
+        position = None
+        while True:
+            where = "" if position is None else "AND (timestamp, id) < (?, ?)"
+            rows = conn.execute(
+                f"""
+                SELECT id, role, content, timestamp 
+                FROM messages 
+                WHERE conversation_id = ? {where} 
+                ORDER BY timestamp DESC, id DESC 
+                LIMIT ?
+                """, 
+                (conversation_id,) + (position or ()) + (page_size,)
+            ).fetchall()
             
-        conn.close()
-        return messages
+            for msg_id, role, content, timestamp in rows:
+                used += count_tokens(content)
+                if used > max_tokens:
+                    messages.reverse()
+                    return messages
+                messages.append({
+                    "id": msg_id,
+                    "role": role,
+                    "content": content,
+                    "timestamp": timestamp
+                })
+                
+            if len(rows) < page_size:
+                messages.reverse()
+                return messages
+            position = (rows[-1][3], rows[-1][0])
     
-    def list_conversations(self, limit: int = 10) -> List[Dict[str, Any]]:
+    def list_conversations(self, limit: int = 10, cursor: Optional[Tuple[str, int]] = None,
+                           order_by: str = "timestamp") -> List[Dict[str, Any]]:
         """
         List recent conversations with their metadata.
         
         Args:
             limit: Maximum number of conversations to return
+            cursor: Resume after this position (see ``page_conversations``)
+            order_by: "timestamp" (creation time) or "last_activity"
             
         Returns:
             List of conversation dictionaries with metadata
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        return self.page_conversations(limit, cursor, order_by)[0]
         
-        cursor.execute(
-            """
-            SELECT conversation_id, timestamp, title, metadata 
+    def page_conversations(self, limit: int = 10, cursor: Optional[Tuple[str, int]] = None,
+                           order_by: str = "timestamp"
+                           ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """
+        Return one page of conversations, most recent first.
+        
+        Pages are read with keyset pagination on an index, so every page
+        costs the same however deep into the history it is.
+        
+        Args:
+            limit: Maximum number of conversations to return
+            cursor: Cursor returned with the previous page, None for the first
+            order_by: "timestamp" (creation time) or "last_activity"
+            
+        Returns:
+            Tuple of (conversation dictionaries, cursor of the next page or
+            None after the last page)
+        """
+        if order_by not in ("timestamp", "last_activity"):
+            raise ValueError(f"Cannot order conversations by {order_by!r}")
+            
+        where, params = "", []
+        if cursor is not None:
+            where = f"WHERE ({order_by}, id) < (?, ?)"
+            params = list(cursor)
+            
+        rows = self._db.connection().execute(
+            f"""
+            SELECT id, conversation_id, timestamp, title, metadata, message_count, last_activity 
             FROM conversations 
-            ORDER BY timestamp DESC 
+            {where} 
+            ORDER BY {order_by} DESC, id DESC 
             LIMIT ?
             """, 
-            (limit,)
-        )
+            params + [limit]
+        ).fetchall()
         
         conversations = []
-        for conv_id, timestamp, title, metadata_json in cursor.fetchall():
+        for row_id, conv_id, timestamp, title, metadata_json, message_count, last_activity in rows:
             metadata = json.loads(metadata_json) if metadata_json else {}
-            
-            # Get message count for this conversation
-            cursor.execute(
-                "SELECT COUNT(*) FROM messages WHERE conversation_id = ?", 
-                (conv_id,)
-            )
-            message_count = cursor.fetchone()[0]
-            
             conversations.append({
                 "conversation_id": conv_id,
                 "timestamp": timestamp,
+                "last_activity": last_activity or timestamp,
                 "title": title,
                 "message_count": message_count,
                 "metadata": metadata
             })
             
-        conn.close()
-        return conversations
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_cursor = (last[2] if order_by == "timestamp" else last[6], last[0])
+        return conversations, next_cursor
+        
+    def compact(self,
+                max_age_days: Optional[float] = None,
+                keep_conversations: Optional[int] = None,
+                delete_after_days: Optional[float] = None,
+                summarize_fn: Optional[Callable[[List[Dict[str, Any]]], str]] = None,
+                progress: Optional[Callable[[int, int], None]] = None,
+                vacuum: bool = True) -> Dict[str, Any]:
+        """
+        Compact old conversations into digests and reclaim their space.
+        
+        Every conversation selected by the age or count policy gets a
+        digest message (role ``digest``) summarising its messages since the
+        previous digest. The digest is embedded and searchable; the
+        summarised messages lose their embeddings, and once older than
+        ``delete_after_days`` they are deleted. Each conversation is
+        compacted in its own transaction, so an interrupted run is resumed
+        by running it again.
+        
+        Args:
+            max_age_days: Compact conversations inactive for this many days
+            keep_conversations: Compact all but this many most recently
+                active conversations
+            delete_after_days: Delete summarised messages older than this
+            summarize_fn: Maps messages (oldest first) to a digest, defaults
+                to ``compaction.extractive_digest``
+            progress: Called with (conversations done, total)
+            vacuum: Return freed pages to the file system afterwards
+        
+        Returns:
+            Report with counts, ``bytes_before``, ``bytes_after`` and
+            ``bytes_reclaimed``
+        """
+        cutoff = compaction_cutoff(self, max_age_days, keep_conversations)
+        delete_before = None
+        if delete_after_days is not None:
+            delete_before = (datetime.now() - timedelta(days=delete_after_days)).isoformat()
+        return self.compact_before(cutoff, delete_before, summarize_fn, progress, vacuum)
+    
+    def compact_before(self,
+                       cutoff: Optional[str],
+                       delete_before: Optional[str] = None,
+                       summarize_fn: Optional[Callable[[List[Dict[str, Any]]], str]] = None,
+                       progress: Optional[Callable[[int, int], None]] = None,
+                       vacuum: bool = True) -> Dict[str, Any]:
+        """
+        Compact the conversations last active before ``cutoff`` (see ``compact``).
+        
+        Args:
+            cutoff: ISO timestamp; None compacts no conversation
+            delete_before: Delete summarised messages older than this ISO timestamp
+            summarize_fn, progress, vacuum: As for ``compact``
+        
+        Returns:
+            Compaction report
+        """
+        summarize_fn = summarize_fn or extractive_digest
+        bytes_before = storage_bytes(self.db_path)
+        with self._db.transaction() as conn:
+            resumed = conn.execute(
+                "SELECT 1 FROM compaction_runs WHERE finished_at IS NULL LIMIT 1"
+            ).fetchone() is not None
+            run_id = conn.execute(
+                "INSERT INTO compaction_runs (started_at) VALUES (?)",
+                (datetime.now().isoformat(),)
+            ).lastrowid
+        
+        report = {"conversations": 0, "messages_summarized": 0, "vectors_deleted": 0,
+                  "messages_deleted": 0, "failed": 0, "resumed": resumed}
+        
+        if cutoff is not None:
+            # Conversations already digested up to their last message are skipped
+            conv_ids = [row[0] for row in self._db.connection().execute(
+                '''
+                SELECT conversation_id FROM conversations
+                WHERE last_activity < ? AND last_activity > COALESCE(compacted_through, '')
+                ORDER BY last_activity
+                ''',
+                (cutoff,)
+            ).fetchall()]
+            for done, conv_id in enumerate(conv_ids, 1):
+                try:
+                    summarized, vectors = self._compact_conversation(conv_id, summarize_fn)
+                except Exception as e:
+                    print(f"Warning: Failed to compact conversation {conv_id}: {e}")
+                    report["failed"] += 1
+                else:
+                    report["conversations"] += 1
+                    report["messages_summarized"] += summarized
+                    report["vectors_deleted"] += vectors
+                if progress:
+                    progress(done, len(conv_ids))
+        
+        if delete_before is not None:
+            report["messages_deleted"] = self._delete_compacted(delete_before)
+        if report["vectors_deleted"] or report["messages_deleted"]:
+            self._invalidate_index()
+        if vacuum:
+            report.update(incremental_vacuum(self._db))
+        
+        report["bytes_before"] = bytes_before
+        report["bytes_after"] = storage_bytes(self.db_path)
+        report["bytes_reclaimed"] = max(bytes_before - report["bytes_after"], 0)
+        
+        finished = datetime.now().isoformat()
+        with self._db.transaction() as conn:
+            conn.execute(
+                '''
+                UPDATE compaction_runs
+                SET finished_at = ?, conversations = ?, messages_summarized = ?,
+                    vectors_deleted = ?, messages_deleted = ?, bytes_reclaimed = ?
+                WHERE id = ?
+                ''',
+                (finished, report["conversations"], report["messages_summarized"],
+                 report["vectors_deleted"], report["messages_deleted"],
+                 report["bytes_reclaimed"], run_id)
+            )
+            # Runs interrupted earlier have now been carried to completion
+            conn.execute(
+                "UPDATE compaction_runs SET finished_at = ? WHERE finished_at IS NULL",
+                (finished,)
+            )
+        return report
+    
+    def _compact_conversation(self, conversation_id: str,
+                              summarize_fn: Callable[[List[Dict[str, Any]]], str]) -> Tuple[int, int]:
+        """
+        Digest a conversation's messages since its previous digest.
+        
+        Returns:
+            Tuple of (messages summarised, embeddings deleted)
+        """
+        conn = self._db.connection()
+        compacted_through, last_activity = conn.execute(
+            "SELECT compacted_through, last_activity FROM conversations WHERE conversation_id = ?",
+            (conversation_id,)
+        ).fetchone()
+        rows = conn.execute(
+            '''
+            SELECT id, role, content, timestamp FROM messages
+            WHERE conversation_id = ? AND timestamp > ? AND role != ?
+            ORDER BY timestamp, id
+            ''',
+            (conversation_id, compacted_through or "", DIGEST_ROLE)
+        ).fetchall()
+        if not rows:
+            with self._db.transaction() as conn:
+                conn.execute(
+                    "UPDATE conversations SET compacted_through = ? WHERE conversation_id = ?",
+                    (last_activity, conversation_id)
+                )
+            return 0, 0
+        
+        messages = [{"id": msg_id, "role": role, "content": content, "timestamp": timestamp}
+                    for msg_id, role, content, timestamp in rows]
+        digest = summarize_fn(messages)
+        through = messages[-1]["timestamp"]
+        
+        # Embed before taking the write lock; a failed embedding is left to
+        # the background embedder
+        embedding_bytes = encoding = None
+        try:
+            embedding_bytes, encoding = encode_embedding(self._get_embedding(digest))
+        except Exception as e:
+            print(f"Warning: Failed to generate embedding: {e}")
+        
+        with self._db.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                INSERT INTO messages
+                (conversation_id, role, content, timestamp, embedding, embedding_encoding)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''',
+                (conversation_id, DIGEST_ROLE, digest, through, embedding_bytes, encoding)
+            )
+            if embedding_bytes is None:
+                cursor.execute(
+                    "INSERT INTO pending_embeddings (message_id) VALUES (?)",
+                    (cursor.lastrowid,)
+                )
+            
+            cursor.execute(
+                '''
+                DELETE FROM pending_embeddings WHERE message_id IN (
+                    SELECT id FROM messages
+                    WHERE conversation_id = ? AND role != ? AND timestamp <= ?
+                )
+                ''',
+                (conversation_id, DIGEST_ROLE, through)
+            )
+            cursor.execute(
+                '''
+                UPDATE messages SET embedding = NULL, embedding_encoding = NULL
+                WHERE conversation_id = ? AND role != ? AND timestamp <= ?
+                AND embedding IS NOT NULL
+                ''',
+                (conversation_id, DIGEST_ROLE, through)
+            )
+            vectors = cursor.rowcount
+            
+            cursor.execute(
+                '''
+                UPDATE conversations
+                SET compacted_through = ?, message_count = message_count + 1
+                WHERE conversation_id = ?
+                ''',
+                (through, conversation_id)
+            )
+        return len(messages), vectors
+    
+    def _delete_compacted(self, delete_before: str, batch_size: int = 5000) -> int:
+        """
+        Delete summarised messages older than ``delete_before``, in batches.
+        
+        Digests are kept, and the conversations' message counts follow.
+        
+        Returns:
+            Number of messages deleted
+        """
+        deleted = 0
+        while True:
+            with self._db.transaction() as conn:
+                rows = conn.execute(
+                    '''
+                    SELECT messages.id, messages.conversation_id FROM messages
+                    JOIN conversations ON conversations.conversation_id = messages.conversation_id
+                    WHERE messages.role != ? AND messages.timestamp < ?
+                    AND messages.timestamp <= conversations.compacted_through
+                    LIMIT ?
+                    ''',
+                    (DIGEST_ROLE, delete_before, batch_size)
+                ).fetchall()
+                if not rows:
+                    return deleted
+                
+                counts: Dict[str, int] = {}
+                for _, conv_id in rows:
+                    counts[conv_id] = counts.get(conv_id, 0) + 1
+                conn.executemany("DELETE FROM messages WHERE id = ?", [(row[0],) for row in rows])
+                conn.executemany(
+                    "DELETE FROM pending_embeddings WHERE message_id = ?",
+                    [(row[0],) for row in rows]
+                )
+                conn.executemany(
+                    "UPDATE conversations SET message_count = message_count - ? WHERE conversation_id = ?",
+                    [(count, conv_id) for conv_id, count in counts.items()]
+                )
+                deleted += len(rows)
+    
+    def _invalidate_index(self):
+        """Drop cached and persisted search state that may hold removed embeddings."""
+        self._matrix = None
+        if store_settings("episodic").get("sidecar", False):
+            self.rebuild_embeddings()
+        # HNSW graphs cannot forget labels; they are rebuilt on the next search
+        for path in glob.glob(glob.escape(self.db_path) + ".hnsw-*"):
+            os.remove(path)
+    
+    def last_compaction(self) -> Optional[Dict[str, Any]]:
+        """
+        Return the metrics of the last finished compaction run.
         
+        Returns:
+            Run dictionary, or None if the store was never compacted
+        """
+        cursor = self._db.connection().execute(
+            '''
+            SELECT started_at, finished_at, conversations, messages_summarized,
+                   vectors_deleted, messages_deleted, bytes_reclaimed
+            FROM compaction_runs
+            WHERE finished_at IS NOT NULL
+            ORDER BY id DESC LIMIT 1
+            '''
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+    
+    def compaction_due(self, interval_hours: float) -> bool:
+        """Tell whether the last compaction finished more than ``interval_hours`` ago."""
+        last = self.last_compaction()
+        if last is None:
+            return True
+        return last["finished_at"] < (datetime.now() - timedelta(hours=interval_hours)).isoformat()
+    
     def __str__(self):
         """String representation of memory for debugging."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._db.connection().cursor()
         
         cursor.execute("SELECT COUNT(*) FROM conversations")
         conv_count = cursor.fetchone()[0]
@@ -351,6 +1451,4 @@ class EpisodicMemory:
         cursor.execute("SELECT COUNT(*) FROM messages")
         msg_count = cursor.fetchone()[0]
         
-        conn.close()
-        
         return f"EpisodicMemory: {conv_count} conversations, {msg_count} messages"
@@ -0,0 +1,736 @@
+"""
+Time-sharded episodic memory.
+
+Messages are stored in one SQLite file per calendar month
+(``episodic/2025-06.db``), each an ordinary :class:`EpisodicMemory`. A
+message is written to the shard of its own month, so past months are
+never touched by inserts or VACUUM and can be archived or dropped
+wholesale. Searches fan out over the shards in a thread pool (SQLite and
+NumPy release the GIL while they work) and merge the shards' top-k.
+
+Every shard numbers its messages from ``period_index << SHARD_ID_BITS``,
+so message ids stay unique across shards and name the shard they live in.
+"""
+
+import glob
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .compaction import compaction_cutoff
+from .database import release_connection_manager
+from .embeddings import count_tokens
+from .episodic_memory import EpisodicMemory, fuse_rankings, message_filters
+
+# Message ids of a shard start at its period index shifted by this many bits
+SHARD_ID_BITS = 32
+
+PERIOD_PATTERN = re.compile(r"^(\d{4})-(\d{2})")
+
+
+def period_of(timestamp: str) -> str:
+    """
+    Return the ``YYYY-MM`` period of an ISO timestamp.
+
+    Raises:
+        ValueError: If the timestamp does not start with a year and month
+    """
+    match = PERIOD_PATTERN.match(timestamp)
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise ValueError(f"Cannot shard a message with timestamp {timestamp!r}")
+    return match.group(0)
+
+
+def period_index(period: str) -> int:
+    """Return the number of months between year 0 and a ``YYYY-MM`` period."""
+    year, month = period.split("-")
+    return int(year) * 12 + int(month) - 1
+
+
+def period_name(index: int) -> str:
+    """Inverse of :func:`period_index`."""
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def shard_of(message_id: int) -> str:
+    """Return the period of the shard a message id belongs to."""
+    return period_name(message_id >> SHARD_ID_BITS)
+
+
+def _iso(value: Union[str, datetime]) -> str:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def merge_candidates(candidates: Iterable[Tuple[List[int], List[float]]],
+                     limit: int) -> Tuple[List[int], List[float]]:
+    """
+    Merge the best-first (ids, scores) lists of several shards.
+
+    Returns:
+        The ``limit`` best (ids, scores) overall, best first
+    """
+    pairs = [pair for ids, scores in candidates for pair in zip(ids, scores)]
+    pairs.sort(key=lambda pair: pair[1], reverse=True)
+    pairs = pairs[:limit]
+    return [pair[0] for pair in pairs], [pair[1] for pair in pairs]
+
+
+class ShardedEpisodicMemory:
+    """
+    Episodic memory split into one database per month, behind the
+    :class:`EpisodicMemory` API.
+
+    Message ids and conversation listings span all shards; the cursors of
+    :meth:`page_conversations` are ``(period, shard cursor)`` pairs.
+    """
+
+    def __init__(self, shard_dir: str = None, workers: int = 4):
+        """
+        Open the shard directory. Shards are opened on first use.
+
+        Args:
+            shard_dir: Directory of the monthly databases. If None, uses
+                ``~/.repartee/memory/episodic``.
+            workers: Threads searching shards in parallel
+        """
+        if shard_dir is None:
+            shard_dir = str(Path.home() / ".repartee" / "memory" / "episodic")
+        os.makedirs(shard_dir, exist_ok=True)
+
+        self.shard_dir = shard_dir
+        self.workers = workers
+        self._shards: Dict[str, EpisodicMemory] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    # ---------- shards ----------
+
+    def periods(self) -> List[str]:
+        """Return the periods that have a shard, oldest first."""
+        names = (os.path.basename(path)[:-3]
+                 for path in glob.glob(os.path.join(self.shard_dir, "*.db")))
+        return sorted(name for name in names if re.fullmatch(r"\d{4}-\d{2}", name))
+
+    def shard_path(self, period: str) -> str:
+        """Return the database path of a period's shard."""
+        return os.path.join(self.shard_dir, f"{period}.db")
+
+    def shard(self, period: str) -> EpisodicMemory:
+        """
+        Return the shard of a period, creating its database if needed.
+
+        Args:
+            period: ``YYYY-MM``
+
+        Returns:
+            The shard's :class:`EpisodicMemory`
+        """
+        with self._lock:
+            memory = self._shards.get(period)
+            if memory is None:
+                memory = EpisodicMemory(db_path=self.shard_path(period))
+                # Start the shard's message ids in its own id range
+                with memory._db.transaction() as conn:
+                    conn.execute(
+                        '''
+                        INSERT INTO sqlite_sequence (name, seq)
+                        SELECT 'messages', ?
+                        WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'messages')
+                        ''',
+                        (period_index(period) << SHARD_ID_BITS,)
+                    )
+                self._shards[period] = memory
+            return memory
+
+    def _shards_between(self, since: Optional[Union[str, datetime]] = None,
+                        until: Optional[Union[str, datetime]] = None) -> List[EpisodicMemory]:
+        """Return the shards that may hold messages in [since, until), oldest first."""
+        since = _iso(since) if since is not None else None
+        until = _iso(until) if until is not None else None
+        periods = []
+        for period in self.periods():
+            end = period_name(period_index(period) + 1)
+            if (since is None or end > since) and (until is None or period < until):
+                periods.append(period)
+        return [self.shard(period) for period in periods]
+
+    def _map(self, fn: Callable[[EpisodicMemory], Any],
+             shards: List[EpisodicMemory]) -> List[Any]:
+        """Apply ``fn`` to every shard, in parallel when there are several."""
+        if len(shards) <= 1:
+            return [fn(shard) for shard in shards]
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix="repartee-shard")
+        return list(self._pool.map(fn, shards))
+
+    def drop_shard(self, period: str) -> int:
+        """
+        Delete a shard with its embedding sidecar and index files.
+
+        Args:
+            period: ``YYYY-MM``
+
+        Returns:
+            Number of files removed
+        """
+        paths = self._release(period)
+        for path in paths:
+            os.remove(path)
+        return len(paths)
+
+    def archive_shard(self, period: str, archive_dir: str) -> str:
+        """
+        Move a shard and its side files out of the store, into ``archive_dir``.
+
+        The archived database is a complete :class:`EpisodicMemory` that
+        can be opened on its own.
+
+        Args:
+            period: ``YYYY-MM``
+            archive_dir: Destination directory
+
+        Returns:
+            Path of the archived database
+        """
+        os.makedirs(archive_dir, exist_ok=True)
+        for path in self._release(period):
+            shutil.move(path, os.path.join(archive_dir, os.path.basename(path)))
+        return os.path.join(archive_dir, os.path.basename(self.shard_path(period)))
+
+    def _release(self, period: str) -> List[str]:
+        """Close a shard and return the files it consists of."""
+        db_path = self.shard_path(period)
+        if not os.path.exists(db_path):
+            raise ValueError(f"No episodic shard for {period}")
+        with self._lock:
+            memory = self._shards.pop(period, None)
+        if memory is not None:
+            memory.close(drain=False)
+        release_connection_manager(db_path)
+        return glob.glob(glob.escape(db_path) + "*")
+
+    # ---------- writes ----------
+
+    def add_message(self,
+                    role: str,
+                    content: str,
+                    conversation_id: str = "default",
+                    timestamp: str = None,
+                    defer_embedding: bool = False) -> int:
+        """
+        Add a single message to the shard of its timestamp's month.
+
+        Args:
+            role, content, conversation_id, timestamp, defer_embedding:
+                As for ``EpisodicMemory.add_message``
+
+        Returns:
+            ID of the stored message
+        """
+        if timestamp is None:
+            timestamp = datetime.now().isoformat()
+        return self.shard(period_of(timestamp)).add_message(
+            role, content, conversation_id, timestamp, defer_embedding)
+
+    def add_messages(self, messages: Iterable[Dict[str, Any]]) -> Tuple[List[int], Dict[int, str]]:
+        """
+        Add many messages, one batched ``add_messages`` call per shard.
+
+        Args:
+            messages: As for ``EpisodicMemory.add_messages``
+
+        Returns:
+            Tuple of (message ids in input order, embedding errors keyed by
+            input position)
+        """
+        now = datetime.now().isoformat()
+        groups: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        for i, msg in enumerate(messages):
+            msg = dict(msg, timestamp=msg.get("timestamp") or now)
+            groups.setdefault(period_of(msg["timestamp"]), []).append((i, msg))
+
+        message_ids: List[Optional[int]] = [None] * sum(len(g) for g in groups.values())
+        all_errors = {}
+        for period, group in groups.items():
+            ids, errors = self.shard(period).add_messages(msg for _, msg in group)
+            for (i, _), message_id in zip(group, ids):
+                message_ids[i] = message_id
+            all_errors.update({group[j][0]: error for j, error in errors.items()})
+        return message_ids, all_errors
+
+    def import_database(self, db_path: str) -> int:
+        """
+        Copy the messages of an unsharded episodic database into the shards.
+
+        Embeddings are copied as stored; messages without one are queued
+        for the background embedder. Messages already present in their
+        shard (same conversation, timestamp, role and content) are skipped,
+        so an interrupted import can simply be run again.
+
+        Args:
+            db_path: Path of an ``EpisodicMemory`` database
+
+        Returns:
+            Number of messages copied
+        """
+        # Opening it applies any pending schema migration
+        source = EpisodicMemory(db_path=db_path)
+        periods = [row[0] for row in source._db.connection().execute(
+            "SELECT DISTINCT substr(timestamp, 1, 7) FROM messages"
+        )]
+
+        copied = 0
+        for period in periods:
+            try:
+                period_of(period)
+            except ValueError:
+                print(f"Warning: Skipping messages with unparsable timestamps ({period!r})")
+                continue
+            bounds = (period, period_name(period_index(period) + 1))
+            shard = self.shard(period)
+            conn = shard._db.connection()
+            conn.execute("ATTACH DATABASE ? AS source", (os.path.abspath(db_path),))
+            try:
+                with shard._db.transaction():
+                    # rowcount, unlike total_changes, leaves out the FTS trigger's rows
+                    cursor = conn.execute(
+                        '''
+                        INSERT INTO messages
+                        (conversation_id, role, content, timestamp, embedding, embedding_encoding)
+                        SELECT s.conversation_id, s.role, s.content, s.timestamp,
+                               s.embedding, s.embedding_encoding
+                        FROM source.messages s
+                        WHERE s.timestamp >= ? AND s.timestamp < ?
+                        AND NOT EXISTS (
+                            SELECT 1 FROM main.messages m
+                            WHERE m.conversation_id = s.conversation_id
+                            AND m.timestamp = s.timestamp
+                            AND m.role = s.role AND m.content = s.content
+                        )
+                        ORDER BY s.timestamp, s.id
+                        ''',
+                        bounds
+                    )
+                    copied += cursor.rowcount
+
+                    conn.execute(
+                        '''
+                        INSERT INTO conversations (conversation_id, timestamp, title, metadata)
+                        SELECT c.conversation_id, c.timestamp, c.title, c.metadata
+                        FROM source.conversations c
+                        WHERE c.conversation_id IN (
+                            SELECT conversation_id FROM source.messages
+                            WHERE timestamp >= ? AND timestamp < ?
+                        )
+                        AND NOT EXISTS (
+                            SELECT 1 FROM main.conversations m
+                            WHERE m.conversation_id = c.conversation_id
+                        )
+                        GROUP BY c.conversation_id
+                        ''',
+                        bounds
+                    )
+                    # Recount every conversation the period touches
+                    conn.execute(
+                        '''
+                        UPDATE conversations SET
+                            message_count = (SELECT COUNT(*) FROM messages
+                                             WHERE messages.conversation_id = conversations.conversation_id),
+                            timestamp = (SELECT MIN(timestamp) FROM messages
+                                         WHERE messages.conversation_id = conversations.conversation_id),
+                            last_activity = (SELECT MAX(timestamp) FROM messages
+                                             WHERE messages.conversation_id = conversations.conversation_id)
+                        WHERE conversation_id IN (
+                            SELECT conversation_id FROM source.messages
+                            WHERE timestamp >= ? AND timestamp < ?
+                        )
+                        ''',
+                        bounds
+                    )
+                    conn.execute(
+                        '''
+                        INSERT OR IGNORE INTO pending_embeddings (message_id)
+                        SELECT id FROM messages WHERE embedding IS NULL
+                        '''
+                    )
+            finally:
+                conn.execute("DETACH DATABASE source")
+            shard._matrix = None
+        return copied
+
+    # ---------- embeddings ----------
+
+    def check_embeddings(self) -> Dict[str, Any]:
+        """
+        Check the embedding sidecar of every shard against its database.
+
+        Returns:
+            Row counts summed over the shards; ``consistent`` if all are
+        """
+        report: Dict[str, Any] = {"shards": 0}
+        consistent = True
+        for period in self.periods():
+            shard_report = self.shard(period).check_embeddings()
+            consistent = consistent and shard_report.pop("consistent")
+            report["shards"] += 1
+            for key, value in shard_report.items():
+                report[key] = report.get(key, 0) + value
+        report["consistent"] = consistent
+        return report
+
+    def rebuild_embeddings(self) -> int:
+        """Rebuild every shard's embedding sidecar; returns the embeddings written."""
+        return sum(self.shard(period).rebuild_embeddings() for period in self.periods())
+
+    def reproject_embeddings(self, dim: Optional[int] = None) -> Dict[str, int]:
+        """Truncate the stored embeddings of every shard (see ``EpisodicMemory``)."""
+        counts: Dict[str, int] = {}
+        for period in self.periods():
+            for key, value in self.shard(period).reproject_embeddings(dim).items():
+                counts[key] = counts.get(key, 0) + value
+        return counts
+
+    def compact(self,
+                max_age_days: Optional[float] = None,
+                keep_conversations: Optional[int] = None,
+                delete_after_days: Optional[float] = None,
+                summarize_fn: Optional[Callable[[List[Dict[str, Any]]], str]] = None,
+                progress: Optional[Callable[[int, int], None]] = None,
+                vacuum: bool = True) -> Dict[str, Any]:
+        """
+        Compact every shard old enough to hold eligible conversations.
+
+        The policies are evaluated across all shards; arguments are those
+        of ``EpisodicMemory.compact``, and ``progress`` is reported per shard.
+
+        Returns:
+            Reports of the compacted shards, counts and bytes summed
+        """
+        cutoff = compaction_cutoff(self, max_age_days, keep_conversations)
+        delete_before = None
+        if delete_after_days is not None:
+            delete_before = (datetime.now() - timedelta(days=delete_after_days)).isoformat()
+        limits = [limit for limit in (cutoff, delete_before) if limit is not None]
+
+        report: Dict[str, Any] = {"shards": 0, "resumed": False, "converted": False}
+        for period in self.periods():
+            # A shard only holds its own month, so newer shards have nothing to compact
+            if not limits or period > max(limits):
+                continue
+            shard_report = self.shard(period).compact_before(
+                cutoff, delete_before, summarize_fn, progress, vacuum)
+            report["shards"] += 1
+            for key, value in shard_report.items():
+                if isinstance(value, bool):
+                    report[key] = report.get(key, False) or value
+                else:
+                    report[key] = report.get(key, 0) + value
+        return report
+
+    def compaction_due(self, interval_hours: float) -> bool:
+        """Tell whether any shard was last compacted more than ``interval_hours`` ago."""
+        return any(self.shard(period).compaction_due(interval_hours) for period in self.periods())
+
+    def close(self, drain: bool = True, timeout: float = 10.0) -> bool:
+        """
+        Stop the background embedders of all open shards and the search pool.
+
+        Returns:
+            True if no message was left pending
+        """
+        with self._lock:
+            shards = list(self._shards.values())
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        return all([shard.close(drain=drain, timeout=timeout) for shard in shards])
+
+    # ---------- search ----------
+
+    def _prepare_query(self, query: str, shards: List[EpisodicMemory]):
+        """Embed the query once, so the shards all find it in the embedding cache."""
+        if shards:
+            shards[-1]._get_embedding(query)
+
+    def _fetch_messages(self, message_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Fetch messages by id from their shards, keyed by id."""
+        groups: Dict[str, List[int]] = {}
+        for message_id in message_ids:
+            groups.setdefault(shard_of(message_id), []).append(message_id)
+        rows = {}
+        for period, ids in groups.items():
+            rows.update(self.shard(period)._fetch_messages(ids))
+        return rows
+
+    def search_similar(self, query: str, limit: int = 5,
+                       conversation_id: Optional[str] = None,
+                       roles: Optional[Iterable[str]] = None,
+                       since: Optional[Union[str, datetime]] = None,
+                       until: Optional[Union[str, datetime]] = None,
+                       half_life_days: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Search for similar messages in every shard overlapping [since, until).
+
+        Arguments and results are those of ``EpisodicMemory.search_similar``.
+        """
+        shards = self._shards_between(since, until)
+        filters = message_filters(conversation_id, roles, since, until)
+        self._prepare_query(query, shards)
+        top_ids, scores = merge_candidates(self._map(
+            lambda shard: shard._vector_candidates(query, limit, filters, half_life_days),
+            shards), limit)
+        rows = self._fetch_messages(top_ids)
+        return [dict(rows[msg_id], similarity=score)
+                for msg_id, score in zip(top_ids, scores) if msg_id in rows]
+
+    def search_lexical(self, query: str, limit: int = 5,
+                       conversation_id: Optional[str] = None,
+                       roles: Optional[Iterable[str]] = None,
+                       since: Optional[Union[str, datetime]] = None,
+                       until: Optional[Union[str, datetime]] = None,
+                       half_life_days: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Search messages by keywords in every shard overlapping [since, until).
+
+        BM25 statistics are per shard, so scores from different months are
+        only approximately comparable. Arguments and results are those of
+        ``EpisodicMemory.search_lexical``.
+        """
+        shards = self._shards_between(since, until)
+        filters = message_filters(conversation_id, roles, since, until)
+        top_ids, scores = merge_candidates(self._map(
+            lambda shard: shard._lexical_candidates(query, limit, filters, half_life_days),
+            shards), limit)
+        rows = self._fetch_messages(top_ids)
+        return [dict(rows[msg_id], bm25=score)
+                for msg_id, score in zip(top_ids, scores) if msg_id in rows]
+
+    def search(self, query: str, limit: int = 5, mode: str = "hybrid",
+               conversation_id: Optional[str] = None,
+               roles: Optional[Iterable[str]] = None,
+               since: Optional[Union[str, datetime]] = None,
+               until: Optional[Union[str, datetime]] = None,
+               half_life_days: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Search messages lexically, semantically, or both, across shards.
+
+        The shards' candidates are merged into one BM25 and one cosine
+        ranking before fusion. Arguments and results are those of
+        ``EpisodicMemory.search``.
+        """
+        options = dict(conversation_id=conversation_id, roles=roles, since=since,
+                       until=until, half_life_days=half_life_days)
+        if mode == "lexical":
+            return [dict(r, score=r["bm25"]) for r in self.search_lexical(query, limit, **options)]
+        if mode == "vector":
+            return [dict(r, score=r["similarity"]) for r in self.search_similar(query, limit, **options)]
+        if mode != "hybrid":
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        depth = max(limit * 4, 20)
+        shards = self._shards_between(since, until)
+        filters = message_filters(conversation_id, roles, since, until)
+        rankings = {"bm25": merge_candidates(self._map(
+            lambda shard: shard._lexical_candidates(query, depth, filters, half_life_days),
+            shards), depth)}
+        try:
+            self._prepare_query(query, shards)
+            rankings["similarity"] = merge_candidates(self._map(
+                lambda shard: shard._vector_candidates(query, depth, filters, half_life_days),
+                shards), depth)
+        except Exception as e:
+            print(f"Warning: Vector search unavailable, using keywords only: {e}")
+
+        top, fused, details = fuse_rankings(rankings, limit)
+        rows = self._fetch_messages(top)
+        return [dict(rows[msg_id], score=fused[msg_id], **details[msg_id])
+                for msg_id in top if msg_id in rows]
+
+    # ---------- conversations ----------
+
+    def _conversation_rows(self, conversation_ids: List[str],
+                           periods: List[str]) -> Dict[str, List[Tuple]]:
+        """
+        Read the per-shard conversation rows of several conversations.
+
+        Returns:
+            (period, timestamp, last_activity, message_count) tuples by
+            conversation id, oldest period first
+        """
+        found: Dict[str, List[Tuple]] = {}
+        if not conversation_ids:
+            return found
+        placeholders = ",".join("?" * len(conversation_ids))
+        for period in periods:
+            rows = self.shard(period)._db.connection().execute(
+                f'''
+                SELECT conversation_id, timestamp, last_activity, message_count
+                FROM conversations WHERE conversation_id IN ({placeholders})
+                ''',
+                conversation_ids
+            ).fetchall()
+            for conv_id, timestamp, last_activity, message_count in rows:
+                found.setdefault(conv_id, []).append(
+                    (period, timestamp, last_activity or timestamp, message_count))
+        return found
+
+    def _conversation_periods(self, conversation_id: str) -> List[str]:
+        """Return the periods holding messages of a conversation, oldest first."""
+        rows = self._conversation_rows([conversation_id], self.periods())
+        return [row[0] for row in rows.get(conversation_id, [])]
+
+    def get_conversation(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """Retrieve a full conversation by its ID, in chronological order."""
+        return list(self.iter_conversation(conversation_id))
+
+    def iter_conversation(self, conversation_id: str,
+                          page_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a conversation's messages in chronological order, shard by shard.
+
+        Args:
+            conversation_id: The ID of the conversation to read
+            page_size: Rows fetched per query
+
+        Yields:
+            Message dictionaries, oldest first
+        """
+        for period in self._conversation_periods(conversation_id):
+            yield from self.shard(period).iter_conversation(conversation_id, page_size)
+
+    def tail(self, conversation_id: str, max_tokens: int,
+             page_size: int = 100) -> List[Dict[str, Any]]:
+        """
+        Retrieve the most recent messages of a conversation that fit in a token budget.
+
+        Shards are read newest first until the budget is used up.
+
+        Args:
+            conversation_id: The ID of the conversation to read
+            max_tokens: Token budget for the returned messages' content
+            page_size: Rows fetched per query
+
+        Returns:
+            List of message dictionaries in chronological order
+        """
+        rows = self._conversation_rows([conversation_id], self.periods())
+        messages: List[Dict[str, Any]] = []
+        budget = max_tokens
+        for period, _, _, message_count in reversed(rows.get(conversation_id, [])):
+            part = self.shard(period).tail(conversation_id, budget, page_size)
+            messages[:0] = part
+            budget -= sum(count_tokens(msg["content"]) for msg in part)
+            if len(part) < message_count:
+                break
+        return messages
+
+    def list_conversations(self, limit: int = 10, cursor: Optional[Tuple] = None,
+                           order_by: str = "timestamp") -> List[Dict[str, Any]]:
+        """List recent conversations across shards (see ``page_conversations``)."""
+        return self.page_conversations(limit, cursor, order_by)[0]
+
+    def page_conversations(self, limit: int = 10, cursor: Optional[Tuple] = None,
+                           order_by: str = "timestamp"
+                           ) -> Tuple[List[Dict[str, Any]], Optional[Tuple]]:
+        """
+        Return one page of conversations across shards, most recent first.
+
+        A conversation spanning several months is listed once, from the
+        shard that orders it: its oldest for ``timestamp`` (creation time),
+        its newest for ``last_activity``. Since every shard only holds its
+        own month, walking the shards newest first and each shard in index
+        order yields the global order. Counts and times are aggregated over
+        all shards holding the conversation.
+
+        Args:
+            limit: Maximum number of conversations to return
+            cursor: Cursor returned with the previous page, None for the first
+            order_by: "timestamp" (creation time) or "last_activity"
+
+        Returns:
+            Tuple of (conversation dictionaries, cursor of the next page or
+            None after the last page)
+        """
+        if order_by not in ("timestamp", "last_activity"):
+            raise ValueError(f"Cannot order conversations by {order_by!r}")
+
+        periods = self.periods()
+        newest_first = list(reversed(periods))
+        if cursor is not None:
+            # (period, None) resumes after a finished shard
+            start, inner = cursor
+            newest_first = [p for p in newest_first if p < start or (p == start and inner)]
+            if newest_first and newest_first[0] != start:
+                inner = None
+        else:
+            inner = None
+
+        conversations: List[Dict[str, Any]] = []
+        for position, period in enumerate(newest_first):
+            while len(conversations) < limit:
+                page, inner = self.shard(period).page_conversations(
+                    limit - len(conversations), inner, order_by)
+                rows = self._conversation_rows([c["conversation_id"] for c in page], periods)
+                for conv in page:
+                    spans = rows[conv["conversation_id"]]
+                    owner = spans[0][0] if order_by == "timestamp" else spans[-1][0]
+                    if owner != period:
+                        continue
+                    conversations.append(dict(
+                        conv,
+                        timestamp=min(span[1] for span in spans),
+                        last_activity=max(span[2] for span in spans),
+                        message_count=sum(span[3] for span in spans),
+                    ))
+                if inner is None:
+                    break
+
+            if len(conversations) >= limit:
+                if inner is not None:
+                    return conversations, (period, inner)
+                more = position + 1 < len(newest_first)
+                return conversations, (period, None) if more else None
+        return conversations, None
+
+    def __str__(self):
+        """String representation of memory for debugging."""
+        conv_count = msg_count = 0
+        periods = self.periods()
+        for period in periods:
+            conn = self.shard(period)._db.connection()
+            conv_count += conn.execute(
+                "SELECT COUNT(DISTINCT conversation_id) FROM conversations").fetchone()[0]
+            msg_count += conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        return (f"Sharded Episodic Memory: {len(periods)} monthly shards, "
+                f"{conv_count} conversation shards, {msg_count} messages")
+
+
+def open_episodic_memory(db_path: str = None):
+    """
+    Open the episodic memory as configured in ``config.episodic``.
+
+    Args:
+        db_path: Database path of an unsharded store (ignored when sharding)
+
+    Returns:
+        An :class:`EpisodicMemory`, or a :class:`ShardedEpisodicMemory` when
+        ``sharding`` is ``monthly``
+    """
+    from ..config import config
+
+    settings = config.episodic
+    sharding = settings.get("sharding", "none")
+    if sharding == "none":
+        return EpisodicMemory(db_path=db_path)
+    if sharding != "monthly":
+        raise ValueError(f"Unknown episodic sharding: {sharding}")
+    shard_dir = settings.get("shard_dir")
+    return ShardedEpisodicMemory(os.path.expanduser(shard_dir) if shard_dir else None,
+                                 workers=settings.get("search_workers", 4))
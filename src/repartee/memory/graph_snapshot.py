@@ -0,0 +1,363 @@
+"""
+In-memory adjacency snapshot of the knowledge graph.
+
+Traversals (``KnowledgeGraph.neighborhood`` and ``shortest_path``) walk a
+compact copy of the graph instead of querying SQLite hop by hop. The
+copy holds, for both edge directions, CSR arrays over the sorted node
+ids: row offsets (``indptr``), neighbour positions (int32), interned
+relation codes (int32) and weights (float32). Names, types and metadata
+stay in SQLite and are only read for the concepts a query returns.
+
+Triggers on ``edges`` and ``nodes`` bump a generation counter stored in
+the database whenever the topology changes, in any process. A snapshot
+remembers the generation it was read at and is rebuilt lazily once the
+counter moves; edges added through ``KnowledgeGraph.add_relation`` are
+patched in instead, into a small overlay that is folded in by the next
+rebuild.
+
+The same arrays serve graph-aware retrieval: :meth:`GraphSnapshot.personalized_pagerank`
+spreads relevance from seed concepts along weighted edges with sparse
+NumPy iterations.
+"""
+
+import sqlite3
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Overlay edges tolerated before the snapshot is rebuilt, as a share of
+# its edges (with a floor for small graphs)
+OVERLAY_SHARE = 0.05
+OVERLAY_MIN = 1024
+
+# Yielded by expansions: (neighbour id, relation, weight, direction)
+Hop = Tuple[int, str, float, str]
+
+
+def create_generation_schema(cursor: sqlite3.Cursor):
+    """Create the generation counter and its triggers inside an open transaction."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS graph_generation (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        value INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO graph_generation (id, value) VALUES (0, 0)")
+
+    # New nodes have no edges yet, so only their deletion changes the topology
+    bump = "BEGIN UPDATE graph_generation SET value = value + 1 WHERE id = 0; END"
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS edges_generation_insert "
+                   f"AFTER INSERT ON edges {bump}")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS edges_generation_delete "
+                   f"AFTER DELETE ON edges {bump}")
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS edges_generation_update
+    AFTER UPDATE OF source_id, target_id, relation, weight ON edges
+    WHEN OLD.source_id IS NOT NEW.source_id OR OLD.target_id IS NOT NEW.target_id
+      OR OLD.relation IS NOT NEW.relation OR OLD.weight IS NOT NEW.weight
+    {bump}
+    """)
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS nodes_generation_delete "
+                   f"AFTER DELETE ON nodes {bump}")
+
+
+def graph_generation(conn: sqlite3.Connection) -> int:
+    """Return the database's current graph generation."""
+    return conn.execute("SELECT value FROM graph_generation WHERE id = 0").fetchone()[0]
+
+
+class _CSR:
+    """Edges of one direction, grouped by the node they leave from."""
+
+    def __init__(self, rows: np.ndarray, columns: np.ndarray, codes: np.ndarray,
+                 weights: np.ndarray, size: int):
+        order = np.argsort(rows, kind="stable")
+        self.indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=size), out=self.indptr[1:])
+        self.columns = columns[order].astype(np.int32)
+        self.codes = codes[order].astype(np.int32)
+        self.weights = weights[order].astype(np.float32)
+
+
+class GraphSnapshot:
+    """Read-only CSR copy of the graph's topology, plus an overlay of patched edges."""
+
+    def __init__(self, node_ids: np.ndarray, sources: np.ndarray, targets: np.ndarray,
+                 codes: np.ndarray, weights: np.ndarray, relations: List[str],
+                 generation: int):
+        """
+        Initialize a snapshot from edge arrays (see :meth:`build`).
+
+        Args:
+            node_ids: Sorted node ids
+            sources, targets: Positions of each edge's endpoints in ``node_ids``
+            codes: Relation code of each edge (index into ``relations``)
+            weights: Weight of each edge
+            relations: Interned relation names
+            generation: Graph generation the arrays were read at
+        """
+        self.node_ids = node_ids
+        self.relations = relations
+        self.relation_codes = {name: code for code, name in enumerate(relations)}
+        self.generation = generation
+        self.edge_count = len(sources)
+        self.outgoing = _CSR(sources, targets, codes, weights, len(node_ids))
+        self.incoming = _CSR(targets, sources, codes, weights, len(node_ids))
+        # Patched edges, by node id: lists of (neighbour id, code, weight)
+        self._overlay = {"outgoing": {}, "incoming": {}}
+        self._overlay_size = 0
+        # Patched edges touching nodes newer than the snapshot
+        self._overlay_new_nodes = 0
+        # Flat edge arrays and random-walk transitions, built on first use
+        self._edges = None
+        self._edges_overlay = 0
+        self._transitions = {}
+
+    @classmethod
+    def build(cls, conn: sqlite3.Connection) -> "GraphSnapshot":
+        """
+        Read the graph's topology into a snapshot.
+
+        All reads happen in one read transaction, so the arrays and the
+        generation they are labelled with agree.
+
+        Args:
+            conn: Connection to the knowledge graph database
+
+        Returns:
+            New snapshot
+        """
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN")
+        try:
+            generation = graph_generation(conn)
+            node_ids = np.array([row[0] for row in conn.execute("SELECT id FROM nodes ORDER BY id")],
+                                dtype=np.int64)
+            relations = [row[0] for row in conn.execute(
+                "SELECT DISTINCT relation FROM edges ORDER BY relation"
+            )]
+            relation_codes = {name: code for code, name in enumerate(relations)}
+            rows = conn.execute("SELECT source_id, target_id, relation, weight FROM edges").fetchall()
+        finally:
+            if own_transaction:
+                conn.execute("COMMIT")
+
+        sources = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        targets = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        codes = np.fromiter((relation_codes[row[2]] for row in rows), dtype=np.int32, count=len(rows))
+        weights = np.fromiter((1.0 if row[3] is None else row[3] for row in rows),
+                              dtype=np.float32, count=len(rows))
+        return cls(node_ids, np.searchsorted(node_ids, sources), np.searchsorted(node_ids, targets),
+                   codes, weights, relations, generation)
+
+    @property
+    def stale(self) -> bool:
+        """Whether the overlay has grown enough to warrant a rebuild."""
+        return self._overlay_size > max(OVERLAY_MIN, OVERLAY_SHARE * self.edge_count)
+
+    @property
+    def has_new_nodes(self) -> bool:
+        """Whether patched edges reach nodes the flat arrays have no row for."""
+        return self._overlay_new_nodes > 0
+
+    def _position(self, node_id: int) -> Optional[int]:
+        """Return a node's row, or None for nodes newer than the snapshot."""
+        pos = int(np.searchsorted(self.node_ids, node_id))
+        if pos < len(self.node_ids) and self.node_ids[pos] == node_id:
+            return pos
+        return None
+
+    def add_edge(self, source_id: int, target_id: int, relation: str, weight: float,
+                 generation: int):
+        """
+        Patch in an edge created after the snapshot was built.
+
+        Args:
+            source_id, target_id: Node ids of the endpoints
+            relation: Relation name
+            weight: Edge weight
+            generation: Graph generation once the edge was written
+        """
+        # Stored at the arrays' precision, so a rebuild reads back the same weight
+        weight = float(np.float32(1.0 if weight is None else weight))
+        code = self.relation_codes.get(relation)
+        if code is None:
+            code = self.relation_codes[relation] = len(self.relations)
+            self.relations.append(relation)
+        self._overlay["outgoing"].setdefault(source_id, []).append((target_id, code, weight))
+        self._overlay["incoming"].setdefault(target_id, []).append((source_id, code, weight))
+        self._overlay_size += 1
+        if self._position(source_id) is None or self._position(target_id) is None:
+            self._overlay_new_nodes += 1
+        self.generation = generation
+
+    def codes_for(self, relations: Optional[Iterable[str]]) -> Optional[Set[int]]:
+        """Return the codes of relation names, None meaning every relation."""
+        if relations is None:
+            return None
+        return {self.relation_codes[r] for r in relations if r in self.relation_codes}
+
+    def neighbors(self, node_id: int, direction: str, codes: Optional[Set[int]] = None,
+                  min_weight: float = 0.0) -> Iterator[Hop]:
+        """
+        Yield the edges of a node.
+
+        Args:
+            node_id: Node id
+            direction: "outgoing", "incoming" or "both"
+            codes: Relation codes to follow (see :meth:`codes_for`), None for all
+            min_weight: Only yield edges at least this heavy
+
+        Yields:
+            Tuples of (neighbour id, relation, weight, direction), where
+            direction is ``outgoing`` when the edge starts at ``node_id``
+        """
+        sides = ("outgoing", "incoming") if direction == "both" else (direction,)
+        pos = self._position(node_id)
+        for side in sides:
+            if pos is not None:
+                csr = getattr(self, side)
+                begin, end = csr.indptr[pos], csr.indptr[pos + 1]
+                if begin < end:
+                    columns = csr.columns[begin:end]
+                    edge_codes = csr.codes[begin:end]
+                    weights = csr.weights[begin:end]
+                    keep = None
+                    if min_weight:
+                        # Compare at the weights' own precision
+                        keep = weights >= np.float32(min_weight)
+                    if codes is not None:
+                        in_codes = np.isin(edge_codes, list(codes))
+                        keep = in_codes if keep is None else keep & in_codes
+                    if keep is not None:
+                        columns, edge_codes, weights = columns[keep], edge_codes[keep], weights[keep]
+                    for far, code, weight in zip(self.node_ids[columns].tolist(),
+                                                 edge_codes.tolist(), weights.tolist()):
+                        yield far, self.relations[code], weight, side
+            for far, code, weight in self._overlay[side].get(node_id, ()):
+                if weight >= np.float32(min_weight) and (codes is None or code in codes):
+                    yield far, self.relations[code], weight, side
+
+    def nbytes(self) -> int:
+        """Return the memory held by the snapshot's arrays."""
+        arrays = [self.node_ids]
+        for csr in (self.outgoing, self.incoming):
+            arrays += [csr.indptr, csr.columns, csr.codes, csr.weights]
+        return sum(a.nbytes for a in arrays)
+
+    def _edge_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Return (source positions, target positions, codes, weights) of every edge."""
+        if self._edges is None or self._edges_overlay != self._overlay_size:
+            csr = self.outgoing
+            sources = np.repeat(np.arange(len(self.node_ids), dtype=np.int32), np.diff(csr.indptr))
+            arrays = [sources, csr.columns, csr.codes, csr.weights]
+            # Patched edges between nodes the arrays know about
+            extra = []
+            for source_id, edges in self._overlay["outgoing"].items():
+                source = self._position(source_id)
+                for target_id, code, weight in edges:
+                    target = self._position(target_id)
+                    if source is not None and target is not None:
+                        extra.append((source, target, code, weight))
+            if extra:
+                columns = list(zip(*extra))
+                dtypes = (np.int32, np.int32, np.int32, np.float32)
+                arrays = [np.concatenate([a, np.array(c, dtype=t)])
+                          for a, c, t in zip(arrays, columns, dtypes)]
+            self._edges = tuple(arrays)
+            self._edges_overlay = self._overlay_size
+            self._transitions = {}
+        return self._edges
+
+    def _transition(self, direction: str, codes: Optional[Set[int]],
+                    min_weight: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the weighted random-walk steps of the graph, cached per filter.
+
+        Returns:
+            Tuple of (from positions, to positions, step probabilities,
+            dangling node mask)
+        """
+        sources, targets, edge_codes, weights = self._edge_arrays()
+        key = (direction, None if codes is None else frozenset(codes), min_weight)
+        if key in self._transitions:
+            return self._transitions[key]
+
+        keep = weights > 0
+        if min_weight:
+            keep &= weights >= np.float32(min_weight)
+        if codes is not None:
+            keep &= np.isin(edge_codes, list(codes))
+        sources, targets, weights = sources[keep], targets[keep], weights[keep]
+        if direction == "outgoing":
+            steps_from, steps_to = sources, targets
+        elif direction == "incoming":
+            steps_from, steps_to = targets, sources
+        else:
+            steps_from = np.concatenate([sources, targets])
+            steps_to = np.concatenate([targets, sources])
+            weights = np.concatenate([weights, weights])
+
+        size = len(self.node_ids)
+        out_weight = np.bincount(steps_from, weights=weights, minlength=size)
+        probabilities = (weights / out_weight[steps_from]).astype(np.float64)
+        transition = (steps_from, steps_to, probabilities, out_weight == 0)
+        self._transitions[key] = transition
+        return transition
+
+    def personalized_pagerank(self, seeds: Dict[int, float],
+                              damping: float = 0.85,
+                              direction: str = "both",
+                              codes: Optional[Set[int]] = None,
+                              min_weight: float = 0.0,
+                              max_iter: int = 100,
+                              tol: float = 1e-6,
+                              deadline: Optional[float] = None) -> Tuple[np.ndarray, int]:
+        """
+        Rank nodes by personalized PageRank around weighted seed nodes.
+
+        Walks follow edges in proportion to their weight and restart at
+        the seeds with probability ``1 - damping``; walks stuck at a node
+        without usable edges restart too. Each iteration is one sparse
+        product done with ``np.bincount``.
+
+        Args:
+            seeds: Seed weights keyed by node id
+            damping: Probability of following an edge rather than restarting
+            direction: Follow "outgoing", "incoming" or "both" edge directions
+            codes: Relation codes to follow (see :meth:`codes_for`), None for all
+            min_weight: Only follow edges at least this heavy
+            max_iter: Iteration limit
+            tol: Stop once an iteration changes the scores by less (L1)
+            deadline: ``time.perf_counter()`` value after which to stop early
+
+        Returns:
+            Tuple of (scores aligned with ``node_ids``, summing to 1, or all
+            zero without known seeds; iterations run)
+        """
+        size = len(self.node_ids)
+        personal = np.zeros(size)
+        for node_id, weight in seeds.items():
+            pos = self._position(node_id)
+            if pos is not None and weight > 0:
+                personal[pos] += weight
+        total = personal.sum()
+        if total == 0:
+            return personal, 0
+        personal /= total
+
+        steps_from, steps_to, probabilities, dangling = self._transition(direction, codes, min_weight)
+        scores = personal
+        iterations = 0
+        while iterations < max_iter:
+            iterations += 1
+            spread = np.bincount(steps_to, weights=scores[steps_from] * probabilities, minlength=size)
+            restart = (1 - damping) + damping * scores[dangling].sum()
+            updated = damping * spread + restart * personal
+            change = np.abs(updated - scores).sum()
+            scores = updated
+            if change < tol or (deadline is not None and time.perf_counter() >= deadline):
+                break
+        return scores, iterations
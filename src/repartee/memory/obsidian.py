@@ -0,0 +1,320 @@
+"""
+Obsidian vault scanning and note parsing.
+
+Imports run as a staged pipeline: :func:`walk_vault` lists notes with one
+``stat`` each, :func:`parse_notes` reads, hashes and parses the notes
+that changed in a pool of worker processes, and
+``KnowledgeGraph.import_from_obsidian`` writes the resulting records in
+one transaction. Parsing is a single pass of one precompiled regex that
+skips code blocks and inline code. Workers also split each note into
+chunks of at most a few hundred tokens along its headings and paragraphs
+(:func:`chunk_note`), so that note content can be embedded and searched.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .embeddings import count_tokens
+
+# Code spans come first so that links and tags inside them are consumed
+# without being captured; an unclosed fence runs to the end of the note
+_NOTE_TOKENS = re.compile(
+    r"(?:```.*?(?:```|\Z)|~~~.*?(?:~~~|\Z)|`[^`\n]*`)"
+    r"|\[\[(?P<link>.*?)(?:\|.*?)?\]\]"
+    r"|(?<!\S)#(?P<tag>[a-zA-Z0-9_\-/]+)",
+    re.DOTALL
+)
+
+# Markdown ATX heading: level marks, then the title without closing marks
+_HEADING = re.compile(r"(#{1,6})[ \t]+(.+?)[ \t#]*$")
+
+# YAML front matter at the top of a note
+_FRONTMATTER = re.compile(r"\A---[ \t]*\n.*?\n---[ \t]*(?:\n|\Z)", re.DOTALL)
+
+# Path fragment of Obsidian's templates folder
+_TEMPLATES = os.sep + os.path.join(".obsidian", "templates") + os.sep
+
+# Notes per task sent to a worker process
+PARSE_BATCH = 64
+
+# Vaults with fewer notes to parse are parsed in-process
+POOL_THRESHOLD = 256
+
+# Default maximum chunk size, in embedding tokens
+CHUNK_TOKENS = 400
+
+# Chunk of a note: (heading path, text, hash of the text embedded for it)
+Chunk = Tuple[str, str, str]
+
+# Parsed record: (path, note name, content hash, tags, links, chunks), or
+# (path, None, error message, (), (), ()) when the note could not be read
+NoteRecord = Tuple[str, Optional[str], str, Tuple[str, ...], Tuple[str, ...], Tuple[Chunk, ...]]
+
+
+def is_template(path: str) -> bool:
+    """Tell whether a path lies in the vault's ``.obsidian/templates`` folder."""
+    return _TEMPLATES in path + os.sep
+
+
+def walk_vault(folder: str) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    List the markdown notes of a vault with their ``stat``.
+
+    Template files under ``.obsidian/templates`` are skipped.
+
+    Args:
+        folder: Vault directory
+
+    Yields:
+        Tuples of (path, stat result)
+    """
+    stack = [folder]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            print(f"Error processing {directory}: {e}")
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if not is_template(entry.path):
+                        stack.append(entry.path)
+                elif entry.name.endswith(".md"):
+                    yield entry.path, entry.stat()
+            except OSError as e:
+                print(f"Error processing {entry.path}: {e}")
+
+
+def stat_notes(paths: Iterable[str]) -> Dict[str, os.stat_result]:
+    """
+    Stat the given notes, leaving out missing files, templates and non-notes.
+
+    Args:
+        paths: Note paths
+
+    Returns:
+        Stat results keyed by path
+    """
+    stats = {}
+    for path in paths:
+        if not path.endswith(".md") or is_template(path):
+            continue
+        try:
+            stats[path] = os.stat(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            print(f"Error processing {path}: {e}")
+    return stats
+
+
+def extract_links_and_tags(content: str) -> Tuple[Set[str], List[str]]:
+    """
+    Extract wiki-style links and tags from note content in one pass.
+
+    Links and tags inside fenced code blocks and inline code are ignored.
+
+    Args:
+        content: Note content
+
+    Returns:
+        Tuple of (link targets without section references, tags in order)
+    """
+    links, tags = set(), []
+    for match in _NOTE_TOKENS.finditer(content):
+        link, tag = match.group("link", "tag")
+        if link is not None:
+            # Remove any section references with #
+            clean_link = link.split("#")[0].strip()
+            if clean_link:
+                links.add(clean_link)
+        elif tag:
+            tags.append(tag)
+    return links, tags
+
+
+def chunk_text(note: str, heading: str, text: str) -> str:
+    """Return the text embedded for a chunk: its note and heading path, then its text."""
+    title = f"{note} > {heading}" if heading else note
+    return f"{title}\n\n{text}"
+
+
+def _sections(content: str) -> List[Tuple[str, List[str]]]:
+    """
+    Split note content into sections, each a heading path and its blocks.
+
+    Blocks are paragraphs separated by blank lines. A fenced code block
+    stays in one block, and headings inside it are not headings.
+    """
+    sections = [("", [])]
+    headings = []
+    block, fence = [], None
+    for line in content.splitlines():
+        stripped = line.strip()
+        if fence:
+            block.append(line)
+            if stripped.startswith(fence):
+                fence = None
+            continue
+        if stripped.startswith(("```", "~~~")):
+            fence = stripped[:3]
+            block.append(line)
+            continue
+        match = _HEADING.match(line)
+        if match or not stripped:
+            if block:
+                sections[-1][1].append("\n".join(block))
+                block = []
+            if match:
+                level = len(match.group(1))
+                headings = [h for h in headings if h[0] < level] + [(level, match.group(2))]
+                sections.append((" > ".join(title for _, title in headings), []))
+            continue
+        block.append(line)
+    if block:
+        sections[-1][1].append("\n".join(block))
+    return sections
+
+
+def _split_long(text: str, max_tokens: int) -> List[str]:
+    """Split text longer than ``max_tokens`` at line breaks, then spaces, then anywhere."""
+    for separator in ("\n", " "):
+        units = text.split(separator)
+        if len(units) > 1:
+            break
+    else:
+        # One unbroken word: cut at three characters per token
+        step = max_tokens * 3
+        return [text[start:start + step] for start in range(0, len(text), step)]
+
+    pieces, current, size = [], [], 0
+    for unit in units:
+        tokens = count_tokens(unit)
+        if tokens > max_tokens:
+            if current:
+                pieces.append(separator.join(current))
+                current, size = [], 0
+            pieces.extend(_split_long(unit, max_tokens))
+            continue
+        if current and size + tokens > max_tokens:
+            pieces.append(separator.join(current))
+            current, size = [], 0
+        current.append(unit)
+        size += tokens
+    if current:
+        pieces.append(separator.join(current))
+    return pieces
+
+
+def chunk_note(note: str, content: str, max_tokens: int = CHUNK_TOKENS) -> List[Chunk]:
+    """
+    Split a note into chunks for embedding.
+
+    Chunks never span headings. Within a section, whole paragraphs are
+    packed together up to ``max_tokens`` (counted with the note title and
+    heading path the chunk is embedded with); longer paragraphs are split
+    at line breaks, then at spaces. Front matter is left out.
+
+    Args:
+        note: Note name
+        content: Note content
+        max_tokens: Maximum tokens per chunk
+
+    Returns:
+        Chunks in note order (see ``Chunk``)
+    """
+    content = _FRONTMATTER.sub("", content, count=1)
+    chunks = []
+    for heading, blocks in _sections(content):
+        budget = max(max_tokens - count_tokens(chunk_text(note, heading, "")), 1)
+        parts, size = [], 0
+        for block in blocks:
+            tokens = count_tokens(block)
+            pieces = [(block, tokens)]
+            if tokens > budget:
+                pieces = [(piece, count_tokens(piece)) for piece in _split_long(block, budget)]
+            for piece, tokens in pieces:
+                if parts and size + tokens > budget:
+                    chunks.append((heading, "\n\n".join(parts)))
+                    parts, size = [], 0
+                parts.append(piece)
+                size += tokens
+        if parts:
+            chunks.append((heading, "\n\n".join(parts)))
+    return [(heading, text, hashlib.sha256(chunk_text(note, heading, text).encode("utf-8")).hexdigest())
+            for heading, text in chunks]
+
+
+def parse_note(path: str, chunk_tokens: int = CHUNK_TOKENS) -> NoteRecord:
+    """
+    Read, hash and parse one note into a compact record.
+
+    Args:
+        path: Note path
+        chunk_tokens: Maximum tokens per chunk, 0 to skip chunking
+
+    Returns:
+        Note record (see ``NoteRecord``)
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        content = data.decode("utf-8")
+    except (OSError, UnicodeDecodeError) as e:
+        return (path, None, str(e), (), (), ())
+    links, tags = extract_links_and_tags(content)
+    name = Path(path).stem
+    chunks = tuple(chunk_note(name, content, chunk_tokens)) if chunk_tokens else ()
+    return (path, name, hashlib.sha256(data).hexdigest(),
+            tuple(tags), tuple(sorted(links)), chunks)
+
+
+def _parse_batch(paths: List[str], chunk_tokens: int = CHUNK_TOKENS) -> List[NoteRecord]:
+    """Parse a batch of notes in a worker process."""
+    return [parse_note(path, chunk_tokens) for path in paths]
+
+
+def parse_notes(paths: Iterable[str], workers: Optional[int] = None,
+                chunk_tokens: int = CHUNK_TOKENS) -> Iterator[NoteRecord]:
+    """
+    Parse notes in a pool of worker processes.
+
+    Paths are sent in batches of ``PARSE_BATCH`` and at most two batches
+    per worker are in flight, which bounds the memory held between the
+    walker and the writer. Short lists are parsed in-process.
+
+    Args:
+        paths: Note paths
+        workers: Worker processes, defaults to the CPU count
+        chunk_tokens: Maximum tokens per chunk, 0 to skip chunking
+
+    Yields:
+        Note records, in input order
+    """
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(paths) < POOL_THRESHOLD:
+        yield from (parse_note(path, chunk_tokens) for path in paths)
+        return
+
+    # Imports run next to other threads (the vault watcher, the MCP host),
+    # and forking a multi-threaded process can deadlock the child
+    context = multiprocessing.get_context(
+        "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    )
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        pending = deque()
+        for start in range(0, len(paths), PARSE_BATCH):
+            pending.append(pool.submit(_parse_batch, paths[start:start + PARSE_BATCH], chunk_tokens))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
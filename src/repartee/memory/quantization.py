@@ -0,0 +1,175 @@
+"""
+Versioned on-disk encodings of stored embeddings.
+
+Every ``embedding`` blob has an ``embedding_encoding`` next to it:
+
+- ``f32``: little-endian float32 components (4 bytes per dimension)
+- ``i8``: a float32 scale followed by int8 codes (1 byte per dimension,
+  4x smaller); component ``i`` is ``code[i] * scale``
+
+Databases written before the column existed hold unlabelled blobs, some of
+them float64 (8 bytes per dimension) that readers used to misinterpret as
+float32; :func:`migrate_embedding_encoding` labels them and rewrites the
+float64 ones as float32, in place.
+"""
+
+import sqlite3
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ENCODING_F32 = "f32"
+ENCODING_I8 = "i8"
+
+# ``embeddings.storage`` setting -> encoding written for new embeddings
+STORAGE_ENCODINGS = {"float32": ENCODING_F32, "int8": ENCODING_I8}
+
+# Rows rewritten per statement batch during the migration
+MIGRATION_BATCH = 1000
+
+
+def storage_encoding() -> str:
+    """Return the encoding new embeddings are stored with (``embeddings.storage``)."""
+    from ..config import config
+    storage = config.embeddings.get("storage", "float32")
+    if storage not in STORAGE_ENCODINGS:
+        raise ValueError(f"Unknown embedding storage: {storage}")
+    return STORAGE_ENCODINGS[storage]
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scalar-quantize rows to int8 with one scale per row.
+
+    Args:
+        vectors: 2-D float array
+
+    Returns:
+        Tuple of (int8 codes, float32 scales)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def encode_embedding(vector: np.ndarray, encoding: Optional[str] = None) -> Tuple[bytes, str]:
+    """
+    Encode an embedding for storage.
+
+    Args:
+        vector: 1-D embedding
+        encoding: Target encoding, defaults to :func:`storage_encoding`
+
+    Returns:
+        Tuple of (blob, encoding), ready for the ``embedding`` and
+        ``embedding_encoding`` columns
+    """
+    encoding = encoding or storage_encoding()
+    vector = np.asarray(vector, dtype=np.float32)
+    if encoding == ENCODING_F32:
+        return vector.tobytes(), encoding
+    if encoding == ENCODING_I8:
+        codes, scales = quantize_int8(vector[None, :])
+        return scales.tobytes() + codes.tobytes(), encoding
+    raise ValueError(f"Unknown embedding encoding: {encoding}")
+
+
+def blob_dimension(length: int, encoding: Optional[str]) -> int:
+    """Return the number of components of a stored blob of the given byte length."""
+    if encoding == ENCODING_I8:
+        return length - 4
+    return length // 4
+
+
+def decode_embeddings(blobs: Sequence[bytes], encoding: Optional[str], dim: int) -> np.ndarray:
+    """
+    Decode same-encoding blobs of one dimension into a float32 matrix.
+
+    Args:
+        blobs: Stored blobs
+        encoding: Their encoding (``None`` for unlabelled float32 rows)
+        dim: Their dimensionality
+
+    Returns:
+        Float32 array of shape ``(len(blobs), dim)``
+    """
+    if not blobs:
+        return np.empty((0, dim), dtype=np.float32)
+    data = b"".join(blobs)
+    if encoding == ENCODING_I8:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, dim + 4)
+        scales = raw[:, :4].copy().view(np.float32)
+        return raw[:, 4:].view(np.int8).astype(np.float32) * scales
+    return np.frombuffer(data, dtype=np.float32).reshape(-1, dim)
+
+
+def _plausible(values: np.ndarray) -> bool:
+    """Tell whether decoded components look like an embedding."""
+    return bool(np.all(np.isfinite(values)) and np.abs(values).max(initial=0) < 1e3)
+
+
+def legacy_encoding(blob: bytes) -> str:
+    """
+    Guess the element type of an unlabelled legacy blob.
+
+    A float64 blob read as float32 puts the low halves of the mantissas in
+    every other component, which decode to huge or non-finite values, so
+    a blob is float64 when it is only plausible read that way.
+
+    Returns:
+        ``"f32"`` or ``"f64"``
+    """
+    if len(blob) % 8 == 0 and not _plausible(np.frombuffer(blob, dtype=np.float32)):
+        if _plausible(np.frombuffer(blob, dtype=np.float64)):
+            return "f64"
+    return ENCODING_F32
+
+
+def migrate_embedding_encoding(cursor: sqlite3.Cursor, table: str) -> int:
+    """
+    Add the ``embedding_encoding`` column and label legacy rows.
+
+    Runs inside the caller's transaction. Float64 blobs are rewritten as
+    float32; every other unlabelled blob is labelled ``f32``. Once the
+    column exists this is a no-op without a table scan: the column and the
+    labels are committed together, and every writer labels its rows.
+
+    Args:
+        cursor: Cursor of an open write transaction
+        table: Table with ``id`` and ``embedding`` columns
+
+    Returns:
+        Number of float64 rows converted
+    """
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if "embedding_encoding" in columns:
+        return 0
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN embedding_encoding TEXT")
+
+    converted = 0
+    last_id = 0
+    while True:
+        rows = cursor.execute(
+            f"""
+            SELECT id, embedding FROM {table}
+            WHERE id > ? AND embedding IS NOT NULL AND embedding_encoding IS NULL
+            ORDER BY id LIMIT ?
+            """,
+            (last_id, MIGRATION_BATCH)
+        ).fetchall()
+        if not rows:
+            return converted
+
+        updates: List[Tuple[bytes, str, int]] = []
+        for row_id, blob in rows:
+            if legacy_encoding(blob) == "f64":
+                blob = np.frombuffer(blob, dtype=np.float64).astype(np.float32).tobytes()
+                converted += 1
+            updates.append((blob, ENCODING_F32, row_id))
+        cursor.executemany(
+            f"UPDATE {table} SET embedding = ?, embedding_encoding = ? WHERE id = ?",
+            updates
+        )
+        last_id = rows[-1][0]
@@ -8,14 +8,30 @@ information about the user and their knowledge domain.
 import os
 import json
 import sqlite3
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Set, Tuple, Optional
+from typing import Callable, List, Dict, Any, Iterable, Iterator, Sequence, Set, Tuple, Optional, Union
 
 import numpy as np
-from openai import OpenAI
 
 from ..config import get_api_key
+from .database import get_connection_manager
+from .embedding_cache import get_embedding_cache
+from .embedding_store import EmbeddingSidecar
+from .embeddings import embed_batches, provider_embed_fn, store_settings
+from .graph_snapshot import GraphSnapshot, create_generation_schema, graph_generation
+from .obsidian import (CHUNK_TOKENS, PARSE_BATCH, chunk_text, extract_links_and_tags,
+                       parse_notes, stat_notes, walk_vault)
+from .quantization import encode_embedding, migrate_embedding_encoding
+from .vector_index import (open_vector_index, reproject_embeddings, search_index,
+                           stored_dimension, sync_vector_index)
+
+# Names bound per IN (...) clause
+SQL_CHUNK = 500
+
+# Metadata of the edges imported from Obsidian links
+OBSIDIAN_LINK = json.dumps({"source": "obsidian_link"})
 
 
 class KnowledgeGraph:
@@ -42,20 +58,42 @@ class KnowledgeGraph:
             db_path = str(db_dir / "knowledge_graph.db")
             
         self.db_path = db_path
+        self._db = get_connection_manager(db_path)
         self._init_database()
         
-        # Initialize embedding API client for semantic similarity
-        api_key = get_api_key("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OpenAI API key not found. Semantic search requires an API key.")
-        self.client = OpenAI(api_key=api_key)
+        # Cached embedding index, loaded on the first search
+        self._matrix = None
+        
+        # Adjacency snapshot, loaded on the first traversal
+        self._graph = None
+        
+        # Cached note chunk index, loaded on the first chunk search
+        self._chunks = None
+        
+        # Embedding API client, created on first use
+        self._client = None
+        
+    @property
+    def client(self):
+        """
+        OpenAI client used for embeddings, created on first use so that
+        read-only operations work without an API key.
+        """
+        if self._client is None:
+            from openai import OpenAI
+            api_key = get_api_key("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OpenAI API key not found. Semantic search requires an API key.")
+            self._client = OpenAI(api_key=api_key)
+        return self._client
         
     def _init_database(self):
         """Set up the SQLite database schema if it doesn't exist."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create tables if they don't exist
+        with self._db.transaction() as conn:
+            self._create_schema(conn.cursor())
+            
+    def _create_schema(self, cursor: sqlite3.Cursor):
+        """Create tables and indexes inside an open transaction."""
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS nodes (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -64,10 +102,14 @@ class KnowledgeGraph:
             metadata TEXT,
             embedding BLOB,
             created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL
+            updated_at TEXT NOT NULL,
+            embedding_encoding TEXT
         )
         ''')
         
+        # Label legacy embeddings and convert float64 ones to float32
+        migrate_embedding_encoding(cursor, "nodes")
+        
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS edges (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -90,8 +132,47 @@ class KnowledgeGraph:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_edge_target ON edges(target_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_edge_relation ON edges(relation)')
         
-        conn.commit()
-        conn.close()
+        # Topology generation, bumped by triggers (see graph_snapshot.py)
+        create_generation_schema(cursor)
+        
+        # Manifest of imported Obsidian notes, so unchanged files are skipped
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS obsidian_files (
+            path TEXT PRIMARY KEY,
+            vault TEXT NOT NULL,
+            note TEXT NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            imported_at TEXT NOT NULL
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_obsidian_vault ON obsidian_files(vault)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_obsidian_note ON obsidian_files(note)')
+        
+        # Chunk size each note was last split with (NULL: not chunked yet)
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(obsidian_files)")}
+        if "chunk_tokens" not in columns:
+            cursor.execute("ALTER TABLE obsidian_files ADD COLUMN chunk_tokens INTEGER")
+        
+        # Embedded chunks of imported note content, by note file
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chunks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            node_id INTEGER NOT NULL,
+            path TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            heading TEXT,
+            content TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            embedding BLOB,
+            embedding_encoding TEXT,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (node_id) REFERENCES nodes (id)
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chunk_path ON chunks(path)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chunk_hash ON chunks(content_hash)')
     
     def _get_embedding(self, text: str) -> np.ndarray:
         """
@@ -103,23 +184,80 @@ class KnowledgeGraph:
         Returns:
             Numpy array containing the embedding vector
         """
-        from ..config import config
+        return self._embed_batch([text])[0]
+    
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed a list of texts, requesting only those not in the embedding cache."""
+        return get_embedding_cache().embed(texts, self._request_embeddings,
+                                           store_settings("semantic"))
+    
+    def _request_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Embed a list of texts with the configured provider, bypassing the cache."""
+        return provider_embed_fn(store_settings("semantic"), lambda: self.client)(texts)
+    
+    def _sync_matrix(self, dim: int):
+        """
+        Return the cached embedding index, loading nodes it has not seen yet.
         
-        if config.embeddings["provider"] == "openai":
-            response = self.client.embeddings.create(
-                input=text,
-                model=config.embeddings["model"]
-            )
-            return np.array(response.data[0].embedding)
+        Args:
+            dim: Dimensionality of the query embedding
             
-        elif config.embeddings["provider"] == "local":
-            # Example local model implementation
-            from sentence_transformers import SentenceTransformer
-            model = SentenceTransformer(config.embeddings["model"])
-            return model.encode(text, convert_to_numpy=True)
+        Returns:
+            The up-to-date embedding index
+        """
+        if self._matrix is None or self._matrix.dim != dim:
+            self._matrix = open_vector_index(self.db_path, "nodes", dim,
+                                             store_settings("semantic"))
+            return self._matrix
+        return sync_vector_index(self._matrix, self.db_path, "nodes")
+    
+    def check_embeddings(self) -> Dict[str, Any]:
+        """
+        Check that the embedding sidecar file matches the database.
+        
+        Returns:
+            Consistency report (see ``EmbeddingSidecar.check``)
+        """
+        dim = stored_dimension(self.db_path, "nodes")
+        if not dim:
+            return {"db_rows": 0, "consistent": True}
+        return EmbeddingSidecar(self.db_path, dim).check(self.db_path, "nodes")
+    
+    def rebuild_embeddings(self) -> int:
+        """
+        Rebuild the embedding sidecar files of concepts and chunks from the database.
+        
+        Returns:
+            Number of embeddings written
+        """
+        self._matrix = self._chunks = None
+        count = 0
+        for table, files_path in (("nodes", self.db_path), ("chunks", self.db_path + ".chunks")):
+            dim = stored_dimension(self.db_path, table)
+            if dim:
+                count += EmbeddingSidecar(files_path, dim).rebuild(self.db_path, table)
+        return count
+    
+    def reproject_embeddings(self, dim: Optional[int] = None) -> Dict[str, int]:
+        """
+        Truncate stored concept and chunk embeddings to a shorter dimensionality.
+        
+        Args:
+            dim: Target dimensionality, defaults to the configured
+                ``dimensions`` of the semantic store
             
-        else:
-            raise ValueError(f"Unsupported embedding provider: {config.embeddings['provider']}")
+        Returns:
+            Row counts of both tables, summed (see
+            ``vector_index.reproject_embeddings``)
+        """
+        dim = dim or store_settings("semantic").get("dimensions")
+        if not dim:
+            raise ValueError("No embedding dimensions configured for the semantic store")
+        self._matrix = self._chunks = None
+        counts = reproject_embeddings(self.db_path, "nodes", dim)
+        for key, value in reproject_embeddings(self.db_path, "chunks", dim).items():
+            counts[key] = counts.get(key, 0) + value
+        return counts
     
     def add_concept(self, 
                    name: str, 
@@ -136,51 +274,125 @@ class KnowledgeGraph:
         Returns:
             ID of the created node
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         current_time = datetime.now().isoformat()
         metadata_json = json.dumps(metadata) if metadata else None
         
         # Generate embedding for semantic similarity
         try:
             embedding = self._get_embedding(name)
-            embedding_bytes = embedding.tobytes()
+            embedding_bytes, encoding = encode_embedding(embedding)
         except Exception as e:
             print(f"Warning: Failed to generate embedding: {e}")
-            embedding_bytes = None
+            embedding_bytes = encoding = None
         
-        # Check if node already exists
-        cursor.execute("SELECT id FROM nodes WHERE name = ?", (name,))
-        existing = cursor.fetchone()
+        with self._db.transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Check if node already exists
+            cursor.execute("SELECT id FROM nodes WHERE name = ?", (name,))
+            existing = cursor.fetchone()
         
-        if existing:
-            node_id = existing[0]
-            # Update existing node
-            cursor.execute(
-                """
-                UPDATE nodes 
-                SET type = ?, metadata = ?, embedding = ?, updated_at = ? 
-                WHERE id = ?
-                """,
-                (concept_type, metadata_json, embedding_bytes, current_time, node_id)
-            )
-        else:
-            # Create new node
-            cursor.execute(
-                """
-                INSERT INTO nodes (name, type, metadata, embedding, created_at, updated_at) 
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (name, concept_type, metadata_json, embedding_bytes, current_time, current_time)
-            )
-            node_id = cursor.lastrowid
+            if existing:
+                node_id = existing[0]
+                # Update existing node
+                cursor.execute(
+                    """
+                    UPDATE nodes 
+                    SET type = ?, metadata = ?, embedding = ?, embedding_encoding = ?, updated_at = ? 
+                    WHERE id = ?
+                    """,
+                    (concept_type, metadata_json, embedding_bytes, encoding, current_time, node_id)
+                )
+            else:
+                # Create new node
+                cursor.execute(
+                    """
+                    INSERT INTO nodes 
+                    (name, type, metadata, embedding, embedding_encoding, created_at, updated_at) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (name, concept_type, metadata_json, embedding_bytes, encoding,
+                     current_time, current_time)
+                )
+                node_id = cursor.lastrowid
         
-        conn.commit()
-        conn.close()
+        # Keep an already loaded index current without rereading the table
+        if embedding_bytes is not None and self._matrix is not None:
+            self._matrix.add(node_id, embedding)
         
         return node_id
     
+    def add_concepts(self,
+                     concepts: Iterable[Union[str, Dict[str, Any]]]) -> Tuple[List[int], Dict[int, str]]:
+        """
+        Add or update many concepts at once, embedding them in batched requests.
+        
+        Names are embedded in chunks bounded by item count and tokens, and
+        every chunk is upserted in a single transaction. A concept whose
+        embedding fails is still stored (keeping any previous embedding).
+        
+        Args:
+            concepts: Concept names, or dictionaries with a ``name`` and
+                optional ``concept_type`` and ``metadata`` keys
+                
+        Returns:
+            Tuple of (node ids in input order, embedding errors keyed by
+            input position)
+        """
+        items = [{"name": c} if isinstance(c, str) else c for c in concepts]
+        current_time = datetime.now().isoformat()
+        
+        node_ids = [None] * len(items)
+        all_errors = {}
+        names = [item["name"] for item in items]
+        for indices, vectors, errors in embed_batches(self._embed_batch, names):
+            all_errors.update(errors)
+            rows = []
+            for i, vector in zip(indices, vectors):
+                metadata = items[i].get("metadata")
+                rows.append((
+                    items[i]["name"],
+                    items[i].get("concept_type"),
+                    json.dumps(metadata) if metadata else None,
+                    *((None, None) if vector is None else encode_embedding(vector)),
+                    current_time,
+                    current_time,
+                ))
+            
+            with self._db.transaction() as conn:
+                conn.executemany(
+                    """
+                    INSERT INTO nodes 
+                    (name, type, metadata, embedding, embedding_encoding, created_at, updated_at) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?) 
+                    ON CONFLICT(name) DO UPDATE SET 
+                        type = excluded.type, 
+                        metadata = excluded.metadata, 
+                        embedding = COALESCE(excluded.embedding, nodes.embedding), 
+                        embedding_encoding = COALESCE(excluded.embedding_encoding, 
+                                                      nodes.embedding_encoding), 
+                        updated_at = excluded.updated_at
+                    """,
+                    rows
+                )
+                chunk_names = sorted({row[0] for row in rows})
+                placeholders = ",".join("?" * len(chunk_names))
+                ids_by_name = dict(conn.execute(
+                    f"SELECT name, id FROM nodes WHERE name IN ({placeholders})",
+                    chunk_names
+                ).fetchall())
+            
+            for i in indices:
+                node_ids[i] = ids_by_name[items[i]["name"]]
+                
+            # Keep an already loaded index current without rereading the table
+            embedded = [(node_ids[i], vec) for i, vec in zip(indices, vectors) if vec is not None]
+            if embedded and self._matrix is not None:
+                self._matrix.add_many([nid for nid, _ in embedded],
+                                      np.stack([vec for _, vec in embedded]))
+        
+        return node_ids, all_errors
+    
     def add_relation(self,
                     source: str,
                     relation: str,
@@ -200,54 +412,222 @@ class KnowledgeGraph:
         Returns:
             Tuple of (source_id, target_id, edge_id)
         """
-        # Ensure both concepts exist
-        source_id = self.add_concept(source)
-        target_id = self.add_concept(target)
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Create missing endpoints; existing ones keep their type, metadata
+        # and embedding
+        vectors = self._embed_missing([source, target])
         
         current_time = datetime.now().isoformat()
         metadata_json = json.dumps(metadata) if metadata else None
         
-        # Check if relation already exists
-        cursor.execute(
-            """
-            SELECT id FROM edges 
-            WHERE source_id = ? AND target_id = ? AND relation = ?
-            """, 
-            (source_id, target_id, relation)
-        )
-        existing = cursor.fetchone()
-        
-        if existing:
-            edge_id = existing[0]
-            # Update existing relation
+        with self._db.transaction() as conn:
+            cursor = conn.cursor()
+            generation = graph_generation(conn)
+            self._insert_missing(cursor, [source, target], vectors, current_time)
+            ids = self._node_ids(cursor, [source, target])
+            source_id, target_id = ids[source], ids[target]
+            
+            # Check if relation already exists
             cursor.execute(
                 """
-                UPDATE edges 
-                SET weight = ?, metadata = ?, updated_at = ? 
-                WHERE id = ?
-                """,
-                (weight, metadata_json, current_time, edge_id)
+                SELECT id FROM edges 
+                WHERE source_id = ? AND target_id = ? AND relation = ?
+                """, 
+                (source_id, target_id, relation)
             )
-        else:
-            # Create new relation
-            cursor.execute(
-                """
-                INSERT INTO edges 
-                (source_id, target_id, relation, weight, metadata, created_at, updated_at) 
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (source_id, target_id, relation, weight, metadata_json, current_time, current_time)
-            )
-            edge_id = cursor.lastrowid
+            existing = cursor.fetchone()
         
-        conn.commit()
-        conn.close()
+            if existing:
+                edge_id = existing[0]
+                # Update existing relation
+                cursor.execute(
+                    """
+                    UPDATE edges 
+                    SET weight = ?, metadata = ?, updated_at = ? 
+                    WHERE id = ?
+                    """,
+                    (weight, metadata_json, current_time, edge_id)
+                )
+            else:
+                # Create new relation
+                cursor.execute(
+                    """
+                    INSERT INTO edges 
+                    (source_id, target_id, relation, weight, metadata, created_at, updated_at) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (source_id, target_id, relation, weight, metadata_json, current_time, current_time)
+                )
+                edge_id = cursor.lastrowid
+            written = graph_generation(conn)
         
+        # Patch a new edge into a current snapshot; anything else (a
+        # reweighted edge, another writer) makes it rebuild on next use
+        if self._graph is not None and not existing and self._graph.generation == generation:
+            self._graph.add_edge(source_id, target_id, relation, weight, written)
+        
+        self._index_new(ids, vectors)
         return (source_id, target_id, edge_id)
     
+    def _embed_missing(self, names: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Embed, in batched requests, the names that have no embedded node yet.
+        
+        Args:
+            names: Concept names, duplicates allowed
+        
+        Returns:
+            Embeddings keyed by name; names whose embedding failed are left out
+        """
+        names = list(dict.fromkeys(names))
+        conn = self._db.connection()
+        embedded = set()
+        for start in range(0, len(names), SQL_CHUNK):
+            chunk = names[start:start + SQL_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            embedded.update(row[0] for row in conn.execute(
+                f"SELECT name FROM nodes WHERE name IN ({placeholders}) AND embedding IS NOT NULL",
+                chunk
+            ).fetchall())
+        
+        missing = [name for name in names if name not in embedded]
+        vectors = {}
+        for indices, batch, errors in embed_batches(self._embed_batch, missing):
+            for i, vector in zip(indices, batch):
+                if vector is not None:
+                    vectors[missing[i]] = vector
+            for i, error in errors.items():
+                print(f"Warning: Failed to generate embedding for {missing[i]!r}: {error}")
+        return vectors
+    
+    def _insert_missing(self, cursor: sqlite3.Cursor, names: Iterable[str],
+                        vectors: Dict[str, np.ndarray], current_time: str):
+        """
+        Create the named concepts that do not exist, inside an open transaction.
+        
+        Existing concepts keep their type and metadata; those without an
+        embedding get the one from ``vectors``.
+        """
+        rows = []
+        for name in dict.fromkeys(names):
+            embedding_bytes = encoding = None
+            if name in vectors:
+                embedding_bytes, encoding = encode_embedding(vectors[name])
+            rows.append((name, embedding_bytes, encoding, current_time, current_time))
+        cursor.executemany(
+            """
+            INSERT INTO nodes
+            (name, embedding, embedding_encoding, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                embedding = COALESCE(nodes.embedding, excluded.embedding),
+                embedding_encoding = COALESCE(nodes.embedding_encoding,
+                                              excluded.embedding_encoding)
+            """,
+            rows
+        )
+    
+    def _node_ids(self, cursor: sqlite3.Cursor, names: Iterable[str]) -> Dict[str, int]:
+        """Return the ids of the named concepts that exist, keyed by name."""
+        names = list(dict.fromkeys(names))
+        ids = {}
+        for start in range(0, len(names), SQL_CHUNK):
+            chunk = names[start:start + SQL_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            ids.update(cursor.execute(
+                f"SELECT name, id FROM nodes WHERE name IN ({placeholders})", chunk
+            ).fetchall())
+        return ids
+    
+    def _index_new(self, ids: Dict[str, int], vectors: Dict[str, np.ndarray]):
+        """Add new embeddings to an already loaded index without rereading the table."""
+        embedded = [(ids[name], vector) for name, vector in vectors.items() if name in ids]
+        if embedded and self._matrix is not None:
+            self._matrix.add_many([node_id for node_id, _ in embedded],
+                                  np.stack([vector for _, vector in embedded]))
+    
+    def _embed_chunks(self, chunks: Iterable[Tuple[str, str, str, str]]) -> Dict[str, Tuple[bytes, str]]:
+        """
+        Find or compute the stored embeddings of note chunks, by content hash.
+        
+        Chunks whose hash is already embedded somewhere in the table reuse
+        that embedding; the rest are embedded in batched requests. Chunk rows
+        are their own embedding cache, so the shared cache is bypassed.
+        
+        Args:
+            chunks: Tuples of (note name, heading path, text, content hash)
+        
+        Returns:
+            Encoded embeddings (blob, encoding) keyed by content hash; hashes
+            whose embedding failed are left out
+        """
+        texts, notes = {}, {}
+        for note, heading, text, content_hash in chunks:
+            if content_hash not in texts:
+                texts[content_hash] = chunk_text(note, heading, text)
+                notes[content_hash] = note
+        hashes = list(texts)
+        
+        stored = {}
+        conn = self._db.connection()
+        for start in range(0, len(hashes), SQL_CHUNK):
+            chunk = hashes[start:start + SQL_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            stored.update((row[0], row[1:]) for row in conn.execute(
+                f"""
+                SELECT content_hash, embedding, embedding_encoding FROM chunks
+                WHERE content_hash IN ({placeholders}) AND embedding IS NOT NULL
+                """,
+                chunk
+            ).fetchall())
+        
+        missing = [content_hash for content_hash in hashes if content_hash not in stored]
+        for indices, batch, errors in embed_batches(self._request_embeddings,
+                                                    [texts[h] for h in missing]):
+            for i, vector in zip(indices, batch):
+                if vector is not None:
+                    stored[missing[i]] = encode_embedding(vector)
+            for i, error in errors.items():
+                print(f"Warning: Failed to generate embedding for a chunk of "
+                      f"{notes[missing[i]]!r}: {error}")
+        return stored
+    
+    def _replace_chunks(self, cursor: sqlite3.Cursor, path: str, node_id: int,
+                        chunks: Sequence[Tuple[str, str, str]],
+                        embeddings: Dict[str, Tuple[bytes, str]], current_time: str):
+        """
+        Replace the chunks of one note, inside an open transaction.
+        
+        Chunks whose content hash is unchanged keep their row, id and
+        embedding, and only move to their new position.
+        """
+        previous = {}
+        for chunk_id, content_hash in cursor.execute(
+            "SELECT id, content_hash FROM chunks WHERE path = ? ORDER BY position", (path,)
+        ).fetchall():
+            previous.setdefault(content_hash, []).append(chunk_id)
+        
+        kept, added = [], []
+        for position, (heading, text, content_hash) in enumerate(chunks):
+            if previous.get(content_hash):
+                kept.append((position, node_id, previous[content_hash].pop(0)))
+                continue
+            embedding_bytes, encoding = embeddings.get(content_hash, (None, None))
+            added.append((node_id, path, position, heading, text, content_hash,
+                          embedding_bytes, encoding, current_time))
+        
+        cursor.executemany("DELETE FROM chunks WHERE id = ?",
+                           [(chunk_id,) for ids in previous.values() for chunk_id in ids])
+        cursor.executemany("UPDATE chunks SET position = ?, node_id = ? WHERE id = ?", kept)
+        cursor.executemany(
+            """
+            INSERT INTO chunks
+            (node_id, path, position, heading, content, content_hash,
+             embedding, embedding_encoding, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            added
+        )
+    
     def get_related_concepts(self, 
                             concept: str, 
                             relation: str = None,
@@ -263,14 +643,12 @@ class KnowledgeGraph:
         Returns:
             List of related concepts with their relation information
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._db.connection().cursor()
         
         # Get the concept ID
         cursor.execute("SELECT id FROM nodes WHERE name = ?", (concept,))
         result = cursor.fetchone()
         if not result:
-            conn.close()
             return []
             
         concept_id = result[0]
@@ -332,9 +710,318 @@ class KnowledgeGraph:
                     "metadata": metadata
                 })
         
-        conn.close()
         return related
     
+    def graph_snapshot(self) -> GraphSnapshot:
+        """
+        Return the in-memory adjacency snapshot, rebuilding it if the graph changed.
+        
+        The snapshot is read on first use and kept until the database's
+        graph generation moves past it (edges added through this instance
+        are patched in instead) or its overlay of patched edges grows large.
+        
+        Returns:
+            Up-to-date snapshot
+        """
+        conn = self._db.connection()
+        snapshot = self._graph
+        if snapshot is None or snapshot.stale or snapshot.generation != graph_generation(conn):
+            snapshot = self._graph = GraphSnapshot.build(conn)
+        return snapshot
+    
+    def _expand(self, snapshot: GraphSnapshot, frontier: List[int], direction: str,
+                relations: Optional[Sequence[str]],
+                min_weight: float) -> Iterator[Tuple[int, int, str, float, str]]:
+        """
+        Yield the edges leaving a BFS frontier, read from the snapshot.
+        
+        Edges are produced lazily, so a caller that stops early leaves the
+        rest of the frontier untouched.
+        
+        Yields:
+            Tuples of (frontier id, neighbour id, relation, weight, direction),
+            where direction is ``outgoing`` when the edge starts at the
+            frontier node
+        """
+        codes = snapshot.codes_for(relations or None)
+        for near in frontier:
+            for far, rel, weight, side in snapshot.neighbors(near, direction, codes, min_weight):
+                yield near, far, rel, weight, side
+    
+    def neighborhood(self,
+                     concept: str,
+                     depth: int = 2,
+                     relations: Optional[Sequence[str]] = None,
+                     max_nodes: int = 100,
+                     min_weight: float = 0.0,
+                     direction: str = "both") -> Dict[str, Any]:
+        """
+        Collect the concepts within ``depth`` hops of a concept.
+        
+        The graph is walked breadth-first over the in-memory snapshot (see
+        ``graph_snapshot``), and the walk stops as soon as ``max_nodes``
+        concepts are reached. Types and metadata are only read for the
+        concepts returned.
+        
+        Args:
+            concept: Start concept name
+            depth: Maximum number of hops
+            relations: Only follow these relation types
+            max_nodes: Maximum number of concepts returned, start included
+            min_weight: Only follow edges at least this heavy
+            direction: Follow "outgoing", "incoming" or "both" edge directions
+        
+        Returns:
+            Dict with ``nodes`` (concept_id, concept, type, distance,
+            metadata; nearest first), ``edges`` (source, target, relation,
+            weight) between them and whether the walk was ``truncated``
+        """
+        conn = self._db.connection()
+        start = self._node_ids(conn.cursor(), [concept]).get(concept)
+        if start is None:
+            return {"nodes": [], "edges": [], "truncated": False}
+        snapshot = self.graph_snapshot()
+        
+        distance = {start: 0}
+        edges = set()
+        frontier = [start]
+        truncated = False
+        for hop in range(1, depth + 1):
+            if not frontier or truncated:
+                break
+            next_frontier = []
+            for near, far, rel, weight, side in self._expand(snapshot, frontier, direction,
+                                                             relations, min_weight):
+                if far not in distance:
+                    if len(distance) >= max_nodes:
+                        truncated = True
+                        break
+                    distance[far] = hop
+                    next_frontier.append(far)
+                edge = (near, far, rel, weight) if side == "outgoing" else (far, near, rel, weight)
+                edges.add(edge)
+            frontier = next_frontier
+        
+        ids = list(distance)
+        rows = {}
+        for begin in range(0, len(ids), SQL_CHUNK):
+            chunk = ids[begin:begin + SQL_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                f"SELECT id, name, type, metadata FROM nodes WHERE id IN ({placeholders})", chunk
+            ).fetchall():
+                rows[row[0]] = row
+        
+        nodes = []
+        for node_id in sorted(ids, key=lambda i: (distance[i], i)):
+            if node_id not in rows:
+                continue
+            _, name, node_type, metadata_json = rows[node_id]
+            nodes.append({
+                "concept_id": node_id,
+                "concept": name,
+                "type": node_type,
+                "distance": distance[node_id],
+                "metadata": json.loads(metadata_json) if metadata_json else {}
+            })
+        return {
+            "nodes": nodes,
+            "edges": [{"source": rows[s][1], "target": rows[t][1], "relation": rel, "weight": weight}
+                      for s, t, rel, weight in sorted(edges) if s in rows and t in rows],
+            "truncated": truncated
+        }
+    
+    def shortest_path(self,
+                      source: str,
+                      target: str,
+                      max_depth: int = 6,
+                      relations: Optional[Sequence[str]] = None,
+                      min_weight: float = 0.0,
+                      direction: str = "both") -> Optional[List[Dict[str, Any]]]:
+        """
+        Find a path with the fewest hops between two concepts.
+        
+        Searches breadth-first from both ends at once, always expanding the
+        smaller frontier, and gives up beyond ``max_depth`` hops.
+        
+        Args:
+            source: Start concept name
+            target: End concept name
+            max_depth: Maximum number of hops
+            relations: Only follow these relation types
+            min_weight: Only follow edges at least this heavy
+            direction: Follow edges "outgoing" from the source towards the
+                target, "incoming" against their direction, or "both"
+        
+        Returns:
+            Hops from source to target, each a dict with ``from``, ``to``,
+            ``relation``, ``weight`` and ``direction`` (an empty list when
+            source and target are the same), or None if there is no path
+        """
+        conn = self._db.connection()
+        ids = self._node_ids(conn.cursor(), [source, target])
+        if source not in ids or target not in ids:
+            return None
+        if source == target:
+            return []
+        snapshot = self.graph_snapshot()
+        
+        reverse = {"outgoing": "incoming", "incoming": "outgoing", "both": "both"}
+        # Node -> (neighbour towards its end, relation, weight, direction)
+        parents = ({ids[source]: None}, {ids[target]: None})
+        depths = ({ids[source]: 0}, {ids[target]: 0})
+        frontiers = ([ids[source]], [ids[target]])
+        meeting = None
+        for _ in range(max_depth):
+            if not frontiers[0] or not frontiers[1]:
+                return None
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            walk = direction if side == 0 else reverse[direction]
+            next_frontier = []
+            for near, far, rel, weight, edge_side in self._expand(snapshot, frontiers[side], walk,
+                                                                  relations, min_weight):
+                if far in parents[side]:
+                    continue
+                parents[side][far] = (near, rel, weight, edge_side)
+                depths[side][far] = depths[side][near] + 1
+                next_frontier.append(far)
+            frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+            
+            met = [n for n in next_frontier if n in parents[1 - side]]
+            if met:
+                meeting = min(met, key=lambda n: depths[0][n] + depths[1][n])
+                break
+        if meeting is None:
+            return None
+        
+        # Source half (walked forwards), then target half (walked backwards)
+        hops = []
+        node = meeting
+        while parents[0][node] is not None:
+            prev, rel, weight, edge_side = parents[0][node]
+            hops.append((prev, node, rel, weight, edge_side))
+            node = prev
+        hops.reverse()
+        node = meeting
+        while parents[1][node] is not None:
+            nxt, rel, weight, edge_side = parents[1][node]
+            hops.append((node, nxt, rel, weight, reverse[edge_side]))
+            node = nxt
+        
+        path_ids = {hop[0] for hop in hops} | {hop[1] for hop in hops}
+        placeholders = ",".join("?" * len(path_ids))
+        names = dict(conn.execute(
+            f"SELECT id, name FROM nodes WHERE id IN ({placeholders})", list(path_ids)
+        ).fetchall())
+        return [{"from": names[a], "to": names[b], "relation": rel, "weight": weight,
+                 "direction": edge_side}
+                for a, b, rel, weight, edge_side in hops]
+    
+    def personalized_pagerank(self,
+                              seeds: Dict[str, float],
+                              limit: int = 10,
+                              damping: float = 0.85,
+                              time_budget: float = 0.05,
+                              relations: Optional[Sequence[str]] = None,
+                              min_weight: float = 0.0,
+                              direction: str = "both") -> List[Dict[str, Any]]:
+        """
+        Rank concepts by personalized PageRank around weighted seed concepts.
+        
+        Relevance spreads from the seeds along weighted edges over the
+        in-memory snapshot (see ``GraphSnapshot.personalized_pagerank``),
+        until the scores converge or ``time_budget`` runs out. Types and
+        metadata are only read for the concepts returned.
+        
+        Args:
+            seeds: Seed weights keyed by concept name
+            limit: Maximum number of concepts returned, seeds included
+            damping: Probability of following an edge rather than restarting
+            time_budget: Seconds the iterations may take
+            relations: Only follow these relation types
+            min_weight: Only follow edges at least this heavy
+            direction: Follow "outgoing", "incoming" or "both" edge directions
+        
+        Returns:
+            Concepts (concept_id, concept, type, score, seed, metadata),
+            best first
+        """
+        deadline = time.perf_counter() + time_budget
+        conn = self._db.connection()
+        ids = self._node_ids(conn.cursor(), seeds)
+        if not ids:
+            return []
+        snapshot = self.graph_snapshot()
+        if snapshot.has_new_nodes:
+            # Scores are aligned with the snapshot's rows, so rows are needed
+            snapshot = self._graph = GraphSnapshot.build(conn)
+        scores, _ = snapshot.personalized_pagerank(
+            {ids[name]: weight for name, weight in seeds.items() if name in ids},
+            damping=damping,
+            direction=direction,
+            codes=snapshot.codes_for(relations or None),
+            min_weight=min_weight,
+            deadline=deadline
+        )
+        
+        # Seeds newer than the snapshot have no edges, but still rank
+        seed_ids = {ids[name] for name in seeds if name in ids}
+        ranked = {}
+        if len(scores) and scores.any():
+            top = np.argsort(-scores)[:limit]
+            ranked = {int(snapshot.node_ids[pos]): float(scores[pos]) for pos in top if scores[pos] > 0}
+        for node_id in seed_ids:
+            ranked.setdefault(node_id, 0.0)
+        order = sorted(ranked, key=lambda node_id: -ranked[node_id])[:limit]
+        if not order:
+            return []
+        
+        placeholders = ",".join("?" * len(order))
+        rows = {row[0]: row for row in conn.execute(
+            f"SELECT id, name, type, metadata FROM nodes WHERE id IN ({placeholders})", order
+        ).fetchall()}
+        results = []
+        for node_id in order:
+            if node_id not in rows:
+                continue
+            _, name, node_type, metadata_json = rows[node_id]
+            results.append({
+                "concept_id": node_id,
+                "concept": name,
+                "type": node_type,
+                "score": ranked[node_id],
+                "seed": node_id in seed_ids,
+                "metadata": json.loads(metadata_json) if metadata_json else {}
+            })
+        return results
+    
+    def graph_search(self, query: str, limit: int = 10, seeds: int = 5, **kwargs) -> List[Dict[str, Any]]:
+        """
+        Find concepts relevant to a query, following the graph beyond direct matches.
+        
+        The ``seeds`` concepts most similar to the query seed a personalized
+        PageRank weighted by their similarity, so concepts closely linked to
+        several matches rank high even when their names do not match.
+        
+        Args:
+            query: Search query
+            limit: Maximum number of concepts returned
+            seeds: Number of similarity matches used as seeds
+            **kwargs: Passed to ``personalized_pagerank`` (damping,
+                time_budget, relations, min_weight, direction)
+        
+        Returns:
+            Concepts as returned by ``personalized_pagerank``
+        """
+        # An empty graph needs no query embedding
+        if self._db.connection().execute("SELECT 1 FROM nodes LIMIT 1").fetchone() is None:
+            return []
+        matches = self.search_similar_concepts(query, seeds)
+        weights = {m["concept"]: max(m["similarity"], 0.0) for m in matches}
+        if not any(weights.values()):
+            return []
+        return self.personalized_pagerank(weights, limit, **kwargs)
+    
     def search_similar_concepts(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
         Search for concepts semantically similar to the query.
@@ -347,160 +1034,339 @@ class KnowledgeGraph:
             List of concepts with similarity scores
         """
         query_embedding = self._get_embedding(query)
+        matrix = self._sync_matrix(len(query_embedding))
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Score every concept in one matrix-vector product
+        top_ids, scores = search_index(matrix, self.db_path, "nodes", query_embedding, limit)
+        if len(top_ids) == 0:
+            return []
         
-        # Get all nodes with their embeddings
-        cursor.execute("SELECT id, name, type, metadata, embedding FROM nodes")
-        nodes = cursor.fetchall()
-        conn.close()
+        # Only fetch the winning nodes
+        cursor = self._db.connection().cursor()
+        placeholders = ",".join("?" * len(top_ids))
+        cursor.execute(
+            f"SELECT id, name, type, metadata FROM nodes WHERE id IN ({placeholders})",
+            top_ids.tolist()
+        )
+        nodes = {row[0]: row for row in cursor.fetchall()}
         
         results = []
-        for node in nodes:
-            node_id, name, node_type, metadata_json, embedding_bytes = node
-            
-            if embedding_bytes:
-                # Convert embedding from binary to numpy array
-                embedding = np.frombuffer(embedding_bytes, dtype=np.float32)
-                
-                # Calculate cosine similarity
-                similarity = np.dot(query_embedding, embedding) / (
-                    np.linalg.norm(query_embedding) * np.linalg.norm(embedding)
-                )
-                
-                metadata = json.loads(metadata_json) if metadata_json else {}
-                
-                results.append({
-                    "concept_id": node_id,
-                    "concept": name,
-                    "type": node_type,
-                    "similarity": float(similarity),
-                    "metadata": metadata
-                })
+        for node_id, similarity in zip(top_ids.tolist(), scores.tolist()):
+            if node_id not in nodes:
+                continue
+            _, name, node_type, metadata_json = nodes[node_id]
+            metadata = json.loads(metadata_json) if metadata_json else {}
+            results.append({
+                "concept_id": node_id,
+                "concept": name,
+                "type": node_type,
+                "similarity": float(similarity),
+                "metadata": metadata
+            })
+        return results
+    
+    def _sync_chunk_index(self, dim: int):
+        """
+        Return the cached chunk embedding index, loading chunks it has not seen yet.
+        
+        Its sidecar and ANN files sit next to the database under a
+        ``.chunks`` prefix, apart from those of the concept index.
+        """
+        if self._chunks is None or self._chunks.dim != dim:
+            self._chunks = open_vector_index(self.db_path, "chunks", dim,
+                                             store_settings("semantic"),
+                                             files_path=self.db_path + ".chunks")
+            return self._chunks
+        return sync_vector_index(self._chunks, self.db_path, "chunks")
+    
+    def search_chunks(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Search imported note content for the chunks most similar to the query.
+        
+        Uses the same in-memory vector index as concept search. Chunks are
+        never updated in place (changed content gets a new row), so the
+        index only goes stale through deletions: rows deleted since it was
+        loaded are skipped, and it is reloaded once they crowd out results.
+        
+        Args:
+            query: Search query
+            limit: Maximum number of results
+        
+        Returns:
+            Chunks (chunk_id, concept, path, heading, content, similarity),
+            best first
+        """
+        conn = self._db.connection()
+        # No imported content needs no query embedding
+        if conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone() is None:
+            return []
+        query_embedding = self._get_embedding(query)
+        
+        for attempt in range(2):
+            index = self._sync_chunk_index(len(query_embedding))
+            top_ids, scores = search_index(index, self.db_path, "chunks", query_embedding, limit)
+            rows = {}
+            if len(top_ids):
+                placeholders = ",".join("?" * len(top_ids))
+                rows = {row[0]: row for row in conn.execute(
+                    f"""
+                    SELECT chunks.id, nodes.name, chunks.path, chunks.heading, chunks.content
+                    FROM chunks JOIN nodes ON nodes.id = chunks.node_id
+                    WHERE chunks.id IN ({placeholders})
+                    """,
+                    top_ids.tolist()
+                ).fetchall()}
+            if attempt or len(rows) >= min(limit, len(index)):
+                break
+            self._chunks = None
         
-        # Sort by similarity score in descending order and return top results
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        return results[:limit]
+        results = []
+        for chunk_id, similarity in zip(top_ids.tolist(), scores.tolist()):
+            if chunk_id not in rows:
+                continue
+            _, name, path, heading, content = rows[chunk_id]
+            results.append({
+                "chunk_id": chunk_id,
+                "concept": name,
+                "path": path,
+                "heading": heading,
+                "content": content,
+                "similarity": float(similarity)
+            })
+        return results
     
-    def import_from_obsidian(self, folder_path: str, 
-                            import_links: bool = True, 
-                            import_tags: bool = True) -> Tuple[int, int]:
+    def import_from_obsidian(self, folder_path: str,
+                            import_links: bool = True,
+                            import_tags: bool = True,
+                            chunk_tokens: Optional[int] = None,
+                            full: bool = False,
+                            paths: Optional[Iterable[str]] = None,
+                            workers: Optional[int] = None,
+                            progress: Optional[Callable[[int, int], None]] = None) -> Tuple[int, int]:
         """
-        Import concepts and relations from Obsidian notes.
+        Import concepts and relations from Obsidian notes, incrementally.
+        
+        A manifest of imported files (path, mtime, size and content hash)
+        keeps unchanged notes from being read or embedded again: only new
+        and modified notes are parsed, and a note deleted from the vault
+        takes its links with it, and its concept unless something else
+        still refers to it. Names without an embedding are embedded in
+        batched requests before any write, and all writes of one import go
+        in a single transaction. Notes are parsed in a pool of worker
+        processes (see ``obsidian.parse_notes``).
+        
+        Note content is split into chunks (see ``obsidian.chunk_note``)
+        stored with the note's concept for ``search_chunks``. A chunk whose
+        content hash is already stored is never embedded again.
         
         Args:
             folder_path: Path to Obsidian vault folder
             import_links: Whether to import links between notes as relations
             import_tags: Whether to import tags as concept types
-            
+            chunk_tokens: Maximum tokens per content chunk, 0 to store no
+                content; defaults to ``semantic.chunk_tokens`` in the config.
+                Notes chunked with another size are reprocessed.
+            full: Reprocess every note, e.g. after changing ``import_links``
+                or ``import_tags``
+            paths: Only consider these notes of the vault, e.g. those a file
+                watcher saw change; missing ones count as deleted
+            workers: Parser processes, defaults to the CPU count
+            progress: Called with (notes parsed, notes to parse)
+        
         Returns:
-            Tuple of (concepts_added, relations_added)
+            Tuple of (concepts_added, relations_added) for the notes processed
         """
-        concepts_added = 0
-        relations_added = 0
-        
         folder = Path(folder_path)
         if not folder.exists():
             raise FileNotFoundError(f"Obsidian folder not found: {folder_path}")
         if not folder.is_dir():
             raise NotADirectoryError(f"Path is not a directory: {folder_path}")
-        if not any(folder.glob("*.md")):
-            raise ValueError(f"No markdown files found in: {folder_path}")
+        vault = str(folder.resolve())
+        if chunk_tokens is None:
+            from ..config import config
+            chunk_tokens = config.semantic.get("chunk_tokens", CHUNK_TOKENS)
+        
+        if paths is None:
+            files = dict(walk_vault(vault))
+            if not files:
+                raise ValueError(f"No markdown files found in: {folder_path}")
+        else:
+            paths = {os.path.abspath(path) for path in paths}
+            paths = {path for path in paths if path.startswith(vault + os.sep)}
+            files = stat_notes(paths)
+        
+        manifest = {row[0]: row[1:] for row in self._db.connection().execute(
+            """
+            SELECT path, note, mtime_ns, size, content_hash, chunk_tokens
+            FROM obsidian_files WHERE vault = ?
+            """,
+            (vault,)
+        ).fetchall()}
+        
+        deleted = {path: row[0] for path, row in manifest.items()
+                   if path not in files and (paths is None or path in paths)}
+        gone = set(deleted.values())
+        if paths is not None:
+            files.update(stat_notes(path for path, row in manifest.items()
+                                    if row[0] in gone and path not in deleted))
+        
+        # Only parse notes whose size or mtime moved, and only reprocess those
+        # whose content did. Notes sharing a name with a deleted one are
+        # reprocessed too, since they share its concept and links, and so
+        # are notes last chunked with another chunk size.
+        fresh = {path for path in files
+                 if full or path not in manifest or manifest[path][0] in gone
+                 or manifest[path][4] != chunk_tokens}
+        stale = [path for path, stat in files.items()
+                 if path in fresh or manifest[path][1:3] != (stat.st_mtime_ns, stat.st_size)]
         
-        # Process markdown files recursively
-        for md_file in folder.glob("**/*.md"):
-            # Skip template files in Obsidian
-            if ".obsidian/templates" in str(md_file):
+        notes, touched = [], []
+        records = parse_notes(stale, workers, chunk_tokens)
+        for done, (path, name, content_hash, tags, links, chunks) in enumerate(records, 1):
+            if progress and (done % PARSE_BATCH == 0 or done == len(stale)):
+                progress(done, len(stale))
+            stat = files[path]
+            if name is None:
+                print(f"Error processing {path}: {content_hash}")
                 continue
-                
-            # Get note name from filename
-            note_name = md_file.stem
-            
-            # Extract note content and process
-            try:
-                with open(md_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                # Add the note as a concept
-                note_metadata = {
-                    "source": "obsidian",
-                    "file_path": str(md_file),
-                    "created": datetime.fromtimestamp(
-                        md_file.stat().st_ctime
-                    ).isoformat(),
-                    "modified": datetime.fromtimestamp(
-                        md_file.stat().st_mtime
-                    ).isoformat()
-                }
-                
-                # Find tags if enabled
-                note_type = None
-                if import_tags:
-                    tags = self._extract_tags(content)
-                    if tags:
-                        note_type = tags[0]  # Use first tag as type
-                        note_metadata["tags"] = tags
-                        
-                # Add the note as a concept
-                concept_id = self.add_concept(
-                    name=note_name,
-                    concept_type=note_type,
-                    metadata=note_metadata
-                )
-                concepts_added += 1
-                
-                # Process links if enabled
-                if import_links:
-                    linked_notes = self._extract_links(content)
-                    for linked_note in linked_notes:
-                        # Add relation to each linked note
-                        _, _, edge_id = self.add_relation(
-                            source=note_name,
-                            relation="links_to",
-                            target=linked_note,
-                            metadata={"source": "obsidian_link"}
-                        )
-                        relations_added += 1
-                        
-            except Exception as e:
-                print(f"Error processing {md_file}: {e}")
+            if path not in fresh and manifest[path][3] == content_hash:
+                touched.append((stat.st_mtime_ns, stat.st_size, path))
                 continue
-                
-        return (concepts_added, relations_added)
+            
+            note_metadata = {
+                "source": "obsidian",
+                "file_path": path,
+                "created": datetime.fromtimestamp(stat.st_ctime).isoformat(),
+                "modified": datetime.fromtimestamp(stat.st_mtime).isoformat()
+            }
+            
+            # Find tags if enabled
+            note_type = None
+            if import_tags and tags:
+                note_type = tags[0]  # Use first tag as type
+                note_metadata["tags"] = list(tags)
+            
+            notes.append((path, name, note_type, note_metadata,
+                          list(links) if import_links else [], stat, content_hash, chunks))
+        
+        if not notes and not touched and not deleted:
+            return (0, 0)
+        
+        names = [note[1] for note in notes] + [link for note in notes for link in note[4]]
+        vectors = self._embed_missing(names)
+        chunk_embeddings = self._embed_chunks((note[1], *chunk) for note in notes for chunk in note[7])
+        
+        current_time = datetime.now().isoformat()
+        with self._db.transaction() as conn:
+            cursor = conn.cursor()
+            self._insert_missing(cursor, names, vectors, current_time)
+            cursor.executemany(
+                "UPDATE nodes SET type = ?, metadata = ?, updated_at = ? WHERE name = ?",
+                [(note_type, json.dumps(metadata), current_time, name)
+                 for _, name, note_type, metadata, _, _, _, _ in notes]
+            )
+            ids = self._node_ids(cursor, names + sorted(gone))
+            
+            # Replace the links of every processed or deleted note; their
+            # previous targets may be left orphaned
+            sources = sorted({ids[name] for name in gone | {note[1] for note in notes}
+                              if name in ids})
+            orphans = set()
+            for start in range(0, len(sources), SQL_CHUNK):
+                chunk = sources[start:start + SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                where = (f"source_id IN ({placeholders}) AND relation = 'links_to' "
+                         f"AND metadata = ?")
+                orphans.update(row[0] for row in cursor.execute(
+                    f"SELECT target_id FROM edges WHERE {where}", chunk + [OBSIDIAN_LINK]
+                ).fetchall())
+                cursor.execute(f"DELETE FROM edges WHERE {where}", chunk + [OBSIDIAN_LINK])
+            
+            edges = {(ids[name], ids[link]) for _, name, _, _, links, _, _, _ in notes for link in links}
+            cursor.executemany(
+                """
+                INSERT INTO edges
+                (source_id, target_id, relation, weight, metadata, created_at, updated_at)
+                VALUES (?, ?, 'links_to', 1.0, ?, ?, ?)
+                ON CONFLICT(source_id, target_id, relation) DO UPDATE SET
+                    metadata = excluded.metadata,
+                    updated_at = excluded.updated_at
+                """,
+                [(source_id, target_id, OBSIDIAN_LINK, current_time, current_time)
+                 for source_id, target_id in sorted(edges)]
+            )
+            
+            # Unchanged chunks keep their rows and embeddings
+            for path, name, _, _, _, _, _, chunks in notes:
+                self._replace_chunks(cursor, path, ids[name], chunks, chunk_embeddings, current_time)
+            
+            # Deleted notes lose their chunks and note metadata, and their
+            # concept once nothing links to it any more
+            cursor.executemany("DELETE FROM chunks WHERE path = ?", [(path,) for path in deleted])
+            cursor.executemany("DELETE FROM obsidian_files WHERE path = ?",
+                               [(path,) for path in deleted])
+            for name in gone - {note[1] for note in notes}:
+                if name not in ids or cursor.execute(
+                    "SELECT 1 FROM obsidian_files WHERE note = ? LIMIT 1", (name,)
+                ).fetchone():
+                    continue
+                metadata_json = cursor.execute(
+                    "SELECT metadata FROM nodes WHERE id = ?", (ids[name],)
+                ).fetchone()[0]
+                if metadata_json and json.loads(metadata_json).get("source") == "obsidian":
+                    cursor.execute(
+                        "UPDATE nodes SET type = NULL, metadata = NULL, updated_at = ? WHERE id = ?",
+                        (current_time, ids[name])
+                    )
+                orphans.add(ids[name])
+            cursor.executemany(
+                """
+                DELETE FROM nodes
+                WHERE id = ? AND type IS NULL AND metadata IS NULL
+                AND NOT EXISTS (SELECT 1 FROM edges WHERE source_id = nodes.id OR target_id = nodes.id)
+                AND NOT EXISTS (SELECT 1 FROM obsidian_files WHERE note = nodes.name)
+                """,
+                [(node_id,) for node_id in sorted(orphans)]
+            )
+            removed = cursor.rowcount
+            
+            cursor.executemany(
+                """
+                INSERT INTO obsidian_files
+                (path, vault, note, mtime_ns, size, content_hash, imported_at, chunk_tokens)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    note = excluded.note,
+                    mtime_ns = excluded.mtime_ns,
+                    size = excluded.size,
+                    content_hash = excluded.content_hash,
+                    imported_at = excluded.imported_at,
+                    chunk_tokens = excluded.chunk_tokens
+                """,
+                [(path, vault, name, stat.st_mtime_ns, stat.st_size, content_hash, current_time,
+                  chunk_tokens)
+                 for path, name, _, _, _, stat, content_hash, _ in notes]
+            )
+            cursor.executemany(
+                "UPDATE obsidian_files SET mtime_ns = ?, size = ? WHERE path = ?",
+                touched
+            )
+        
+        # Deleted concepts cannot be taken out of a loaded index
+        if removed > 0:
+            self._matrix = None
+        else:
+            self._index_new(ids, vectors)
+        
+        return (len(notes), len(edges))
     
     def _extract_links(self, content: str) -> Set[str]:
-        """Extract wiki-style links from Obsidian note content."""
-        import re
-        links = set()
-        
-        # Match [[Link]] and [[Link|Alias]] patterns
-        link_pattern = r'\[\[(.*?)(?:\|.*?)?\]\]'
-        matches = re.findall(link_pattern, content)
-        
-        for match in matches:
-            # Remove any section references with #
-            clean_link = match.split('#')[0].strip()
-            if clean_link:
-                links.add(clean_link)
-                
-        return links
+        """Extract wiki-style links from Obsidian note content, outside code."""
+        return extract_links_and_tags(content)[0]
     
     def _extract_tags(self, content: str) -> List[str]:
-        """Extract tags from Obsidian note content."""
-        import re
-        tags = []
-        
-        # Match #tag patterns, but not inside code blocks
-        # This is a simplified approach
-        tag_pattern = r'(?<!\S)#([a-zA-Z0-9_\-/]+)'
-        matches = re.findall(tag_pattern, content)
-        
-        for match in matches:
-            if match:
-                tags.append(match)
-                
-        return tags
+        """Extract tags from Obsidian note content, outside code."""
+        return extract_links_and_tags(content)[1]
 
 
 class SemanticMemory:
@@ -565,6 +1431,10 @@ class SemanticMemory:
         """Add a concept to semantic memory."""
         return self.knowledge_graph.add_concept(name, concept_type, metadata)
         
+    def add_concepts(self, concepts: Iterable[Union[str, Dict[str, Any]]]) -> Tuple[List[int], Dict[int, str]]:
+        """Add many concepts to semantic memory with batched embeddings."""
+        return self.knowledge_graph.add_concepts(concepts)
+        
     def add_relation(self,
                     source: str,
                     relation: str,
@@ -581,13 +1451,42 @@ class SemanticMemory:
         """Get concepts related to the specified concept."""
         return self.knowledge_graph.get_related_concepts(concept, relation, direction)
         
+    def neighborhood(self, concept: str, depth: int = 2, **kwargs) -> Dict[str, Any]:
+        """Collect the concepts within ``depth`` hops of a concept."""
+        return self.knowledge_graph.neighborhood(concept, depth, **kwargs)
+        
+    def shortest_path(self, source: str, target: str, **kwargs) -> Optional[List[Dict[str, Any]]]:
+        """Find a path with the fewest hops between two concepts."""
+        return self.knowledge_graph.shortest_path(source, target, **kwargs)
+        
+    def graph_search(self, query: str, limit: int = 10, **kwargs) -> List[Dict[str, Any]]:
+        """Find concepts relevant to a query, following the graph beyond direct matches."""
+        return self.knowledge_graph.graph_search(query, limit, **kwargs)
+        
     def search_similar_concepts(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Search for concepts similar to the query."""
         return self.knowledge_graph.search_similar_concepts(query, limit)
         
-    def import_from_obsidian(self, folder_path: str) -> Tuple[int, int]:
-        """Import concepts and relations from Obsidian notes."""
-        return self.knowledge_graph.import_from_obsidian(folder_path)
+    def search_chunks(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Search imported note content for the chunks most similar to the query."""
+        return self.knowledge_graph.search_chunks(query, limit)
+        
+    def check_embeddings(self) -> Dict[str, Any]:
+        """Check the concept embedding sidecar against the database."""
+        return self.knowledge_graph.check_embeddings()
+        
+    def rebuild_embeddings(self) -> int:
+        """Rebuild the concept embedding sidecar from the database."""
+        return self.knowledge_graph.rebuild_embeddings()
+        
+    def reproject_embeddings(self, dim: Optional[int] = None) -> Dict[str, int]:
+        """Truncate stored concept embeddings to a shorter dimensionality."""
+        return self.knowledge_graph.reproject_embeddings(dim)
+        
+    def import_from_obsidian(self, folder_path: str, full: bool = False,
+                             progress: Optional[Callable[[int, int], None]] = None) -> Tuple[int, int]:
+        """Import new and changed Obsidian notes as concepts and relations."""
+        return self.knowledge_graph.import_from_obsidian(folder_path, full=full, progress=progress)
         
     def __str__(self):
         """String representation of semantic memory."""
@@ -1,5 +1,4 @@
 import json
-import tiktoken
 from datetime import datetime
 
 
@@ -15,9 +14,18 @@ class ShortTermMemory:
         self.max_tokens = max_tokens
         self.conversation_history = []
         self.token_count = 0
-        self.encoding = tiktoken.get_encoding(
-            "cl100k_base"
-        )  # Compatible with most models
+        self._encoding = None
+
+    @property
+    def encoding(self):
+        """Tokenizer used for token counts, loaded on first use."""
+        if self._encoding is None:
+            import tiktoken
+
+            self._encoding = tiktoken.get_encoding(
+                "cl100k_base"
+            )  # Compatible with most models
+        return self._encoding
 
     def add_message(self, role: str, message_text: str):
         """
@@ -29,7 +37,7 @@ class ShortTermMemory:
         if role not in {"user", "assistant", "system"}:
             raise ValueError("Role must be 'user', 'assistant', or 'system'")
         message = {
-            "role": "user",
+            "role": role,
             "content": message_text,
             "timestamp": datetime.now().isoformat(),
         }
@@ -41,6 +49,18 @@ class ShortTermMemory:
         self._update_token_count()
         return message
 
+    def add_user_message(self, message_text: str):
+        """Add a user message to the conversation history."""
+        return self.add_message("user", message_text)
+
+    def add_assistant_message(self, message_text: str):
+        """Add an assistant message to the conversation history."""
+        return self.add_message("assistant", message_text)
+
+    def add_system_message(self, message_text: str):
+        """Add a system message at the start of the conversation history."""
+        return self.add_message("system", message_text)
+
     def _update_token_count(self):
         """Update the token count and trim history if needed."""
         # Approximate token count from conversation history
@@ -0,0 +1,256 @@
+"""
+Background sync of an Obsidian vault into the knowledge graph.
+
+A :class:`VaultWatcher` runs in a daemon thread next to the chat loop or
+the MCP host. It learns about saved, created, moved and deleted notes from
+file system events when ``watchdog`` is installed, and otherwise by
+comparing ``stat`` snapshots of the vault. Changes are debounced, so a
+burst of saves is imported once, and are then pushed through
+``KnowledgeGraph.import_from_obsidian`` in small batches, each in its own
+transaction. A batch that fails to import is queued again and retried
+with exponential backoff. When nothing changes the thread sleeps on an event (or
+between polls), so an idle watcher costs next to no CPU.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .obsidian import is_template, walk_vault
+
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+# Quiet time after the last change before a batch is imported
+DEBOUNCE_SECONDS = 2.0
+
+# Interval between stat snapshots when watchdog is not installed
+POLL_SECONDS = 5.0
+
+# Notes imported per transaction
+SYNC_BATCH = 200
+
+# Delay before retrying a failed import, doubled after every further
+# failure up to the maximum
+RETRY_SECONDS = 5.0
+RETRY_MAX_SECONDS = 300.0
+
+
+class _EventHandler:
+    """Forward watchdog events for markdown files to the watcher."""
+
+    def __init__(self, watcher: "VaultWatcher"):
+        self.watcher = watcher
+
+    def dispatch(self, event):
+        if event.is_directory:
+            return
+        paths = [event.src_path, getattr(event, "dest_path", None)]
+        self.watcher.mark(path for path in paths if path and path.endswith(".md"))
+
+
+class VaultWatcher:
+    """
+    Keep the knowledge graph in sync with an Obsidian vault.
+
+    Usage:
+        watcher = VaultWatcher("~/Notes").start()
+        ...
+        watcher.stop()
+    """
+
+    def __init__(self, folder: str, db_path: Optional[str] = None,
+                 debounce: float = DEBOUNCE_SECONDS,
+                 poll_interval: float = POLL_SECONDS,
+                 batch_size: int = SYNC_BATCH,
+                 retry_delay: float = RETRY_SECONDS):
+        """
+        Initialize the watcher; nothing runs until :meth:`start`.
+
+        Args:
+            folder: Vault directory
+            db_path: Knowledge graph database, defaults to the graph's default path
+            debounce: Seconds without changes before pending notes are imported
+            poll_interval: Seconds between snapshots when polling
+            batch_size: Notes imported per transaction
+            retry_delay: Seconds before the first retry of a failed import
+        """
+        folder = os.path.expanduser(folder)
+        if not os.path.isdir(folder):
+            raise NotADirectoryError(f"Path is not a directory: {folder}")
+        self.folder = os.path.realpath(folder)
+        self.db_path = db_path
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+
+        self._pending: Set[str] = set()
+        self._last_change = 0.0
+        # Backoff after failed imports: no import before _retry_at
+        self._failures = 0
+        self._retry_at = 0.0
+        # Whether the catch-up import of the whole vault is still to succeed
+        self._catch_up = True
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._observer = None
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+
+        # Totals since start, for status reporting
+        self.synced = {"concepts": 0, "relations": 0, "batches": 0, "errors": 0}
+
+    @property
+    def polling(self) -> bool:
+        """Whether changes are found by polling instead of file system events."""
+        return self._observer is None
+
+    def start(self) -> "VaultWatcher":
+        """
+        Start watching in a daemon thread.
+
+        The thread first catches up with changes made since the last import.
+
+        Returns:
+            The watcher itself
+        """
+        if self._thread is not None:
+            return self
+        if Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), self.folder, recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+        self._thread = threading.Thread(target=self._run, name="vault-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        """
+        Stop watching. Changes still pending are picked up by the next start.
+
+        Args:
+            timeout: Seconds to wait for an import in progress
+        """
+        self._stopping.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def mark(self, paths: Iterable[str]):
+        """
+        Queue notes for import and restart the debounce timer.
+
+        Args:
+            paths: Created, modified or deleted note paths
+        """
+        paths = {os.path.normpath(path) for path in paths if not is_template(path)}
+        if not paths:
+            return
+        with self._lock:
+            self._pending |= paths
+            self._last_change = time.monotonic()
+        self._wake.set()
+
+    def _poll(self):
+        """Queue the notes whose stat changed since the previous snapshot."""
+        snapshot = {path: (stat.st_mtime_ns, stat.st_size)
+                    for path, stat in walk_vault(self.folder)}
+        changed = {path for path, key in snapshot.items() if self._snapshot.get(path) != key}
+        changed |= self._snapshot.keys() - snapshot.keys()
+        self._snapshot = snapshot
+        self.mark(changed)
+
+    def _due(self) -> float:
+        """Return the monotonic time at which pending notes may be imported."""
+        return max(self._last_change + self.debounce, self._retry_at)
+
+    def _take_batch(self) -> Optional[List[str]]:
+        """Return the next batch of debounced notes, or None if none is due."""
+        with self._lock:
+            if not self._pending or time.monotonic() < self._due():
+                return None
+            batch = sorted(self._pending)[:self.batch_size]
+            self._pending.difference_update(batch)
+            return batch
+
+    def _sync(self, graph, paths: Optional[List[str]] = None) -> bool:
+        """
+        Import a batch of notes (or the whole vault), reporting failures.
+
+        A failed batch goes back to the pending notes, and no import is
+        tried again before the backoff delay has passed.
+
+        Returns:
+            True if the import succeeded
+        """
+        try:
+            concepts, relations = graph.import_from_obsidian(self.folder, paths=paths)
+        except Exception as e:
+            self.synced["errors"] += 1
+            with self._lock:
+                self._failures += 1
+                delay = min(self.retry_delay * 2 ** (self._failures - 1), RETRY_MAX_SECONDS)
+                self._retry_at = time.monotonic() + delay
+                if paths:
+                    self._pending.update(paths)
+            print(f"Warning: Failed to sync Obsidian vault {self.folder}, "
+                  f"retrying in {delay:.0f}s: {e}")
+            return False
+        with self._lock:
+            self._failures = 0
+            self._retry_at = 0.0
+        self.synced["concepts"] += concepts
+        self.synced["relations"] += relations
+        self.synced["batches"] += 1
+        return True
+
+    def _run(self):
+        """Watcher thread: catch up, then import debounced batches until stopped."""
+        from .semantic_memory import KnowledgeGraph
+        graph = KnowledgeGraph(self.db_path)
+
+        if self.polling:
+            self._snapshot = {path: (stat.st_mtime_ns, stat.st_size)
+                              for path, stat in walk_vault(self.folder)}
+
+        next_poll = time.monotonic() + self.poll_interval
+        while not self._stopping.is_set():
+            if self._catch_up and time.monotonic() >= self._retry_at:
+                self._catch_up = not self._sync(graph)
+                continue
+            batch = self._take_batch()
+            if batch:
+                self._sync(graph, batch)
+                continue
+
+            # Sleep until the debounce window closes, a retry is due, the
+            # next poll is due, or (with file system events) something changes
+            timeouts = []
+            with self._lock:
+                if self._pending:
+                    timeouts.append(self._due() - time.monotonic())
+            if self._catch_up:
+                timeouts.append(self._retry_at - time.monotonic())
+            if self.polling:
+                timeouts.append(next_poll - time.monotonic())
+            self._wake.wait(max(min(timeouts), 0) if timeouts else None)
+            self._wake.clear()
+
+            if self.polling and time.monotonic() >= next_poll:
+                self._poll()
+                next_poll = time.monotonic() + self.poll_interval
+
+    def __str__(self):
+        mode = "polling" if self.polling else "events"
+        return (f"VaultWatcher({self.folder}, {mode}): {self.synced['concepts']} concepts, "
+                f"{self.synced['relations']} relations in {self.synced['batches']} batches")
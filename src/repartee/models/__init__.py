@@ -3,7 +3,21 @@ Models package for Repartee.
 
 Contains integrations with various language models.
 """
-from .anthropic_models import AnthropicModel
-from .openai_models import OpenAIModel
-from .google_models import GoogleModel
-from .perplexity_models import PerplexityModel
+
+# Each integration is imported on first access, so using one provider does
+# not import the SDKs of all the others
+_LAZY = {
+    "AnthropicModel": ".anthropic_models",
+    "OpenAIModel": ".openai_models",
+    "GoogleModel": ".google_models",
+    "PerplexityModel": ".perplexity_models",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,118 @@
+"""
+Vector search benchmark for the IVF index.
+
+Writes a synthetic store (1M rows of 1536-dimensional embeddings by
+default, the size of ``text-embedding-3-small`` vectors for a million
+messages) to a throwaway memory-mapped sidecar, trains an ``IVFIndex``
+over it, then times top-5 queries with the IVF index and, for a few of
+them, with the exact scan, reports the IVF recall against the exact
+results, and exits non-zero when the IVF median exceeds its budget.
+
+Rows are drawn around a thousand random topics, so that nearest
+neighbours are meaningful, and queries are perturbed copies of stored
+rows. The full-size store takes 6 GB on disk; on machines with less free
+memory than that, IVF queries read their candidate rows from disk and
+the timings measure the disk rather than the index. Pass a smaller size
+to stay in memory.
+
+Usage: python -m repartee.tests.bench_ann [rows] [dim] [queries] [nprobe]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from ..memory.ann_index import IVFIndex
+from ..memory.embedding_store import EmbeddingSidecar
+
+# Median latency budgets of a top-5 query, in seconds
+BUDGETS = {
+    "ivf top-5": 0.010,
+}
+
+# Rows generated and appended per step
+WRITE_CHUNK = 20000
+
+# Queries also answered by the exact scan, for recall; each one reads
+# the whole store
+EXACT_QUERIES = 10
+
+TOPICS = 1000
+
+
+def build_store(sidecar: EmbeddingSidecar, rows: int, seed: int = 0):
+    """Append ``rows`` embeddings drawn around ``TOPICS`` random centres."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((TOPICS, sidecar.dim), dtype=np.float32)
+    for start in range(0, rows, WRITE_CHUNK):
+        count = min(WRITE_CHUNK, rows - start)
+        topics = rng.integers(TOPICS, size=count)
+        vectors = centres[topics] + rng.standard_normal((count, sidecar.dim), dtype=np.float32)
+        sidecar.add_many(range(start + 1, start + count + 1), vectors)
+
+
+def time_queries(fn, queries):
+    """Return the results and wall-clock times of fn(q, 5) for every query."""
+    results, times = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query, 5)[0])
+        times.append(time.perf_counter() - start)
+    return results, times
+
+
+def report(name, times):
+    """Print the median and p95 of a case and return whether it is over budget."""
+    median = statistics.median(times)
+    budget = BUDGETS.get(name)
+    status = ""
+    if budget is not None:
+        status = f"budget {budget * 1000:5.0f} ms  " + ("ok" if median <= budget else "OVER BUDGET")
+    print(f"{name:12s} median {median * 1000:8.2f} ms  p95 "
+          f"{sorted(times)[max(int(len(times) * 0.95) - 1, 0)] * 1000:8.2f} ms  {status}",
+          flush=True)
+    return budget is not None and median > budget
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 1536
+    queries = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    nprobe = int(sys.argv[4]) if len(sys.argv) > 4 else 8
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "store.db")
+        sidecar = EmbeddingSidecar(db_path, dim)
+        start = time.perf_counter()
+        build_store(sidecar, rows)
+        print(f"wrote {rows} x {dim} embeddings ({rows * dim * 4 / 1e9:.1f} GB) "
+              f"in {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        index = IVFIndex(sidecar, db_path + ".ivf.npz", nprobe=nprobe)
+        print(f"trained {len(index._centroids)} lists in {time.perf_counter() - start:.1f} s, "
+              f"nprobe {nprobe}")
+
+        picked = rng.integers(rows, size=queries)
+        noise = rng.standard_normal((queries, dim), dtype=np.float32) * 0.05
+        sample = np.asarray(sidecar.vectors[picked]) + noise
+
+        # Warm the index once, as a long-running process would be
+        index.search(sample[0], 5)
+        approximate, ivf_times = time_queries(index.search, sample)
+        failed = report("ivf top-5", ivf_times)
+
+        exact, exact_times = time_queries(sidecar.search, sample[:EXACT_QUERIES])
+        report("exact top-5", exact_times)
+        recall = np.mean([len(np.intersect1d(a, e)) / len(e)
+                          for a, e in zip(approximate, exact)])
+        print(f"ivf recall@5 {recall:.3f} over {len(exact)} queries")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
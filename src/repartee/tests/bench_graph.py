@@ -0,0 +1,107 @@
+"""
+Traversal benchmark for the knowledge graph.
+
+Builds a synthetic vault-shaped graph (100k ``links_to`` edges by default,
+a few hub notes and many sparsely linked ones) in a throwaway database,
+loads its adjacency snapshot, then times 3-hop ``neighborhood`` expansions
+and ``shortest_path`` queries between random concepts, and exits non-zero
+when a median exceeds its budget. No embeddings are computed.
+
+Usage: python -m repartee.tests.bench_graph [edges] [queries]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from ..memory.semantic_memory import KnowledgeGraph
+
+# Median latency budgets, in seconds
+BUDGETS = {
+    "neighborhood depth=3 max_nodes=100": 0.005,
+    "neighborhood depth=3 max_nodes=1000": 0.05,
+    "shortest_path": 0.05,
+}
+
+
+def build_graph(graph: KnowledgeGraph, edges: int, seed: int = 0):
+    """Fill the graph with ``edges`` links between edges / 20 notes."""
+    rng = random.Random(seed)
+    notes = max(edges // 20, 2)
+    now = datetime.now().isoformat()
+    hubs = max(notes // 100, 1)
+    with graph._db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO nodes (name, created_at, updated_at) VALUES (?, ?, ?)",
+            [(f"note-{i}", now, now) for i in range(notes)]
+        )
+        links = set()
+        while len(links) < edges:
+            source = rng.randrange(notes)
+            # One link in five points at a hub, the rest anywhere
+            target = rng.randrange(hubs) if rng.random() < 0.2 else rng.randrange(notes)
+            if source != target:
+                links.add((source + 1, target + 1))
+        conn.executemany(
+            """
+            INSERT INTO edges (source_id, target_id, relation, weight, created_at, updated_at)
+            VALUES (?, ?, 'links_to', ?, ?, ?)
+            """,
+            [(s, t, round(rng.random(), 2), now, now) for s, t in links]
+        )
+    return notes
+
+
+def time_queries(fn, args):
+    """Return the wall-clock time of fn(*a) for every a in args."""
+    times = []
+    for a in args:
+        start = time.perf_counter()
+        fn(*a)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    edges = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = KnowledgeGraph(os.path.join(tmp, "graph.db"))
+        start = time.perf_counter()
+        notes = build_graph(graph, edges)
+        print(f"built {notes} notes, {edges} edges in {time.perf_counter() - start:.1f} s")
+        start = time.perf_counter()
+        snapshot = graph.graph_snapshot()
+        print(f"adjacency snapshot: {snapshot.nbytes() / 1e6:.1f} MB, "
+              f"loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        starts = [(f"note-{rng.randrange(notes)}",) for _ in range(queries)]
+        pairs = [(f"note-{rng.randrange(notes)}", f"note-{rng.randrange(notes)}")
+                 for _ in range(queries)]
+        cases = {
+            "neighborhood depth=3 max_nodes=100":
+                time_queries(lambda c: graph.neighborhood(c, 3, max_nodes=100), starts),
+            "neighborhood depth=3 max_nodes=1000":
+                time_queries(lambda c: graph.neighborhood(c, 3, max_nodes=1000), starts),
+            "shortest_path": time_queries(graph.shortest_path, pairs),
+        }
+
+        failed = False
+        for name, times in cases.items():
+            median = statistics.median(times)
+            budget = BUDGETS[name]
+            status = "ok" if median <= budget else "OVER BUDGET"
+            failed = failed or median > budget
+            print(f"{name:40s} median {median * 1000:7.2f} ms  p95 "
+                  f"{sorted(times)[int(len(times) * 0.95) - 1] * 1000:7.2f} ms  "
+                  f"budget {budget * 1000:5.0f} ms  {status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Startup-time benchmark for the CLI.
+
+Times fresh interpreters running `python -m repartee --help`, read-only
+`--list-conversations` and one-shot mode, and exits non-zero when the
+median exceeds its budget. One-shot mode replaces the model call and the
+embeddings request with local stubs, so only Repartee's own startup and
+bookkeeping are measured, in a throwaway home directory.
+
+Usage: python -m repartee.tests.bench_startup [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Median wall-clock budgets, in seconds
+BUDGETS = {
+    "--help": 0.5,
+    "--list-conversations": 1.0,
+    "one-shot": 2.0,
+}
+
+ONE_SHOT = """
+import numpy as np
+from repartee.models.openai_models import OpenAIModel
+from repartee.memory.episodic_memory import EpisodicMemory
+OpenAIModel.generate_text = lambda self, prompt, **kw: "ok"
+EpisodicMemory._request_embeddings = lambda self, texts: np.ones((len(texts), 8), dtype=np.float32)
+from repartee.ui.cli import main
+main(["hello"])
+"""
+
+COMMANDS = {
+    "--help": ["-m", "repartee", "--help"],
+    "--list-conversations": ["-m", "repartee", "--list-conversations"],
+    "one-shot": ["-c", ONE_SHOT],
+}
+
+
+def time_command(args, env, runs):
+    """Return the wall-clock times of `runs` fresh interpreters running args."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-bench"))
+        failed = False
+        for name, args in COMMANDS.items():
+            median = statistics.median(time_command(args, env, runs))
+            budget = BUDGETS[name]
+            status = "ok" if median <= budget else "OVER BUDGET"
+            failed = failed or median > budget
+            print(f"{name:24s} median {median * 1000:7.1f} ms  budget {budget * 1000:6.0f} ms  {status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Shared fixtures of the memory tests.
+
+Every test gets its own home directory, so the default memory databases
+and the embedding cache are created under ``tmp_path``, and embeddings
+come from a deterministic bag-of-words hash instead of a provider.
+"""
+
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from ..memory import embedding_cache
+from ..memory.episodic_memory import EpisodicMemory
+from ..memory.semantic_memory import KnowledgeGraph
+
+# Dimensionality of the fake embeddings
+DIM = 64
+
+
+def fake_embeddings(texts):
+    """Embed texts as normalised hashed word counts: shared words mean similar vectors."""
+    vectors = np.zeros((len(texts), DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r"\w+", text.lower()):
+            vectors[row, zlib.crc32(word.encode()) % DIM] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+@pytest.fixture
+def memory_home(tmp_path, monkeypatch):
+    """Point the default memory locations at a fresh directory."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(Path, "home", classmethod(lambda cls: tmp_path))
+    monkeypatch.setattr(embedding_cache, "_cache", None)
+    return tmp_path
+
+
+@pytest.fixture
+def embeddings(memory_home, monkeypatch):
+    """Replace the embedding provider of both memory stores with :func:`fake_embeddings`."""
+    for store in (EpisodicMemory, KnowledgeGraph):
+        monkeypatch.setattr(store, "_request_embeddings",
+                            lambda self, texts: fake_embeddings(texts))
+    return fake_embeddings
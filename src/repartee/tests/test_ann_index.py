@@ -0,0 +1,77 @@
+"""Tests of the approximate nearest-neighbour indexes."""
+
+import threading
+
+import numpy as np
+import pytest
+
+from ..config import config
+from ..memory.ann_index import IVFIndex
+from ..memory.episodic_memory import EpisodicMemory
+from ..memory.vector_index import EmbeddingMatrix
+from .conftest import DIM, fake_embeddings
+
+
+def _content(i):
+    return f"note {i} about topic{i % 89} and subject{i % 97}"
+
+
+def test_ivf_index_finds_stored_vectors(tmp_path):
+    vectors = np.random.default_rng(0).standard_normal((3000, DIM)).astype(np.float32)
+    base = EmbeddingMatrix(DIM)
+    base.add_many(range(1, 3001), vectors)
+
+    index = IVFIndex(base, str(tmp_path / "index.npz"), min_rows=1000)
+
+    ids, scores = index.search(vectors[41], 3)
+    assert ids[0] == 42
+    assert scores[0] == pytest.approx(1.0)
+    # The trained state is reused by the next process
+    reopened = IVFIndex(base, str(tmp_path / "index.npz"), min_rows=1000)
+    np.testing.assert_array_equal(reopened._centroids, index._centroids)
+
+
+def test_background_workers_share_an_ivf_index(embeddings, monkeypatch, capsys):
+    monkeypatch.setitem(config.embeddings, "index", "ivf")
+    monkeypatch.setitem(config.embeddings, "ann_min_rows", 256)
+    memory = EpisodicMemory()
+    memory.add_messages({"role": "user", "content": _content(i)} for i in range(300))
+    memory.search_similar("topic1", 1)
+    assert isinstance(memory._matrix, IVFIndex)
+
+    # Queue rows for two workers; their batches train the index (the store
+    # grows past four times its trained size) and save it repeatedly
+    with memory._db.transaction() as conn:
+        conn.executemany("INSERT INTO messages (conversation_id, role, content, timestamp) "
+                         "VALUES ('c', 'user', ?, '2024-05-01T00:00:00')",
+                         [(_content(i),) for i in range(300, 4000)])
+        conn.execute("INSERT INTO pending_embeddings (message_id) "
+                     "SELECT id FROM messages WHERE embedding IS NULL")
+    embedder = memory.start_background_embedding(workers=2)
+    embedder.notify()
+
+    # Search from this thread while the workers add rows
+    errors = []
+    done = threading.Event()
+
+    def search():
+        while not done.is_set():
+            try:
+                memory._matrix.search(fake_embeddings(["topic3 subject5"])[0], 5)
+            except Exception as e:
+                errors.append(e)
+
+    searcher = threading.Thread(target=search)
+    searcher.start()
+    try:
+        assert memory.close(drain=True, timeout=60)
+    finally:
+        done.set()
+        searcher.join()
+
+    assert not errors
+    assert "Background embedding failed" not in capsys.readouterr().out
+    assert len(memory._matrix) == 4000
+    for i in (0, 1234, 3999):
+        ids, scores = memory._matrix.search(fake_embeddings([_content(i)])[0], 1)
+        assert scores[0] == pytest.approx(1.0)
@@ -0,0 +1,105 @@
+"""Tests of episodic memory compaction into digests."""
+
+import pytest
+
+from ..config import config
+from ..memory.compaction import DIGEST_ROLE
+from ..memory.episodic_memory import EpisodicMemory
+
+CUTOFF = "2024-03-01T00:00:00"
+DELETE_BEFORE = "2024-02-01T00:00:00"
+
+CONVERSATIONS = {
+    "garden": ["The zebra plant needs shade.", "Water the ferns weekly."],
+    "travel": ["Book the night train to Vienna.", "Pack the zebra umbrella."],
+    "recent": ["The zebra crossing was repainted."],
+}
+
+
+@pytest.fixture(params=[False, True], ids=["matrix", "sidecar"])
+def episodic(embeddings, monkeypatch, request):
+    monkeypatch.setitem(config.embeddings, "sidecar", request.param)
+    memory = EpisodicMemory()
+    month = {"garden": "01", "travel": "02", "recent": "05"}
+    memory.add_messages({"role": "user", "content": content, "conversation_id": conv_id,
+                         "timestamp": f"2024-{month[conv_id]}-10T00:00:{i:02d}"}
+                        for conv_id, contents in CONVERSATIONS.items()
+                        for i, content in enumerate(contents))
+    yield memory
+    memory.close(drain=False)
+
+
+def _roles(memory, conv_id):
+    return [(m["role"], m["content"]) for m in memory.get_conversation(conv_id)]
+
+
+def _digest(messages):
+    return "digest: " + " / ".join(m["content"] for m in messages)
+
+
+def test_digests_replace_the_summarized_messages(episodic):
+    report = episodic.compact_before(CUTOFF, DELETE_BEFORE, summarize_fn=_digest, vacuum=False)
+
+    assert (report["conversations"], report["messages_summarized"]) == (2, 4)
+    assert report["vectors_deleted"] == 4
+    # January is past the deletion limit; February keeps its messages without embeddings
+    assert report["messages_deleted"] == 2
+    assert _roles(episodic, "garden") == [
+        (DIGEST_ROLE, "digest: The zebra plant needs shade. / Water the ferns weekly.")]
+    assert [role for role, _ in _roles(episodic, "travel")] == ["user", "user", DIGEST_ROLE]
+    assert _roles(episodic, "recent") == [("user", CONVERSATIONS["recent"][0])]
+    counts = {c["conversation_id"]: c["message_count"]
+              for c in episodic.list_conversations(limit=10)}
+    assert counts == {"garden": 1, "travel": 3, "recent": 1}
+
+    # Nothing is left to compact
+    again = episodic.compact_before(CUTOFF, DELETE_BEFORE, summarize_fn=_digest, vacuum=False)
+    assert (again["conversations"], again["messages_deleted"]) == (0, 0)
+
+
+def test_interrupted_run_resumes(episodic):
+    def interrupted(messages):
+        if messages[0]["content"].startswith("Book"):
+            raise KeyboardInterrupt
+        return _digest(messages)
+
+    with pytest.raises(KeyboardInterrupt):
+        episodic.compact_before(CUTOFF, summarize_fn=interrupted, vacuum=False)
+    assert episodic.last_compaction() is None
+    assert [role for role, _ in _roles(episodic, "garden")][-1] == DIGEST_ROLE
+
+    report = episodic.compact_before(CUTOFF, summarize_fn=_digest, vacuum=False)
+
+    assert report["resumed"]
+    # garden was digested before the interruption and is not digested again
+    assert (report["conversations"], report["messages_summarized"]) == (1, 2)
+    assert [role for role, _ in _roles(episodic, "garden")].count(DIGEST_ROLE) == 1
+    assert [role for role, _ in _roles(episodic, "travel")].count(DIGEST_ROLE) == 1
+    unfinished = episodic._db.connection().execute(
+        "SELECT COUNT(*) FROM compaction_runs WHERE finished_at IS NULL").fetchone()[0]
+    assert unfinished == 0
+    assert episodic.last_compaction()["conversations"] == 1
+
+
+def test_compacted_messages_leave_the_search_indexes(episodic):
+    # Load the vector index before compacting
+    before = {m["content"] for m in episodic.search_similar("zebra", 10)}
+    assert set(CONVERSATIONS["garden"][:1] + CONVERSATIONS["travel"][1:]) <= before
+
+    episodic.compact_before(CUTOFF, DELETE_BEFORE, summarize_fn=_digest, vacuum=False)
+
+    similar = episodic.search_similar("zebra", 10)
+    assert {m["role"] for m in similar} == {"user", DIGEST_ROLE}
+    assert {m["content"] for m in similar if m["role"] == "user"} == \
+        set(CONVERSATIONS["recent"])
+    # Deleted messages are gone from the full-text index, kept ones are
+    # still found by keywords, and digests are searchable by both
+    lexical = [(m["role"], m["content"]) for m in episodic.search_lexical("zebra", 10)]
+    assert ("user", CONVERSATIONS["garden"][0]) not in lexical
+    assert ("user", CONVERSATIONS["travel"][1]) in lexical
+    assert sum(role == DIGEST_ROLE for role, _ in lexical) == 2
+    # A fresh process sees the same
+    reopened = EpisodicMemory(db_path=episodic.db_path)
+    assert [m["id"] for m in reopened.search_similar("zebra", 10)] == [m["id"] for m in similar]
+    if config.embeddings.get("sidecar"):
+        assert reopened.check_embeddings()["consistent"]
@@ -0,0 +1,83 @@
+"""Tests of the persistent embedding cache."""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from ..memory import embedding_cache
+from ..memory.embedding_cache import EmbeddingCache
+
+NAMESPACE = ("openai", "text-embedding-3-small", 0)
+
+
+def _vector(i):
+    return np.full(4, i, dtype=np.float32)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Make every ``time.time()`` of the cache one second later than the last."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(ticks)))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def test_hits_and_misses(db_path):
+    cache = EmbeddingCache(db_path)
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return [_vector(len(text)) for text in texts]
+
+    settings = {"model": "text-embedding-3-small"}
+    first = cache.embed(["a", "bb", "a"], embed, settings)
+    second = cache.embed(["bb", "ccc"], embed, settings)
+
+    assert calls == [["a", "bb"], ["ccc"]]
+    np.testing.assert_array_equal(first[:, 0], [1, 2, 1])
+    np.testing.assert_array_equal(second[:, 0], [2, 3])
+    assert (cache.hits, cache.misses) == (1, 4)
+
+    # Another namespace misses; another process reads the entries from disk
+    assert cache.get_many(("openai", "text-embedding-3-large", 0), ["a"]) == [None]
+    reopened = EmbeddingCache(db_path)
+    np.testing.assert_array_equal(reopened.get_many(NAMESPACE, ["ccc"])[0], _vector(3))
+    assert reopened.stats() == {"hits": 1, "misses": 0, "hit_rate": 1.0,
+                                "entries": 3, "max_entries": 200000}
+
+
+def test_replacing_an_entry_does_not_count_it_again(db_path):
+    cache = EmbeddingCache(db_path)
+    cache.put_many(NAMESPACE, ["a", "b"], [_vector(1), _vector(2)])
+    cache.put_many(NAMESPACE, ["a", "b", "b", "c"], [_vector(5)] * 4)
+
+    assert cache.stats()["entries"] == 3
+    reopened = EmbeddingCache(db_path)
+    assert reopened.stats()["entries"] == 3
+    np.testing.assert_array_equal(reopened.get_many(NAMESPACE, ["a"])[0], _vector(5))
+
+
+def test_eviction_drops_the_least_recently_used_entries(db_path, clock, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "MEMORY_ENTRIES", 0)
+    cache = EmbeddingCache(db_path, max_entries=10)
+    texts = [f"text {i}" for i in range(10)]
+    for i, text in enumerate(texts):
+        cache.put_many(NAMESPACE, [text], [_vector(i)])
+    # Reading an entry makes it recent again, rewriting one does too
+    assert cache.get_many(NAMESPACE, [texts[0]])[0] is not None
+    cache.put_many(NAMESPACE, [texts[1]], [_vector(1)])
+    assert cache.stats()["entries"] == 10
+
+    # One entry over the cap evicts down to 90%
+    cache.put_many(NAMESPACE, ["text 10"], [_vector(10)])
+
+    assert cache.stats()["entries"] == 9
+    found = cache.get_many(NAMESPACE, texts + ["text 10"])
+    assert [text for text, vector in zip(texts, found) if vector is None] == \
+        ["text 2", "text 3"]
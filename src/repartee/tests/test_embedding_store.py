@@ -0,0 +1,77 @@
+"""Tests of the memory-mapped embedding sidecar."""
+
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+from ..memory.embedding_store import EmbeddingSidecar
+from ..memory.quantization import ENCODING_F32
+
+DIM = 8
+
+
+def _vectors(count, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+
+
+def test_append_after_a_torn_tail_keeps_vectors_and_ids_aligned(tmp_path):
+    db_path = str(tmp_path / "store.db")
+    vectors = _vectors(3)
+    sidecar = EmbeddingSidecar(db_path, DIM)
+    sidecar.add(1, vectors[0])
+    # A writer died after appending its vector but before its id
+    with open(sidecar.vec_path, "ab") as f:
+        f.write(vectors[1].tobytes())
+
+    reopened = EmbeddingSidecar(db_path, DIM)
+    assert len(reopened) == 1
+    reopened.add(3, vectors[2])
+
+    ids, scores = reopened.search(vectors[2], 2)
+    assert list(ids) == [3, 1]
+    assert scores[0] == pytest.approx(1.0)
+    assert os.path.getsize(reopened.vec_path) == 16 + 2 * DIM * 4
+    assert os.path.getsize(reopened.ids_path) == 2 * 8
+
+
+def test_a_replaced_vector_file_is_remapped(tmp_path):
+    db_path = str(tmp_path / "store.db")
+    old, new = _vectors(2, seed=1), _vectors(2, seed=2)
+    writer = EmbeddingSidecar(db_path, DIM)
+    writer.add_many([1, 2], old)
+    reader = EmbeddingSidecar(db_path, DIM)
+    assert reader.search(old[1], 1)[1][0] == pytest.approx(1.0)
+
+    # Same size and the same .ids file: only the .vec inode tells them apart
+    tmp_vec = writer.vec_path + ".tmp"
+    with open(tmp_vec, "wb") as f:
+        f.write(EmbeddingSidecar._header(DIM))
+        f.write((new / np.linalg.norm(new, axis=1, keepdims=True)).tobytes())
+    os.replace(tmp_vec, writer.vec_path)
+
+    ids, scores = reader.search(new[1], 1)
+    assert list(ids) == [2]
+    assert scores[0] == pytest.approx(1.0)
+
+
+def test_rebuild_is_seen_by_other_readers(tmp_path):
+    db_path = str(tmp_path / "store.db")
+    vectors = _vectors(3, seed=3)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE messages (id INTEGER PRIMARY KEY, embedding BLOB, "
+                     "embedding_encoding INTEGER)")
+        conn.executemany("INSERT INTO messages VALUES (?, ?, ?)",
+                         [(i + 1, vectors[i].tobytes(), ENCODING_F32) for i in range(3)])
+    writer = EmbeddingSidecar(db_path, DIM)
+    writer.add_many([1, 2], _vectors(2, seed=4))
+    reader = EmbeddingSidecar(db_path, DIM)
+    assert not reader.check(db_path, "messages")["consistent"]
+
+    assert writer.rebuild(db_path, "messages") == 3
+
+    assert reader.check(db_path, "messages")["consistent"]
+    ids, scores = reader.search(vectors[2], 1)
+    assert list(ids) == [3]
+    assert scores[0] == pytest.approx(1.0)
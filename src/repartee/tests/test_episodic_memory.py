@@ -0,0 +1,113 @@
+"""Tests of episodic memory search: keywords, vectors and their fusion."""
+
+import pytest
+
+from ..memory.episodic_memory import RRF_K, EpisodicMemory, fts_query, fuse_rankings
+
+CONTENTS = [
+    "the zebra crossing near the station",
+    "zebra stripes confuse biting flies",
+    "stripes are back in fashion",
+    "parrot feathers on the balcony",
+    "ERR_CONN_RESET while uploading main.py",
+    "feeding the parrot at noon",
+]
+
+
+@pytest.fixture
+def episodic(embeddings):
+    memory = EpisodicMemory()
+    memory.add_messages({"role": "user", "content": content, "conversation_id": "c",
+                         "timestamp": f"2024-05-01T00:00:{i:02d}"}
+                        for i, content in enumerate(CONTENTS))
+    yield memory
+    memory.close(drain=False)
+
+
+def _ranking(results, key):
+    return [r["id"] for r in results], [r[key] for r in results]
+
+
+def test_fts_query_quotes_and_ors_chunks():
+    assert fts_query('main.py "OR" ERR_CONN_RESET') == '"main py" OR "OR" OR "ERR_CONN_RESET"'
+    assert fts_query("?? !!") == ""
+
+
+def test_fuse_rankings_favours_items_in_both_rankings():
+    top, fused, details = fuse_rankings({"bm25": ([1, 2], [9.0, 8.0]),
+                                         "similarity": ([3, 2], [0.9, 0.8])}, 2)
+
+    assert top == [2, 1]
+    assert fused[2] == pytest.approx(1 / (RRF_K + 2) * 2)
+    assert fused[1] == fused[3] == pytest.approx(1 / (RRF_K + 1))
+    assert details[2] == {"bm25": 8.0, "similarity": 0.8}
+    assert details[3] == {"similarity": 0.9}
+
+
+def test_hybrid_search_fuses_keyword_and_vector_rankings(episodic):
+    query = "zebra stripes"
+    depth = len(CONTENTS)
+    lexical = episodic.search(query, depth, mode="lexical")
+    vector = episodic.search(query, depth, mode="vector")
+    expected, fused, _ = fuse_rankings({"bm25": _ranking(lexical, "bm25"),
+                                        "similarity": _ranking(vector, "similarity")}, 4)
+
+    results = episodic.search(query, 4)
+
+    assert [r["id"] for r in results] == expected
+    assert [r["score"] for r in results] == pytest.approx([fused[i] for i in expected])
+    assert results[0]["content"] == "zebra stripes confuse biting flies"
+    assert {"bm25", "similarity"} <= set(results[0])
+    # Every embedded message is a vector candidate, keyword matches or not
+    assert {r["content"] for r in vector} == set(CONTENTS)
+    assert {r["content"] for r in lexical} == set(CONTENTS[:3])
+
+
+def test_lexical_search_matches_identifiers_as_written(episodic):
+    assert [m["content"] for m in episodic.search_lexical("ERR_CONN_RESET", 5)] == [CONTENTS[4]]
+    assert [m["content"] for m in episodic.search_lexical("main.py", 5)] == [CONTENTS[4]]
+    assert episodic.search_lexical("ERR_CONN", 5) == []
+
+
+def test_hybrid_search_falls_back_to_keywords_when_embedding_fails(episodic, monkeypatch,
+                                                                   capsys):
+    def offline(self, texts):
+        raise ConnectionError("network unreachable")
+
+    monkeypatch.setattr(EpisodicMemory, "_request_embeddings", offline)
+    episodic.add_message("user", "a parrot learned to whistle", "c", "2024-05-02T00:00:00")
+
+    results = episodic.search("parrot", 5)
+
+    assert "Vector search unavailable" in capsys.readouterr().out
+    assert [r["id"] for r in results] == [m["id"] for m in episodic.search_lexical("parrot", 5)]
+    assert {r["content"] for r in results} == {CONTENTS[3], CONTENTS[5],
+                                               "a parrot learned to whistle"}
+    assert all("bm25" in r and "similarity" not in r for r in results)
+
+
+def test_full_text_index_follows_updates_and_deletes(episodic):
+    ids = {m["content"]: m["id"] for m in episodic.get_conversation("c")}
+    with episodic._db.transaction() as conn:
+        conn.execute("UPDATE messages SET content = 'the giraffe crossing' WHERE id = ?",
+                     (ids[CONTENTS[0]],))
+        conn.execute("DELETE FROM messages WHERE id = ?", (ids[CONTENTS[1]],))
+        conn.execute("UPDATE messages SET role = 'assistant' WHERE id = ?", (ids[CONTENTS[2]],))
+        # Fails if the index and the messages table disagree
+        conn.execute("INSERT INTO messages_fts(messages_fts, rank) VALUES ('integrity-check', 1)")
+
+    assert [m["content"] for m in episodic.search_lexical("zebra", 5)] == []
+    assert [m["content"] for m in episodic.search_lexical("giraffe", 5)] == ["the giraffe crossing"]
+    assert [m["content"] for m in episodic.search_lexical("stripes", 5)] == [CONTENTS[2]]
+
+
+def test_full_text_index_is_built_for_existing_messages(episodic):
+    with episodic._db.transaction() as conn:
+        for trigger in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER messages_fts_{trigger}")
+        conn.execute("DROP TABLE messages_fts")
+
+    reopened = EpisodicMemory(db_path=episodic.db_path)
+
+    assert {m["content"] for m in reopened.search_lexical("parrot", 5)} == {CONTENTS[3],
+                                                                          CONTENTS[5]}
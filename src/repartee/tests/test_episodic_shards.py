@@ -0,0 +1,199 @@
+"""Tests of the time-sharded episodic memory, checked against an unsharded store."""
+
+import random
+import sqlite3
+
+import pytest
+
+from ..memory.episodic_memory import EpisodicMemory
+from ..memory.episodic_shards import (SHARD_ID_BITS, ShardedEpisodicMemory, period_index,
+                                      period_name, period_of, shard_of)
+
+MONTHS = ["2023-11", "2023-12", "2024-01", "2024-02", "2024-03"]
+
+
+def _conversation_messages(count=20, seed=7):
+    """
+    Messages of ``count`` conversations, each spanning one to three months.
+
+    Every timestamp is unique, so both stores order them the same way.
+    """
+    rng = random.Random(seed)
+    messages = []
+    for k in range(count):
+        start = rng.randrange(len(MONTHS))
+        for month in MONTHS[start:start + rng.randint(1, 3)]:
+            for j in range(rng.randint(1, 4)):
+                padding = "word " * rng.randint(1, 30)
+                messages.append({
+                    "conversation_id": f"conv-{k}",
+                    "role": "user" if j % 2 == 0 else "assistant",
+                    "content": f"message {j} of conversation {k} in {month} {padding}",
+                    "timestamp": f"{month}-{k + 1:02d}T{j:02d}:00:00",
+                })
+    messages.sort(key=lambda msg: msg["timestamp"])
+    return messages
+
+
+@pytest.fixture
+def shards(embeddings, tmp_path):
+    memory = ShardedEpisodicMemory(str(tmp_path / "shards"))
+    yield memory
+    memory.close(drain=False)
+
+
+@pytest.fixture
+def flat(embeddings, tmp_path):
+    memory = EpisodicMemory(db_path=str(tmp_path / "flat.db"))
+    yield memory
+    memory.close(drain=False)
+
+
+@pytest.fixture
+def both(shards, flat):
+    """The same conversations in a sharded and an unsharded store."""
+    messages = _conversation_messages()
+    shards.add_messages(messages)
+    flat.add_messages(messages)
+    return shards, flat
+
+
+def _summary(conversations):
+    return [(c["conversation_id"], c["timestamp"], c["last_activity"], c["message_count"])
+            for c in conversations]
+
+
+def _contents(messages):
+    return [(m["content"], m["timestamp"]) for m in messages]
+
+
+def test_periods():
+    assert period_of("2024-03-05T10:00:00") == "2024-03"
+    assert period_name(period_index("2024-12")) == "2024-12"
+    assert period_index("2025-01") == period_index("2024-12") + 1
+    for timestamp in ("2024-13-01T00:00:00", "yesterday", ""):
+        with pytest.raises(ValueError):
+            period_of(timestamp)
+
+
+def test_message_ids_live_in_their_shard_id_range(shards):
+    first = shards.add_message("user", "zebra in january", "c", "2024-01-10T00:00:00")
+    ids, errors = shards.add_messages([
+        {"role": "user", "content": "zebra in march", "conversation_id": "c",
+         "timestamp": "2024-03-02T00:00:00"},
+        {"role": "user", "content": "zebra in january again", "conversation_id": "c",
+         "timestamp": "2024-01-11T00:00:00"},
+    ])
+
+    assert not errors
+    assert first >> SHARD_ID_BITS == period_index("2024-01")
+    assert ids[0] >> SHARD_ID_BITS == period_index("2024-03")
+    assert [shard_of(i) for i in [first] + ids] == ["2024-01", "2024-03", "2024-01"]
+    assert ids[1] == first + 1
+    assert shards.periods() == ["2024-01", "2024-03"]
+
+    found = {m["id"]: m["content"] for m in shards.search_lexical("zebra", 10)}
+    assert found == {first: "zebra in january", ids[0]: "zebra in march",
+                     ids[1]: "zebra in january again"}
+
+
+def test_messages_without_a_valid_month_are_refused(shards):
+    with pytest.raises(ValueError):
+        shards.add_message("user", "when?", "c", "sometime")
+    assert shards.periods() == []
+
+
+def test_conversations_spanning_months_are_read_in_order(both):
+    shards, flat = both
+    assert len(shards.periods()) == len(MONTHS)
+    for conversation in flat.list_conversations(limit=100):
+        conv_id = conversation["conversation_id"]
+        assert _contents(shards.get_conversation(conv_id)) == \
+            _contents(flat.get_conversation(conv_id))
+
+
+@pytest.mark.parametrize("order_by", ["timestamp", "last_activity"])
+@pytest.mark.parametrize("limit", [1, 2, 3, 5, 100])
+def test_page_conversations_lists_each_conversation_once(both, order_by, limit):
+    shards, flat = both
+    expected = _summary(flat.list_conversations(limit=100, order_by=order_by))
+
+    listed, cursor, pages = [], None, 0
+    while True:
+        page, cursor = shards.page_conversations(limit, cursor, order_by)
+        assert len(page) <= limit
+        listed.extend(page)
+        pages += 1
+        if cursor is None:
+            break
+        assert pages <= len(expected) + len(MONTHS), "pagination does not terminate"
+
+    assert _summary(listed) == expected
+
+
+@pytest.mark.parametrize("max_tokens", [0, 5, 40, 120, 400, 100000])
+def test_tail_budget_spans_shards(both, max_tokens):
+    shards, flat = both
+    # Conversations spanning several months spend the budget across shards
+    for conversation in flat.list_conversations(limit=100):
+        conv_id = conversation["conversation_id"]
+        assert _contents(shards.tail(conv_id, max_tokens, page_size=2)) == \
+            _contents(flat.tail(conv_id, max_tokens, page_size=2)), conv_id
+
+
+def _legacy_store(tmp_path, messages):
+    """An unsharded database holding ``messages``, every third one without an embedding."""
+    legacy = EpisodicMemory(db_path=str(tmp_path / "legacy.db"))
+    legacy.add_messages(messages)
+    with legacy._db.transaction() as conn:
+        conn.execute("UPDATE messages SET embedding = NULL, embedding_encoding = NULL "
+                     "WHERE id % 3 = 0")
+    legacy.close(drain=False)
+    return legacy.db_path
+
+
+def _shard_rows(shards, table, columns):
+    rows = []
+    for period in shards.periods():
+        with sqlite3.connect(shards.shard_path(period)) as conn:
+            rows.extend(conn.execute(f"SELECT {columns} FROM {table}").fetchall())
+    return sorted(rows)
+
+
+def test_import_database_is_idempotent(shards, flat, tmp_path):
+    messages = _conversation_messages()
+    flat.add_messages(messages)
+    db_path = _legacy_store(tmp_path, messages)
+    with sqlite3.connect(db_path) as conn:
+        unembedded = conn.execute(
+            "SELECT COUNT(*) FROM messages WHERE embedding IS NULL").fetchone()[0]
+
+    assert shards.import_database(db_path) == len(messages)
+    assert shards.periods() == MONTHS
+    assert _summary(shards.list_conversations(limit=100)) == \
+        _summary(flat.list_conversations(limit=100))
+    assert len(_shard_rows(shards, "pending_embeddings", "message_id")) == unembedded
+
+    # A second run, and a run after an interrupted one, copy only what is missing
+    imported = _shard_rows(shards, "messages", "conversation_id, role, content, timestamp")
+    assert shards.import_database(db_path) == 0
+    march = shards.shard("2024-03")
+    with march._db.transaction() as conn:
+        conn.execute("DELETE FROM messages WHERE id IN "
+                     "(SELECT id FROM messages ORDER BY id DESC LIMIT 2)")
+    assert shards.import_database(db_path) == 2
+
+    assert _shard_rows(shards, "messages", "conversation_id, role, content, timestamp") == imported
+    assert _summary(shards.list_conversations(limit=100)) == \
+        _summary(flat.list_conversations(limit=100))
+
+
+def test_import_database_skips_unparsable_timestamps(shards, tmp_path):
+    db_path = _legacy_store(tmp_path, [
+        {"role": "user", "content": "dated", "conversation_id": "c",
+         "timestamp": "2024-02-01T00:00:00"},
+        {"role": "user", "content": "undated", "conversation_id": "c", "timestamp": "unknown"},
+    ])
+
+    assert shards.import_database(db_path) == 1
+    assert [m["content"] for m in shards.get_conversation("c")] == ["dated"]
@@ -0,0 +1,152 @@
+"""Tests of knowledge graph traversal and ranking over the adjacency snapshot."""
+
+import numpy as np
+import pytest
+
+from ..memory.semantic_memory import KnowledgeGraph
+
+# (source, relation, target, weight)
+EDGES = [
+    ("ada", "knows", "bob", 1.0),
+    ("bob", "knows", "cat", 0.5),
+    ("cat", "likes", "dan", 1.0),
+    ("ada", "likes", "dan", 0.2),
+    ("eve", "knows", "ada", 1.0),
+    ("fay", "likes", "gus", 1.0),
+]
+
+
+@pytest.fixture
+def db_path(embeddings, tmp_path):
+    return str(tmp_path / "graph.db")
+
+
+@pytest.fixture
+def graph(db_path):
+    graph = KnowledgeGraph(db_path=db_path)
+    for source, relation, target, weight in EDGES:
+        graph.add_relation(source, relation, target, weight)
+    return graph
+
+
+def _queries(graph):
+    """Answers of every traversal, for comparing two views of the same graph."""
+    return {
+        "neighborhood": graph.neighborhood("ada", depth=3),
+        "outgoing": graph.neighborhood("ada", depth=3, direction="outgoing"),
+        "knows": graph.neighborhood("bob", depth=2, relations=["knows"]),
+        "path": graph.shortest_path("eve", "dan"),
+        "against": graph.shortest_path("dan", "ada", direction="incoming"),
+        "pagerank": [(r["concept"], pytest.approx(r["score"], abs=1e-6))
+                     for r in graph.personalized_pagerank({"ada": 1.0}, limit=20)],
+    }
+
+
+def _reference_pagerank(edges, seeds, damping=0.85, direction="both"):
+    """Dense power iteration of personalized PageRank, restarting at dangling nodes."""
+    names = sorted({e[0] for e in edges} | {e[2] for e in edges})
+    pos = {name: i for i, name in enumerate(names)}
+    steps = np.zeros((len(names), len(names)))
+    for source, _, target, weight in edges:
+        if direction in ("outgoing", "both"):
+            steps[pos[source], pos[target]] += weight
+        if direction in ("incoming", "both"):
+            steps[pos[target], pos[source]] += weight
+    out = steps.sum(axis=1)
+    steps[out > 0] /= out[out > 0, None]
+    personal = np.zeros(len(names))
+    for name, weight in seeds.items():
+        personal[pos[name]] = weight
+    personal /= personal.sum()
+    scores = personal
+    for _ in range(1000):
+        restart = (1 - damping) + damping * scores[out == 0].sum()
+        scores = damping * scores @ steps + restart * personal
+    return {name: scores[pos[name]] for name in names}
+
+
+def test_neighborhood_follows_depth_direction_and_filters(graph):
+    result = graph.neighborhood("ada", depth=1)
+    assert [(n["concept"], n["distance"]) for n in result["nodes"]] == \
+        [("ada", 0), ("bob", 1), ("dan", 1), ("eve", 1)]
+    assert {(e["source"], e["target"], e["relation"]) for e in result["edges"]} == \
+        {("ada", "bob", "knows"), ("ada", "dan", "likes"), ("eve", "ada", "knows")}
+
+    outgoing = graph.neighborhood("ada", depth=3, direction="outgoing")
+    assert {n["concept"]: n["distance"] for n in outgoing["nodes"]} == \
+        {"ada": 0, "bob": 1, "dan": 1, "cat": 2}
+    heavy = graph.neighborhood("ada", depth=3, min_weight=0.6)
+    assert {n["concept"] for n in heavy["nodes"]} == {"ada", "bob", "eve"}
+    knows = graph.neighborhood("ada", depth=3, relations=["knows"])
+    assert {n["concept"] for n in knows["nodes"]} == {"ada", "bob", "cat", "eve"}
+
+    truncated = graph.neighborhood("ada", depth=3, max_nodes=2)
+    assert truncated["truncated"] and len(truncated["nodes"]) == 2
+    assert graph.neighborhood("nobody") == {"nodes": [], "edges": [], "truncated": False}
+
+
+def test_shortest_path_hops(graph):
+    assert graph.shortest_path("eve", "dan") == [
+        {"from": "eve", "to": "ada", "relation": "knows", "weight": 1.0, "direction": "outgoing"},
+        {"from": "ada", "to": "dan", "relation": "likes",
+         "weight": pytest.approx(0.2), "direction": "outgoing"},
+    ]
+    # Against the edges' direction, and around a too-light edge
+    assert [hop["to"] for hop in graph.shortest_path("dan", "eve", direction="incoming")] == \
+        ["ada", "eve"]
+    assert [hop["to"] for hop in graph.shortest_path("eve", "dan", min_weight=0.5)] == \
+        ["ada", "bob", "cat", "dan"]
+    assert graph.shortest_path("eve", "dan", max_depth=1) is None
+    assert graph.shortest_path("ada", "gus") is None
+    assert graph.shortest_path("dan", "eve", direction="outgoing") is None
+    assert graph.shortest_path("ada", "ada") == []
+
+
+@pytest.mark.parametrize("direction", ["both", "outgoing", "incoming"])
+def test_personalized_pagerank_matches_a_dense_power_iteration(graph, direction):
+    seeds = {"ada": 2.0, "cat": 1.0}
+    expected = _reference_pagerank(EDGES, seeds, direction=direction)
+
+    results = graph.personalized_pagerank(seeds, limit=20, time_budget=10.0,
+                                          direction=direction)
+
+    assert {r["concept"]: r["score"] for r in results} == \
+        pytest.approx({name: score for name, score in expected.items() if score > 0}, abs=1e-5)
+    assert {r["concept"] for r in results if r["seed"]} == set(seeds)
+    # Relation filters drop edges before the walk
+    likes = graph.personalized_pagerank({"ada": 1.0}, limit=20, relations=["likes"],
+                                        time_budget=10.0)
+    reference = _reference_pagerank([e for e in EDGES if e[1] == "likes"], {"ada": 1.0})
+    assert {r["concept"]: r["score"] for r in likes} == \
+        pytest.approx({name: score for name, score in reference.items() if score > 0}, abs=1e-5)
+
+
+def test_patched_snapshot_answers_like_a_fresh_build(graph, db_path):
+    _queries(graph)
+    snapshot = graph._graph
+
+    # Between known nodes, to a new node, and between two new nodes
+    graph.add_relation("gus", "knows", "cat", 0.7)
+    graph.add_relation("dan", "likes", "hal", 1.0)
+    graph.add_relation("ivy", "knows", "jon", 1.0)
+    assert graph._graph is snapshot and snapshot.has_new_nodes
+
+    patched = _queries(graph)
+    assert graph.shortest_path("fay", "hal") is not None
+    assert _queries(KnowledgeGraph(db_path=db_path)) == patched
+
+
+def test_generation_bump_from_another_connection_rebuilds(graph, db_path):
+    _queries(graph)
+    snapshot = graph._graph
+
+    other = KnowledgeGraph(db_path=db_path)
+    other.add_relation("gus", "knows", "cat", 0.7)
+    other.add_relation("bob", "knows", "cat", 0.9)  # reweighted
+    with other._db.transaction() as conn:
+        conn.execute("DELETE FROM edges WHERE relation = 'likes' AND weight < 0.5")
+
+    answers = _queries(graph)
+    assert graph._graph is not snapshot
+    assert answers == _queries(KnowledgeGraph(db_path=db_path))
+    assert [hop["to"] for hop in answers["path"]] == ["ada", "bob", "cat", "dan"]
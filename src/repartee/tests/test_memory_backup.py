@@ -0,0 +1,104 @@
+"""Tests of the binary export and import of the memory stores."""
+
+import sqlite3
+
+import pytest
+
+from ..memory import backup
+from ..memory.episodic_memory import EpisodicMemory
+
+
+def _fill(memory, conversation_id, contents):
+    """Store messages, one pending embedding and one compaction run."""
+    ids, _ = memory.add_messages({"role": "user", "content": content,
+                                  "conversation_id": conversation_id,
+                                  "timestamp": f"2024-05-01T00:00:{i:02d}"}
+                                 for i, content in enumerate(contents))
+    with memory._db.transaction() as conn:
+        conn.execute("INSERT INTO pending_embeddings (message_id) VALUES (?)", (ids[-1],))
+        conn.execute("INSERT INTO compaction_runs (started_at) VALUES ('2024-05-02T00:00:00')")
+    return ids
+
+
+def _rows(db_path, table):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f"SELECT * FROM {table} ORDER BY rowid").fetchall()
+
+
+def _schema(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(
+            "SELECT type, name FROM sqlite_master WHERE type IN ('index', 'trigger') ORDER BY name"
+        ).fetchall()
+
+
+def _export_source(tmp_path, contents):
+    source = EpisodicMemory(db_path=str(tmp_path / "source.db"))
+    _fill(source, "source", contents)
+    path = str(tmp_path / "memory.rpx")
+    backup.export_memory(path, [("episodic", "episodic_memory", source.db_path)])
+    return source, path
+
+
+def test_round_trip_keeps_rows_and_ids(memory_home, embeddings):
+    source, path = _export_source(memory_home, ["zebra crossing", "parrot cage", "zebra stripes"])
+
+    counts = backup.import_memory(path)
+
+    target = EpisodicMemory()
+    assert counts["messages"] == 3
+    for table in backup.STORE_TABLES["episodic"]:
+        assert _rows(target.db_path, table) == _rows(source.db_path, table)
+    assert _schema(target.db_path) == _schema(source.db_path)
+    assert [m["content"] for m in target.search_lexical("zebra", 5)] == ["zebra crossing",
+                                                                        "zebra stripes"]
+
+
+def test_import_refuses_non_empty_store_without_replace(memory_home, embeddings):
+    _, path = _export_source(memory_home, ["zebra crossing"])
+    target = EpisodicMemory()
+    _fill(target, "local", ["kept message"])
+
+    with pytest.raises(ValueError, match="replace"):
+        backup.import_memory(path)
+    assert [row[3] for row in _rows(target.db_path, "messages")] == ["kept message"]
+
+
+def test_truncated_export_rolls_back_the_damaged_database(memory_home, embeddings):
+    _, path = _export_source(memory_home, ["zebra crossing", "parrot cage"])
+    # Cut the export right after the rows of ``messages``
+    cut = str(memory_home / "cut.rpx")
+    with open(path, "rb") as stream, open(cut, "wb") as out:
+        out.write(backup.MAGIC)
+        for record in backup._read_records(stream):
+            if record[0] == "table" and record[1] == "pending_embeddings":
+                break
+            backup._write_record(out, record)
+
+    target = EpisodicMemory()
+    _fill(target, "local", ["kept message", "another kept message"])
+    before = {table: _rows(target.db_path, table) for table in backup.STORE_TABLES["episodic"]}
+    schema = _schema(target.db_path)
+
+    with pytest.raises(ValueError, match="ended early"):
+        backup.import_memory(cut, replace=True)
+
+    for table, rows in before.items():
+        assert _rows(target.db_path, table) == rows, table
+    assert _schema(target.db_path) == schema
+    assert [m["content"] for m in target.search_lexical("kept", 5)] == ["kept message",
+                                                                       "another kept message"]
+
+
+@pytest.mark.parametrize("name", ["../../escape", "2024-05/../../escape", "2024-5", 202405])
+def test_import_rejects_invalid_shard_names(memory_home, name):
+    path = str(memory_home / "evil.rpx")
+    with open(path, "wb") as stream:
+        stream.write(backup.MAGIC)
+        backup._write_record(stream, ["header", {"format": backup.FORMAT,
+                                                 "databases": [["episodic", name]]}])
+        backup._write_record(stream, ["end", {}])
+
+    with pytest.raises(ValueError, match="Invalid episodic shard name"):
+        backup.import_memory(path)
+    assert not list(memory_home.rglob("*escape*"))
@@ -0,0 +1,138 @@
+"""Tests of note chunking, chunk reuse on re-import and chunk search."""
+
+import os
+
+import pytest
+
+from ..memory.embeddings import count_tokens
+from ..memory.obsidian import chunk_note, chunk_text
+from ..memory.semantic_memory import KnowledgeGraph
+from .conftest import fake_embeddings
+
+NOTE = """---
+tags: [draft]
+---
+Intro paragraph before any heading.
+
+# Garden
+
+Tomatoes need sun.
+
+## Pests
+
+Aphids on the roses.
+
+```python
+# not a heading
+print("aphids")
+```
+
+# Kitchen
+
+Bread rises overnight.
+"""
+
+
+def test_chunks_follow_headings_and_skip_front_matter():
+    chunks = chunk_note("home", NOTE)
+
+    assert [(heading, text) for heading, text, _ in chunks] == [
+        ("", "Intro paragraph before any heading."),
+        ("Garden", "Tomatoes need sun."),
+        ("Garden > Pests", 'Aphids on the roses.\n\n```python\n# not a heading\nprint("aphids")\n```'),
+        ("Kitchen", "Bread rises overnight."),
+    ]
+    assert len({content_hash for _, _, content_hash in chunks}) == len(chunks)
+    # The hash covers the note name, so equal sections of two notes differ
+    assert chunk_note("work", NOTE)[1][2] != chunks[1][2]
+
+
+def test_long_sections_are_split_under_the_token_limit():
+    paragraphs = [" ".join(f"word{p}x{i}" for i in range(60)) for p in range(4)]
+    content = "# Long\n\n" + "\n\n".join(paragraphs) + "\n\n" + "x" * 3000
+
+    chunks = chunk_note("note", content, max_tokens=80)
+
+    assert len(chunks) > len(paragraphs)
+    assert all(heading == "Long" for heading, _, _ in chunks)
+    for heading, text, _ in chunks:
+        assert count_tokens(chunk_text("note", heading, text)) <= 80
+    # Nothing is lost but the separators the text was split at
+    joined = "".join("".join(text.split()) for _, text, _ in chunks)
+    assert joined == "".join("".join(content.split("\n", 1)[1].split()))
+
+
+@pytest.fixture
+def graph(embeddings, tmp_path):
+    return KnowledgeGraph(db_path=str(tmp_path / "graph.db"))
+
+
+@pytest.fixture
+def requested(monkeypatch):
+    """Texts sent to the embedding provider, for chunks only."""
+    texts = []
+
+    def request(self, batch):
+        texts.extend(text for text in batch if "\n\n" in text)
+        return fake_embeddings(batch)
+
+    monkeypatch.setattr(KnowledgeGraph, "_request_embeddings", request)
+    return texts
+
+
+def _write(path, content):
+    mtime = path.stat().st_mtime_ns + 10**9 if path.exists() else 10**18
+    path.write_text(content)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def _chunk_rows(graph):
+    return graph._db.connection().execute(
+        "SELECT id, position, content FROM chunks ORDER BY position").fetchall()
+
+
+def test_changed_note_reuses_unchanged_chunks(graph, requested, tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    _write(vault / "home.md", NOTE)
+    graph.import_from_obsidian(str(vault), workers=1)
+    before = {content: chunk_id for chunk_id, _, content in _chunk_rows(graph)}
+    assert len(requested) == len(before)
+    requested.clear()
+
+    # One section edited, a new one inserted, the last one moved down
+    edited = NOTE.replace("Tomatoes need sun.", "Tomatoes need shade.")
+    edited = edited.replace("# Kitchen", "# Cellar\n\nWine keeps cool.\n\n# Kitchen")
+    _write(vault / "home.md", edited)
+    graph.import_from_obsidian(str(vault), workers=1)
+
+    after = _chunk_rows(graph)
+    assert [content for _, _, content in after][-2:] == ["Wine keeps cool.",
+                                                         "Bread rises overnight."]
+    assert sorted(text.split("\n\n", 1)[1] for text in requested) == [
+        "Tomatoes need shade.", "Wine keeps cool."]
+    kept = {content: chunk_id for chunk_id, _, content in after if content in before}
+    assert kept == {content: before[content] for content in kept}
+    assert set(before) - set(kept) == {"Tomatoes need sun."}
+    assert graph.search_chunks("bread rises overnight", 1)[0]["chunk_id"] == \
+        before["Bread rises overnight."]
+
+
+def test_search_chunks_reloads_when_deleted_chunks_crowd_out_results(graph, tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    for i in range(6):
+        _write(vault / f"note{i}.md", f"# Note {i}\n\nshared words here, variant {i}.\n")
+    graph.import_from_obsidian(str(vault), workers=1)
+    top = graph.search_chunks("shared words here", 6)
+    assert len(top) == 6
+
+    # Delete the best matches behind the loaded index's back
+    deleted = [r["chunk_id"] for r in top[:4]]
+    with graph._db.transaction() as conn:
+        conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in deleted])
+
+    results = graph.search_chunks("shared words here", 2)
+
+    assert [r["chunk_id"] for r in results] == [r["chunk_id"] for r in top[4:]]
+    assert len(graph._chunks) == 2
@@ -0,0 +1,143 @@
+"""Tests of the incremental Obsidian import of the knowledge graph."""
+
+import os
+
+import pytest
+
+from ..memory.semantic_memory import KnowledgeGraph
+
+NOTES = {
+    "alpha": "# Alpha\n\nLinks to [[beta]] and [[gamma]]. #project\n",
+    "beta": "# Beta\n\nBack to [[alpha]].\n",
+    "gamma": "# Gamma\n\nA leaf note.\n",
+}
+
+
+@pytest.fixture
+def vault(tmp_path):
+    folder = tmp_path / "vault"
+    folder.mkdir()
+    for name, content in NOTES.items():
+        _write(folder, name, content)
+    return folder
+
+
+@pytest.fixture
+def graph(embeddings, tmp_path):
+    return KnowledgeGraph(db_path=str(tmp_path / "graph.db"))
+
+
+def _write(folder, name, content):
+    """Write a note and move its mtime forward, so that every write is seen as a change."""
+    path = folder / f"{name}.md"
+    mtime = path.stat().st_mtime_ns + 10**9 if path.exists() else 10**18
+    path.write_text(content)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def _state(graph):
+    """Everything an import writes, as comparable values."""
+    conn = graph._db.connection()
+    return {
+        "nodes": conn.execute("SELECT id, name, type, metadata FROM nodes ORDER BY id").fetchall(),
+        "edges": conn.execute(
+            """
+            SELECT s.name, t.name, relation FROM edges
+            JOIN nodes s ON s.id = edges.source_id JOIN nodes t ON t.id = edges.target_id
+            ORDER BY 1, 2
+            """
+        ).fetchall(),
+        "chunks": conn.execute(
+            "SELECT id, path, position, content_hash FROM chunks ORDER BY id").fetchall(),
+        "files": conn.execute(
+            "SELECT path, mtime_ns, size, content_hash, imported_at FROM obsidian_files "
+            "ORDER BY path").fetchall(),
+    }
+
+
+def _links(graph):
+    return {(source, target) for source, target, _ in _state(graph)["edges"]}
+
+
+def test_import_creates_concepts_links_and_chunks(graph, vault):
+    assert graph.import_from_obsidian(str(vault), workers=1) == (3, 3)
+
+    state = _state(graph)
+    assert {name for _, name, _, _ in state["nodes"]} == set(NOTES)
+    assert _links(graph) == {("alpha", "beta"), ("alpha", "gamma"), ("beta", "alpha")}
+    assert {row[1] for row in state["chunks"]} == {str(vault / f"{n}.md") for n in NOTES}
+    assert [node_type for _, name, node_type, _ in state["nodes"] if name == "alpha"] == ["project"]
+
+
+def test_unchanged_reimport_is_a_no_op(graph, vault):
+    graph.import_from_obsidian(str(vault), workers=1)
+    before = _state(graph)
+
+    assert graph.import_from_obsidian(str(vault), workers=1) == (0, 0)
+    # A rewrite with the same content only refreshes the manifest's mtime
+    _write(vault, "beta", NOTES["beta"])
+    assert graph.import_from_obsidian(str(vault), workers=1) == (0, 0)
+
+    after = _state(graph)
+    assert {k: v for k, v in after.items() if k != "files"} == \
+        {k: v for k, v in before.items() if k != "files"}
+    assert [row[3:] for row in after["files"]] == [row[3:] for row in before["files"]]
+
+
+def test_edited_note_replaces_its_links(graph, vault):
+    graph.import_from_obsidian(str(vault), workers=1)
+
+    _write(vault, "alpha", "# Alpha\n\nNow only [[delta]].\n")
+    assert graph.import_from_obsidian(str(vault), workers=1) == (1, 1)
+
+    assert _links(graph) == {("alpha", "delta"), ("beta", "alpha")}
+    # gamma is still a note of the vault, so it keeps its concept
+    assert {name for _, name, _, _ in _state(graph)["nodes"]} == set(NOTES) | {"delta"}
+    # alpha lost its tag
+    assert [t for _, name, t, _ in _state(graph)["nodes"] if name == "alpha"] == [None]
+
+
+def test_deleted_note_removes_its_node_links_and_chunks(graph, vault):
+    _write(vault, "gamma", "# Gamma\n\nLinks to [[delta]].\n")
+    graph.import_from_obsidian(str(vault), workers=1)
+    gamma = str(vault / "gamma.md")
+
+    (vault / "gamma.md").unlink()
+    graph.import_from_obsidian(str(vault), workers=1)
+
+    state = _state(graph)
+    # alpha still links to gamma, so the concept stays, without note metadata;
+    # delta was only linked from gamma and goes with it
+    assert _links(graph) == {("alpha", "beta"), ("alpha", "gamma"), ("beta", "alpha")}
+    assert {(name, metadata) for _, name, _, metadata in state["nodes"]
+            if name in ("gamma", "delta")} == {("gamma", None)}
+    assert all(path != gamma for _, path, _, _ in state["chunks"])
+    assert all(path != gamma for path, *_ in state["files"])
+
+    # Once alpha stops linking to it, gamma is gone entirely
+    _write(vault, "alpha", "# Alpha\n\nLinks to [[beta]].\n")
+    graph.import_from_obsidian(str(vault), workers=1)
+    assert {name for _, name, _, _ in _state(graph)["nodes"]} == {"alpha", "beta"}
+
+
+def test_failed_import_leaves_the_graph_untouched(graph, vault, monkeypatch):
+    graph.import_from_obsidian(str(vault), workers=1)
+    before = _state(graph)
+
+    _write(vault, "alpha", "# Alpha\n\nNow only [[delta]].\n")
+    _write(vault, "epsilon", "# Epsilon\n\nSee [[beta]].\n")
+    (vault / "gamma.md").unlink()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    # Fails after the nodes and edges of the import were written
+    with monkeypatch.context() as patch:
+        patch.setattr(KnowledgeGraph, "_replace_chunks", fail)
+        with pytest.raises(RuntimeError):
+            graph.import_from_obsidian(str(vault), workers=1)
+    assert _state(graph) == before
+
+    # The next import picks up every change
+    assert graph.import_from_obsidian(str(vault), workers=1) == (2, 2)
+    assert _links(graph) == {("alpha", "delta"), ("beta", "alpha"), ("epsilon", "beta")}
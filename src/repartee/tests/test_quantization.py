@@ -0,0 +1,30 @@
+"""Tests of the stored embedding encodings and their migration."""
+
+import sqlite3
+
+import numpy as np
+
+from ..memory.quantization import ENCODING_F32, migrate_embedding_encoding
+
+
+def test_migration_labels_legacy_rows_once():
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.execute("CREATE TABLE messages (id INTEGER PRIMARY KEY, embedding BLOB)")
+    vectors = np.random.default_rng(0).standard_normal((4, 8))
+    conn.executemany("INSERT INTO messages (embedding) VALUES (?)",
+                     [(vectors[0].astype(np.float32).tobytes(),),
+                      (vectors[1].tobytes(),),
+                      (None,),
+                      (vectors[3].astype(np.float32).tobytes(),)])
+
+    assert migrate_embedding_encoding(conn.cursor(), "messages") == 1
+
+    rows = conn.execute("SELECT embedding, embedding_encoding FROM messages ORDER BY id").fetchall()
+    assert [encoding for _, encoding in rows] == [ENCODING_F32, ENCODING_F32, None, ENCODING_F32]
+    np.testing.assert_array_equal(np.frombuffer(rows[1][0], dtype=np.float32),
+                                  vectors[1].astype(np.float32))
+
+    # Once the column exists, opening the store no longer scans the table
+    conn.execute("INSERT INTO messages (embedding) VALUES (?)", (vectors[2].tobytes(),))
+    assert migrate_embedding_encoding(conn.cursor(), "messages") == 0
+    assert conn.execute("SELECT embedding_encoding FROM messages WHERE id = 5").fetchone() == (None,)
@@ -0,0 +1,89 @@
+"""Tests of the background vault sync."""
+
+import time
+
+import pytest
+
+from ..memory import vault_watcher
+from ..memory.semantic_memory import KnowledgeGraph
+from ..memory.vault_watcher import VaultWatcher
+
+
+def _wait(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _concepts(db_path):
+    conn = KnowledgeGraph(db_path=db_path)._db.connection()
+    return {row[0] for row in conn.execute("SELECT name FROM nodes")}
+
+
+@pytest.fixture
+def vault(tmp_path):
+    folder = tmp_path / "vault"
+    folder.mkdir()
+    (folder / "alpha.md").write_text("Links to [[beta]].\n")
+    return folder
+
+
+def test_failed_batches_are_retried_with_backoff(embeddings, vault, tmp_path, monkeypatch):
+    monkeypatch.setattr(vault_watcher, "Observer", None)
+    db_path = str(tmp_path / "graph.db")
+    import_from_obsidian = KnowledgeGraph.import_from_obsidian
+    failures = []
+
+    def flaky(self, folder_path, paths=None, **kwargs):
+        # The catch-up import works; the first two batches fail
+        if paths is not None and len(failures) < 2:
+            failures.append(time.monotonic())
+            raise RuntimeError("database is locked")
+        return import_from_obsidian(self, folder_path, paths=paths, workers=1, **kwargs)
+
+    monkeypatch.setattr(KnowledgeGraph, "import_from_obsidian", flaky)
+    watcher = VaultWatcher(str(vault), db_path, debounce=0.05, poll_interval=0.05,
+                           retry_delay=0.2)
+    watcher.start()
+    try:
+        assert _wait(lambda: watcher.synced["batches"] == 1)
+        assert _concepts(db_path) == {"alpha", "beta"}
+
+        (vault / "gamma.md").write_text("Links to [[delta]].\n")
+        assert _wait(lambda: "gamma" in _concepts(db_path))
+    finally:
+        watcher.stop()
+
+    assert watcher.synced["errors"] == 2
+    assert watcher.synced["batches"] == 2
+    assert _concepts(db_path) == {"alpha", "beta", "gamma", "delta"}
+    # The second attempt waited for the retry delay
+    assert failures[1] - failures[0] >= 0.2
+    assert watcher._failures == 0 and not watcher._pending
+
+
+def test_failed_catch_up_is_retried(embeddings, vault, tmp_path, monkeypatch):
+    monkeypatch.setattr(vault_watcher, "Observer", None)
+    db_path = str(tmp_path / "graph.db")
+    import_from_obsidian = KnowledgeGraph.import_from_obsidian
+    calls = []
+
+    def flaky(self, folder_path, paths=None, **kwargs):
+        calls.append(paths)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return import_from_obsidian(self, folder_path, paths=paths, workers=1, **kwargs)
+
+    monkeypatch.setattr(KnowledgeGraph, "import_from_obsidian", flaky)
+    watcher = VaultWatcher(str(vault), db_path, poll_interval=0.05, retry_delay=0.05)
+    watcher.start()
+    try:
+        assert _wait(lambda: watcher.synced["batches"] == 1)
+    finally:
+        watcher.stop()
+
+    assert calls == [None, None]
+    assert _concepts(db_path) == {"alpha", "beta"}
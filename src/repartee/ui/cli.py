@@ -9,24 +9,12 @@ import os
 import sys
 import uuid
 import argparse
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
-import anyio
-from rich.console import Console
-# Client side → use the “mcp” package (fastmcp only provides Host)
-try:
-    from mcp.client import Client as MCPClient          # preferred
-except ImportError:                                     # safety-net for dev envs
-    from repartee.mcp.client import Client as MCPClient # project’s old local stub
+from ..config import config, get_api_key, ReparteeDefaults
 
-from rich.markdown import Markdown
-
-from ..config import get_api_key, ReparteeDefaults
-from ..models.openai_models import OpenAIModel
-from ..models.anthropic_models import AnthropicModel
-from ..memory.short_term_memory import ShortTermMemory
-from ..memory.episodic_memory import EpisodicMemory
-from ..memory.semantic_memory import SemanticMemory
+# Model clients, memory stores, rich and the MCP client are imported where
+# they are first used, so `--help` and read-only commands start quickly.
 
 
 class CLI:
@@ -38,13 +26,11 @@ class CLI:
     """
     
     def __init__(self):
-        # Initialize console for rich output
-        self.console = Console()
-        
-        # Initialize memory systems
-        self.short_term_memory = ShortTermMemory()
-        self.episodic_memory = EpisodicMemory()
-        self.semantic_memory = SemanticMemory()
+        # Console and memory systems are created on first use
+        self._console = None
+        self._short_term_memory = None
+        self._episodic_memory = None
+        self._semantic_memory = None
         self.mcp = None
         
         # Default model settings
@@ -52,6 +38,46 @@ class CLI:
         self.model_name = ""
         self.conversation_id = str(uuid.uuid4())
         
+    @property
+    def console(self):
+        """Rich console for output."""
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console()
+        return self._console
+        
+    @property
+    def short_term_memory(self):
+        """Memory of the current conversation."""
+        if self._short_term_memory is None:
+            from ..memory.short_term_memory import ShortTermMemory
+            self._short_term_memory = ShortTermMemory()
+        return self._short_term_memory
+        
+    @short_term_memory.setter
+    def short_term_memory(self, memory):
+        self._short_term_memory = memory
+        
+    @property
+    def episodic_memory(self):
+        """Long-term conversation history."""
+        if self._episodic_memory is None:
+            from ..memory.episodic_shards import open_episodic_memory
+            self._episodic_memory = open_episodic_memory()
+        return self._episodic_memory
+        
+    @episodic_memory.setter
+    def episodic_memory(self, memory):
+        self._episodic_memory = memory
+        
+    @property
+    def semantic_memory(self):
+        """Knowledge graph of concepts about the user."""
+        if self._semantic_memory is None:
+            from ..memory.semantic_memory import SemanticMemory
+            self._semantic_memory = SemanticMemory()
+        return self._semantic_memory
+        
     def _check_api_keys(self) -> Dict[str, bool]:
         """Check which API keys are available."""
         keys = {
@@ -72,6 +98,7 @@ class CLI:
                 self.console.print("Set it with: [blue]export OPENAI_API_KEY=your-key[/blue]")
                 sys.exit(1)
                 
+            from ..models.openai_models import OpenAIModel
             model = model_name or ReparteeDefaults.models.openai
             self.current_model = OpenAIModel(model_name=model)
             self.model_name = model
@@ -83,6 +110,7 @@ class CLI:
                 self.console.print("Set it with: [blue]export ANTHROPIC_API_KEY=your-key[/blue]")
                 sys.exit(1)
                 
+            from ..models.anthropic_models import AnthropicModel
             model = model_name or ReparteeDefaults.models.claude
             self.current_model = AnthropicModel(model_name=model)
             self.model_name = model
@@ -94,19 +122,66 @@ class CLI:
             self.console.print(f"Available providers: {', '.join(available)}")
             sys.exit(1)
             
-    def _format_system_prompt(self) -> str:
-        """Format a system prompt with relevant context."""
+    def _format_system_prompt(self, prompt: Optional[str] = None) -> str:
+        """
+        Format a system prompt with relevant context.
+        
+        Args:
+            prompt: The user's prompt; concepts and note excerpts from
+                semantic memory relevant to it are added
+                
+        Returns:
+            The system prompt
+        """
         # Start with default system prompt
         system_prompt = ReparteeDefaults.system_prompt
         
         # Add relevant knowledge from semantic memory
-        # This is a placeholder for more sophisticated context retrieval
-        system_prompt += "\n\nImportant information about the user:"
-        
-        # TODO: Add more sophisticated context retrieval from semantic memory
+        knowledge, notes = self._knowledge_context(prompt) if prompt else ([], [])
+        if knowledge:
+            system_prompt += "\n\nImportant information about the user:\n" + "\n".join(knowledge)
+        if notes:
+            system_prompt += "\n\nRelevant excerpts from the user's notes:\n\n" + "\n\n".join(notes)
         
         return system_prompt
         
+    def _knowledge_context(self, prompt: str) -> Tuple[List[str], List[str]]:
+        """
+        Retrieve concepts and note excerpts relevant to a prompt from semantic memory.
+        
+        Concepts similar to the prompt seed a personalized PageRank over
+        the graph (see ``KnowledgeGraph.graph_search``), so closely linked
+        concepts are included even when they do not match the prompt.
+        Excerpts are the imported note chunks closest to the prompt.
+        
+        Args:
+            prompt: The user's prompt
+            
+        Returns:
+            Tuple of (one line per concept, one block per excerpt), best first
+        """
+        concept_limit = config.semantic.get("context_concepts", 8)
+        chunk_limit = config.semantic.get("context_chunks", 3)
+        concepts, chunks = [], []
+        try:
+            if concept_limit:
+                concepts = self.semantic_memory.graph_search(
+                    prompt, limit=concept_limit,
+                    time_budget=config.semantic.get("context_time_budget", 0.05)
+                )
+            if chunk_limit:
+                chunks = self.semantic_memory.search_chunks(prompt, chunk_limit)
+        except Exception as e:
+            # No embedding API key, provider or network error: chat without
+            # semantic recall
+            print(f"Warning: Semantic search unavailable: {e}")
+        knowledge = [f"- {c['concept']} ({c['type']})" if c["type"] else f"- {c['concept']}"
+                     for c in concepts]
+        notes = [f"[{c['concept']} > {c['heading']}]\n{c['content']}" if c["heading"]
+                 else f"[{c['concept']}]\n{c['content']}"
+                 for c in chunks]
+        return knowledge, notes
+        
     def _get_conversation_context(self, prompt: str) -> List[Dict[str, Any]]:
         """
         Retrieve relevant context for the current conversation.
@@ -121,7 +196,16 @@ class CLI:
         messages = self.short_term_memory.get_messages_for_model()
         
         # Search episodic memory for relevant past conversations
-        similar_messages = self.episodic_memory.search_similar(prompt, limit=3)
+        try:
+            if hasattr(self.episodic_memory, "search"):
+                # Hybrid keyword + vector search, keywords only when offline
+                similar_messages = self.episodic_memory.search(prompt, limit=3)
+            else:
+                similar_messages = self.episodic_memory.search_similar(prompt, limit=3)
+        except ValueError as e:
+            # No embedding API key: chat without episodic recall
+            print(f"Warning: Episodic search unavailable: {e}")
+            similar_messages = []
         
         if similar_messages:
             # Add a note about relevant past conversations
@@ -141,6 +225,43 @@ class CLI:
         
         return messages
         
+    def _compact_episodic(self, provider: str, model_name: str = None) -> Dict[str, Any]:
+        """
+        Compact episodic memory with the policies in ``episodic.compaction``.
+        
+        Args:
+            provider: Model provider, used when the summarizer is "model"
+            model_name: Optional model name for that provider
+            
+        Returns:
+            Compaction report
+        """
+        policy = config.episodic.get("compaction") or {}
+        summarize_fn = None
+        if policy.get("summarizer", "extractive") == "model":
+            from ..memory.compaction import model_digest_fn
+            if not self.current_model:
+                self._initialize_model(provider, model_name)
+            summarize_fn = model_digest_fn(self.current_model)
+            
+        def progress(done, total):
+            self.console.print(f"Compacting conversations: {done}/{total}", end="\r")
+            
+        report = self.episodic_memory.compact(
+            max_age_days=policy.get("max_age_days"),
+            keep_conversations=policy.get("keep_conversations"),
+            delete_after_days=policy.get("delete_after_days"),
+            summarize_fn=summarize_fn,
+            progress=progress,
+        )
+        self.console.print(
+            f"[green]Compacted {report['conversations']} conversations[/green] "
+            f"({report['messages_summarized']} messages summarised, "
+            f"{report['vectors_deleted']} embeddings and {report['messages_deleted']} messages deleted, "
+            f"{report['bytes_reclaimed'] / 1e6:.1f} MB reclaimed)"
+        )
+        return report
+        
     def send_prompt(self, prompt: str) -> str:
         """
         Send a prompt to the current model and get a response.
@@ -159,7 +280,7 @@ class CLI:
         self.short_term_memory.add_user_message(prompt)
         
         # Get conversation context
-        system_prompt = self._format_system_prompt()
+        system_prompt = self._format_system_prompt(prompt)
         conversation_history = self._get_conversation_context(prompt)
         
         # Send to model
@@ -176,7 +297,8 @@ class CLI:
         self.episodic_memory.add_message(
             role="assistant",
             content=response,
-            conversation_id=self.conversation_id
+            conversation_id=self.conversation_id,
+            defer_embedding=True
         )
         
         return response
@@ -194,13 +316,42 @@ class CLI:
         parser.add_argument("--mcp",
                        help="connect to MCP host, e.g. tcp://127.0.0.1:55855")
         parser.add_argument("--import-obsidian", help="Import Obsidian vault from directory")
+        parser.add_argument("--watch-obsidian", metavar="DIR",
+                            help="Keep the knowledge graph in sync with an Obsidian vault during the session")
         parser.add_argument("--list-conversations", action="store_true", help="List recent conversations")
+        parser.add_argument("--resume", metavar="CONVERSATION_ID",
+                            help="Continue a previous conversation")
+        parser.add_argument("--check-embeddings", action="store_true",
+                            help="Check embedding sidecar files against the databases")
+        parser.add_argument("--rebuild-embeddings", action="store_true",
+                            help="Rebuild embedding sidecar files from the databases")
+        parser.add_argument("--reproject-embeddings", action="store_true",
+                            help="Truncate stored embeddings to the configured dimensions")
+        parser.add_argument("--shard-episodic", action="store_true",
+                            help="Copy the unsharded conversation history into monthly shards")
+        parser.add_argument("--compact", action="store_true",
+                            help="Summarise and prune old conversations, then reclaim space")
+        parser.add_argument("--export-memory", metavar="FILE",
+                            help="Export the memory stores, embeddings included, to a file")
+        parser.add_argument("--import-memory", metavar="FILE",
+                            help="Restore the memory stores from an export file")
+        parser.add_argument("--compression", choices=["none", "gzip", "zstd"],
+                            help="Compression of --export-memory (default: from the file extension)")
+        parser.add_argument("--replace", action="store_true",
+                            help="Let --import-memory overwrite stores that already hold data")
         parser.add_argument("prompt", nargs="*", help="Prompt for one-shot query")
         
         parsed_args = parser.parse_args(args)
         
         # Handle MCP connection
         if parsed_args.mcp:
+            import anyio
+            # Client side → use the “mcp” package (fastmcp only provides Host)
+            try:
+                from mcp.client import Client as MCPClient          # preferred
+            except ImportError:                                     # safety-net for dev envs
+                from repartee.mcp.client import Client as MCPClient # project’s old local stub
+            
             self.mcp = MCPClient(parsed_args.mcp)
 
             class RemoteShort:
@@ -222,12 +373,88 @@ class CLI:
         # Handle special commands
         if parsed_args.import_obsidian:
             try:
-                concepts, relations = self.semantic_memory.import_from_obsidian(parsed_args.import_obsidian)
+                def progress(done, total):
+                    self.console.print(f"Parsing notes: {done}/{total}", end="\r")
+                    
+                concepts, relations = self.semantic_memory.import_from_obsidian(
+                    parsed_args.import_obsidian, progress=progress
+                )
                 self.console.print(f"[green]Imported {concepts} concepts and {relations} relations from Obsidian vault[/green]")
             except Exception as e:
                 self.console.print(f"[bold red]Error importing Obsidian vault:[/bold red] {e}")
             return
             
+        if parsed_args.check_embeddings or parsed_args.rebuild_embeddings:
+            stores = {"episodic": self.episodic_memory, "semantic": self.semantic_memory}
+            for name, store in stores.items():
+                if parsed_args.rebuild_embeddings:
+                    count = store.rebuild_embeddings()
+                    self.console.print(f"[green]Rebuilt {name} sidecar with {count} embeddings[/green]")
+                else:
+                    report = store.check_embeddings()
+                    status = "[green]consistent[/green]" if report["consistent"] else "[bold red]drifted[/bold red]"
+                    details = ", ".join(f"{k}={v}" for k, v in report.items() if k != "consistent")
+                    self.console.print(f"[bold]{name}[/bold]: {status} ({details})")
+            if parsed_args.check_embeddings:
+                from ..memory.embedding_cache import get_embedding_cache
+                stats = get_embedding_cache().stats()
+                self.console.print(f"[bold]embedding cache[/bold]: {stats['entries']}/{stats['max_entries']} entries")
+            return
+            
+        if parsed_args.reproject_embeddings:
+            from ..memory.embeddings import store_settings
+            stores = {"episodic": self.episodic_memory, "semantic": self.semantic_memory}
+            for name, store in stores.items():
+                if not store_settings(name).get("dimensions"):
+                    self.console.print(f"[bold]{name}[/bold]: no dimensions configured, skipped")
+                    continue
+                counts = store.reproject_embeddings()
+                details = ", ".join(f"{k}={v}" for k, v in counts.items())
+                self.console.print(f"[green]Reprojected {name} embeddings[/green] ({details})")
+            return
+            
+        if parsed_args.shard_episodic:
+            from pathlib import Path
+            from ..memory.episodic_shards import ShardedEpisodicMemory
+            source = Path.home() / ".repartee" / "memory" / "episodic_memory.db"
+            if not source.exists():
+                self.console.print(f"[bold red]No unsharded history at {source}[/bold red]")
+                return
+            shard_dir = config.episodic.get("shard_dir")
+            shards = ShardedEpisodicMemory(os.path.expanduser(shard_dir) if shard_dir else None)
+            count = shards.import_database(str(source))
+            shards.close(drain=False)
+            self.console.print(f"[green]Copied {count} messages into {len(shards.periods())} monthly shards[/green]")
+            if config.episodic.get("sharding", "none") == "none":
+                self.console.print("Set episodic.sharding to monthly in settings.yaml to use them")
+            return
+            
+        if parsed_args.export_memory or parsed_args.import_memory:
+            from ..memory.backup import export_memory, import_memory
+            
+            def progress(table, rows):
+                self.console.print(f"{table}: {rows} rows", end="\r")
+                
+            try:
+                if parsed_args.export_memory:
+                    counts = export_memory(parsed_args.export_memory,
+                                           compression=parsed_args.compression, progress=progress)
+                    action = f"Exported memory to {parsed_args.export_memory}"
+                else:
+                    counts = import_memory(parsed_args.import_memory,
+                                           replace=parsed_args.replace, progress=progress)
+                    action = f"Imported memory from {parsed_args.import_memory}"
+                details = ", ".join(f"{table}={rows}" for table, rows in counts.items())
+                self.console.print(f"[green]{action}[/green] ({details})")
+            except (OSError, ValueError) as e:
+                self.console.print(f"[bold red]Error:[/bold red] {e}")
+            return
+            
+        if parsed_args.compact:
+            self._compact_episodic(parsed_args.provider, parsed_args.model)
+            self.episodic_memory.close()
+            return
+            
         if parsed_args.list_conversations:
             conversations = self.episodic_memory.list_conversations()
             self.console.print("[bold]Recent conversations:[/bold]")
@@ -235,8 +462,15 @@ class CLI:
                 self.console.print(f"[bold]{conv['title']}[/bold] ({conv['conversation_id']})")
                 self.console.print(f"  Messages: {conv['message_count']}")
                 self.console.print(f"  Date: {conv['timestamp']}")
+                self.console.print(f"  Last active: {conv['last_activity']}")
             return
             
+        # Sync an Obsidian vault in the background for the whole session
+        watcher = None
+        if parsed_args.watch_obsidian:
+            from ..memory.vault_watcher import VaultWatcher
+            watcher = VaultWatcher(parsed_args.watch_obsidian).start()
+            
         # Initialize the model
         self._initialize_model(parsed_args.provider, parsed_args.model)
         
@@ -244,6 +478,16 @@ class CLI:
         system_prompt = self._format_system_prompt()
         self.short_term_memory.add_system_message(system_prompt)
         
+        # Reload only as much of a resumed conversation as short-term memory holds
+        if parsed_args.resume:
+            self.conversation_id = parsed_args.resume
+            if hasattr(self.episodic_memory, "tail"):
+                budget = getattr(self.short_term_memory, "max_tokens", 5000)
+                for msg in self.episodic_memory.tail(self.conversation_id, budget):
+                    # Digests of compacted history are context, not turns
+                    role = "system" if msg["role"] == "digest" else msg["role"]
+                    self.short_term_memory.add_message(role, msg["content"])
+            
         # One-shot mode vs interactive mode
         if parsed_args.prompt:
             # One-shot query mode
@@ -254,7 +498,8 @@ class CLI:
             self.episodic_memory.add_message(
                 role="user",
                 content=prompt,
-                conversation_id=self.conversation_id
+                conversation_id=self.conversation_id,
+                defer_embedding=True
             )
             
             response = self.send_prompt(prompt)
@@ -276,7 +521,8 @@ class CLI:
                     self.episodic_memory.add_message(
                         role="user",
                         content=prompt,
-                        conversation_id=self.conversation_id
+                        conversation_id=self.conversation_id,
+                        defer_embedding=True
                     )
                     
                     response = self.send_prompt(prompt)
@@ -285,6 +531,22 @@ class CLI:
                     self.console.print("\nExiting...")
                     break
                     
+        if watcher is not None:
+            watcher.stop()
+            
+        # Finish embedding this session's messages; leftovers resume next start
+        if hasattr(self._episodic_memory, "close"):
+            self._episodic_memory.close()
+            
+        # Scheduled compaction, after interactive sessions only
+        policy = config.episodic.get("compaction") or {}
+        configured = any(policy.get(key) is not None
+                         for key in ("max_age_days", "keep_conversations", "delete_after_days"))
+        interval = policy.get("interval_hours", 24)
+        if (not parsed_args.prompt and configured and interval
+                and hasattr(self._episodic_memory, "compaction_due")
+                and self._episodic_memory.compaction_due(interval)):
+            self._compact_episodic(parsed_args.provider, parsed_args.model)
         return
 
 